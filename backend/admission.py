@@ -0,0 +1,86 @@
+"""Load-adaptive admission control for engine-backed endpoints."""
+
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class DegradationLevel:
+    level: int
+    name: str
+    # Multiplier for time limits and node budgets.
+    budget_scale: float
+    # Depth removed from the requested search depth (never below 1).
+    depth_reduction: int
+    candidate_count: int
+    use_rag: bool
+
+    def scale(self, value, minimum=0):
+        """Scale a time limit or node budget; None or 0 (unbounded) is kept."""
+        if not value:
+            return value
+        scaled = value * self.budget_scale
+        return max(minimum, int(scaled) if isinstance(value, int) else scaled)
+
+    def reduce_depth(self, depth):
+        return max(1, depth - self.depth_reduction)
+
+
+DEGRADATION_LEVELS = (
+    DegradationLevel(0, "normal", 1.0, 0, 5, True),
+    DegradationLevel(1, "reduced", 0.5, 1, 3, True),
+    DegradationLevel(2, "minimal", 0.25, 2, 2, False),
+)
+
+
+class AdmissionController:
+    """Count in-flight engine requests and pick a degradation level on entry.
+
+    Up to ``capacity`` concurrent requests run at full budget. Requests beyond
+    that are effectively queued behind the others for CPU, so each further
+    ``capacity`` of backlog moves new requests one level down: smaller search
+    budgets and fewer teaching candidates first, then no RAG enrichment.
+    """
+
+    def __init__(self, capacity=2, levels=DEGRADATION_LEVELS):
+        self.capacity = max(1, int(capacity))
+        self.levels = levels
+        self.in_flight = 0
+        self.stats = {
+            "admitted": 0,
+            "peak_in_flight": 0,
+            "by_level": {level.name: 0 for level in levels},
+        }
+        self._lock = threading.Lock()
+
+    def level_for(self, in_flight):
+        """Degradation level for a request arriving with ``in_flight`` others running."""
+        index = min(in_flight // self.capacity, len(self.levels) - 1)
+        return self.levels[index]
+
+    @contextmanager
+    def admit(self):
+        with self._lock:
+            level = self.level_for(self.in_flight)
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+            self.stats["by_level"][level.name] += 1
+        try:
+            yield level
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "in_flight": self.in_flight,
+                "queued": max(0, self.in_flight - self.capacity),
+                "level": self.level_for(self.in_flight).name,
+                "admitted": self.stats["admitted"],
+                "peak_in_flight": self.stats["peak_in_flight"],
+                "by_level": dict(self.stats["by_level"]),
+            }
@@ -0,0 +1,88 @@
+"""Bounded, content-addressed cache for grounded coaching advice."""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+ADVICE_CACHE_FORMAT = 1
+
+
+def content_key(*parts):
+    """Hash JSON-serializable parts into a stable cache key."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AdviceCache:
+    """Thread-safe LRU map from grounded-input digests to finished advice text."""
+
+    def __init__(self, max_entries=4096, path=None):
+        self.max_entries = max(1, int(max_entries))
+        self.path = Path(path) if path else None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def save(self, path=None):
+        """Write entries oldest-first so a reload keeps the LRU order."""
+        target = Path(path) if path else self.path
+        if target is None:
+            return False
+        with self._lock:
+            entries = list(self._entries.items())
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temporary = target.with_name(f"{target.name}.tmp")
+        temporary.write_text(
+            json.dumps({"format": ADVICE_CACHE_FORMAT, "entries": entries}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(temporary, target)
+        return True
+
+    def load(self, path=None):
+        """Merge a saved cache; missing or incompatible files are ignored."""
+        source = Path(path) if path else self.path
+        if source is None or not source.is_file():
+            return 0
+        try:
+            data = json.loads(source.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"Advice cache load failed: {e}")
+            return 0
+        if not isinstance(data, dict) or data.get("format") != ADVICE_CACHE_FORMAT:
+            return 0
+        loaded = 0
+        for item in data.get("entries", []):
+            if isinstance(item, list) and len(item) == 2 and all(isinstance(part, str) for part in item):
+                self.put(*item)
+                loaded += 1
+        return loaded
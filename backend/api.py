@@ -1,32 +1,174 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
 from typing import List, Optional
+from contextlib import asynccontextmanager
 from datetime import datetime
+import asyncio
 import chess
-import chess.engine
 import chess.pgn
 import io
+import json
 import math
 import os
 import shutil
+import threading
 import time
+from collections import OrderedDict
 
 # 匯入你的核心引擎
 import chess_engine  # Import the new engine module
-# 匯入資料庫模組
-from database import SessionLocal, Game
+from admission import DEGRADATION_LEVELS, AdmissionController
+from request_budget import RequestBudget
+from single_flight import SingleFlight
+from speculation import AnalysisCache, SpeculativeAnalyzer
+from ponder import Ponderer
+from game_session import GameClock, GameSession, SessionError
+import tt_snapshot
+
+# 資料庫 (SQLAlchemy) 與 RAG 引擎 (google-genai) 匯入很慢，延到第一次使用時才載入，
+# 冷啟動時可以更快開始接受請求；就算 rag.py 有錯或沒 key，其他功能也能運作。
+_rag_module = None
+_lazy_import_lock = threading.Lock()
+
+
+def _load_rag():
+    global _rag_module
+    if _rag_module is None:
+        with _lazy_import_lock:
+            if _rag_module is None:
+                try:
+                    import rag
+                    _rag_module = rag
+                except Exception as e:
+                    print(f"⚠️ Warning: RAG engine failed to start: {e}")
+                    _rag_module = False
+    return _rag_module or None
+
+
+def get_rag_engine():
+    """Return the shared coaching engine, or None when RAG cannot start."""
+    rag = _load_rag()
+    if not rag:
+        return None
+    try:
+        return rag.get_rag_engine()
+    except Exception as e:
+        print(f"⚠️ Warning: RAG engine failed to start: {e}")
+        return None
+
+
+def _database():
+    import database
+
+    database.init_db()
+    return database
+
+
+# --- 啟動預熱：背景載入開局庫、開局索引、評估函式與教練知識庫 ---
+readiness = {"ready": False, "components": {}}
+
+
+def _warm_opening_index():
+    from openings import load_opening_index
+
+    load_opening_index()
+
+
+# 置換表快照（TT_SNAPSHOT_PATH）：啟動時還原為暖條目，關機與每 TT_SNAPSHOT_INTERVAL 秒保存一次，
+# 重新部署後開局與課題局面不必從零搜尋；引擎或評估函式改版後舊快照自動失效。
+TT_SNAPSHOT_PATH = os.getenv("TT_SNAPSHOT_PATH") or None
+TT_SNAPSHOT_INTERVAL = float(os.getenv("TT_SNAPSHOT_INTERVAL", "600"))
 
-# 嘗試匯入 RAG 引擎
-# 這樣就算 rag.py 有錯或沒 key，伺服器也能啟動其他功能
-try:
-    from rag import get_rag_engine
-except Exception as e:
-    print(f"⚠️ Warning: RAG engine failed to start: {e}")
-    get_rag_engine = None
 
-app = FastAPI()
+def _restore_tt_snapshot():
+    if TT_SNAPSHOT_PATH:
+        restored = tt_snapshot.restore_snapshot(TT_SNAPSHOT_PATH)
+        print(f"Restored {restored} transposition table entries")
+
+
+def _save_tt_snapshot():
+    if TT_SNAPSHOT_PATH:
+        try:
+            tt_snapshot.save_snapshot(TT_SNAPSHOT_PATH)
+        except OSError as e:
+            print(f"⚠️ TT snapshot save failed: {e}")
+
+
+def _snapshot_periodically(stop_event):
+    while not stop_event.wait(TT_SNAPSHOT_INTERVAL):
+        _save_tt_snapshot()
+
+
+WARMUP_STEPS = (
+    ("database", _database),
+    ("opening_book", chess_engine.warm_opening_book),
+    ("transposition_table", _restore_tt_snapshot),
+    ("evaluator", lambda: chess_engine.evaluate_board(chess.Board())),
+    ("opening_index", _warm_opening_index),
+    ("coach", lambda: get_rag_engine()),
+)
+
+
+# Cheap steps that change results rather than latency; they run even when warmup is off.
+REQUIRED_WARMUP_STEPS = ("transposition_table",)
+
+
+def warm_up(required_only=False):
+    """Run the warmup steps, recording per-component status and milliseconds."""
+    for name, step in WARMUP_STEPS:
+        if required_only and name not in REQUIRED_WARMUP_STEPS:
+            continue
+        started = time.perf_counter()
+        try:
+            step()
+            status = "ok"
+        except Exception as e:
+            print(f"⚠️ Warmup {name} failed: {e}")
+            status = "failed"
+        readiness["components"][name] = {
+            "status": status,
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+    readiness["ready"] = True
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    global speculator, ponderer
+    if os.getenv("WARMUP_ON_STARTUP", "1").lower() not in {"0", "false", "no"}:
+        threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+    else:
+        warm_up(required_only=True)
+    if os.getenv("SPECULATIVE_ANALYSIS", "0").lower() in {"1", "true", "yes"}:
+        speculator = SpeculativeAnalyzer(_speculate_position, _engine_busy, max_pending=1 + SPECULATIVE_REPLIES)
+        speculator.start()
+    if os.getenv("PONDER", "0").lower() in {"1", "true", "yes"}:
+        ponderer = Ponderer(_ponder_search, _engine_busy, max_sessions=int(os.getenv("PONDER_MAX_SESSIONS", "64")))
+        ponderer.start()
+    snapshot_stop = threading.Event()
+    if TT_SNAPSHOT_PATH and TT_SNAPSHOT_INTERVAL > 0:
+        threading.Thread(
+            target=_snapshot_periodically, args=(snapshot_stop,), name="tt-snapshot", daemon=True
+        ).start()
+    yield
+    snapshot_stop.set()
+    if speculator is not None:
+        speculator.stop(timeout=1.0)
+        speculator = None
+    if ponderer is not None:
+        ponderer.stop(timeout=1.0)
+        ponderer = None
+    _save_tt_snapshot()
+    # 關機時保存教練建議快取，重啟後常見局面不必重建提示。
+    if _rag_module:
+        _rag_module.save_rag_state()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,7 +180,7 @@ app.add_middleware(
 
 # --- Dependency: 取得資料庫連線 ---
 def get_db():
-    db = SessionLocal()
+    db = _database().SessionLocal()
     try:
         yield db
     finally:
@@ -54,13 +196,19 @@ class MakeMoveRequest(BaseModel):
     time_limit: float = 2.0
     difficulty: str = "intermediate"
     bot_style: str = "balanced"
+    # 對局 session；開啟 PONDER 時由第一次 /make_move 建立並在回應中傳回。
+    session_id: Optional[str] = None
+
+# /get_analysis 與 /explain 的預設參數相同，預測分析也用這組參數，三者共用快取鍵。
+DEFAULT_ANALYSIS_DEPTH = 5
+DEFAULT_ANALYSIS_TIME_LIMIT = 5.0
 
 class GetAnalysisRequest(BaseModel):
     fen: str
     history: str = ""
     question: Optional[str] = None
-    depth: int = 5
-    time_limit: float = 5.0
+    depth: int = DEFAULT_ANALYSIS_DEPTH
+    time_limit: float = DEFAULT_ANALYSIS_TIME_LIMIT
 
 class AnalysisRequest(BaseModel):
     pgn: str
@@ -81,32 +229,40 @@ class GameResponse(GameCreate):
         # Pydantic V2 新寫法，解決 UserWarning
         from_attributes = True 
 
+# 強度由節點預算決定；time_limit 只是牆鐘安全上限，
+# 預算以 stockfish_calibration.py --node-budgets 對照 Stockfish ACPL 校準。
+# 伺服器過載時 _bot_search_kwargs 只縮小牆鐘上限，節點預算不變，
+# 所以同一難度在忙碌與空閒的伺服器上棋力相同。
 BOT_DIFFICULTY_PROFILES = {
     "newbie": {
         "label": "新手",
         "depth": 1,
-        "time_limit": 0.35,
+        "node_limit": 2_000,
+        "time_limit": 1.0,
         "use_book": False,
         "adaptive_depth": False,
     },
     "beginner": {
         "label": "初階",
         "depth": 2,
-        "time_limit": 0.7,
+        "node_limit": 6_000,
+        "time_limit": 1.5,
         "use_book": False,
         "adaptive_depth": False,
     },
     "intermediate": {
         "label": "中階",
         "depth": 4,
-        "time_limit": 1.25,
+        "node_limit": 12_000,
+        "time_limit": 2.0,
         "use_book": True,
         "adaptive_depth": False,
     },
     "advanced": {
         "label": "中階加強",
         "depth": 5,
-        "time_limit": 1.5,
+        "node_limit": 20_000,
+        "time_limit": 2.0,
         "use_book": True,
         "adaptive_depth": True,
     },
@@ -114,14 +270,325 @@ BOT_DIFFICULTY_PROFILES = {
     "challenge": {
         "label": "中階加強",
         "depth": 5,
-        "time_limit": 1.5,
+        "node_limit": 20_000,
+        "time_limit": 2.0,
         "use_book": True,
         "adaptive_depth": True,
     },
 }
 
+# 尖峰時同時進行的引擎請求超過容量就逐級降載（縮小搜尋預算與候選數、略過 RAG），
+# 讓每個請求仍在可預期的時間內回應，而不是全部一起變慢。
+engine_admission = AdmissionController(capacity=int(os.getenv("ENGINE_ADMISSION_CAPACITY", "2")))
+MIN_DEGRADED_TIME_LIMIT = 0.1
+
+# 客戶端離線（關閉分頁、離開對局）時取消還在跑的搜尋，釋放 worker 給其他請求。
+CLIENT_DISCONNECT_POLL_SECONDS = 0.1
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def _watch_disconnect(http_request, cancel_event):
+    while not cancel_event.is_set():
+        if await http_request.is_disconnected():
+            cancel_event.set()
+            return
+        await asyncio.sleep(CLIENT_DISCONNECT_POLL_SECONDS)
+
+
+@asynccontextmanager
+async def cancel_on_disconnect(http_request):
+    """Yield an event that is set as soon as the HTTP client disconnects."""
+    cancel_event = threading.Event()
+    watcher = asyncio.create_task(_watch_disconnect(http_request, cancel_event))
+    try:
+        yield cancel_event
+    finally:
+        watcher.cancel()
+
+
+def _cancellable(cancel_event, function, *args, **kwargs):
+    """Run engine work on the current worker thread, stopping once ``cancel_event`` is set."""
+    with chess_engine.search_cancellation(cancel_event):
+        return function(*args, **kwargs)
+
+
+def _in_tt_partition(partition, function, *args, **kwargs):
+    with chess_engine.tt_partition(partition):
+        return function(*args, **kwargs)
+
+
+def _raise_if_disconnected(cancel_event):
+    if cancel_event.is_set():
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+
+
+# 同一局面、同一組參數的並行請求（整班載入同一課題、/get_analysis 與 /explain 同時送出）
+# 共用一次計算；只有所有等待者都離線時才取消共用的搜尋。
+engine_flights = SingleFlight()
+# /explain 不降載，使用正常檔位的候選數，與 /get_analysis 的請求共用計算。
+TEACHING_CANDIDATE_COUNT = DEGRADATION_LEVELS[0].candidate_count
+
+
+# 置換表依工作分區：每盤對局一個分區，教練分析與賽後複盤各自一個；
+# 複盤最多佔 chess_engine.TT_PARTITION_LIMITS 的比例，不會擠掉對局中的條目。
+TT_PARTITION_BY_KIND = {"analysis": "analysis", "teaching": "analysis", "review": "review"}
+
+
+# 只有伺服器發出的 session_id（WebSocket 對局與 /make_move 發出的 id）擁有自己的分區；
+# 客戶端自帶的未知 id 共用 "game" 分區，任意 id 不會建出無上限的分區。
+# /make_move 發出的 id 最多保留 HTTP_SESSION_MAX 個，最久未用的連同分區一起捨棄。
+HTTP_SESSION_MAX = int(os.getenv("HTTP_SESSION_MAX", "256"))
+http_sessions = OrderedDict()
+_http_sessions_lock = threading.Lock()
+
+
+def _issue_http_session():
+    session_id = Ponderer.new_session_id()
+    with _http_sessions_lock:
+        http_sessions[session_id] = True
+        while len(http_sessions) > HTTP_SESSION_MAX:
+            oldest, _ = http_sessions.popitem(last=False)
+            chess_engine.transposition_table.drop_partition(f"game:{oldest}")
+            if ponderer is not None:
+                ponderer.discard(oldest)
+    return session_id
+
+
+def _known_http_session(session_id):
+    with _http_sessions_lock:
+        if session_id not in http_sessions:
+            return False
+        http_sessions.move_to_end(session_id)
+        return True
+
+
+def _game_partition(session_id):
+    if session_id and (session_id in game_sessions or session_id in http_sessions):
+        return f"game:{session_id}"
+    return "game"
+
+
+# 完成的結果（含背景預測分析）依同一組鍵快取；預測結果優先被淘汰。
+analysis_cache = AnalysisCache(max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "256")))
+
+
+COACH_STARTING_MESSAGE = "教練仍在啟動中，請稍後再試"
+
+
+async def _load_coach(budget):
+    """The RAG engine, waited for only within the ``"coach_startup"`` stage.
+
+    Raises ``asyncio.TimeoutError`` when the engine is still starting after
+    that; it keeps loading in the background for later requests.
+    """
+    limit = budget.allocate("coach_startup")
+    loading = asyncio.ensure_future(run_in_threadpool(get_rag_engine))
+    return await asyncio.wait_for(asyncio.shield(loading), limit)
+
+
+# 選用的模型回答（COACH_MODEL_REPLY=1）：玩家有提問時，在教練建議之後用請求剩下的預算，
+# 由模型只根據已驗證的建議回答；在事件迴圈上等待，不佔用引擎或執行緒池。
+COACH_MODEL_REPLY = os.getenv("COACH_MODEL_REPLY", "0").lower() in {"1", "true", "yes"}
+
+
+async def _coach_reply(rag_engine, advice, question, budget):
+    if not COACH_MODEL_REPLY or not question or not advice:
+        return None
+    remaining = budget.remaining()
+    if remaining is not None and remaining <= 0:
+        return None
+    try:
+        return await rag_engine.aanswer_question(advice, question, budget=remaining)
+    except Exception as e:
+        print(f"⚠️ 模型回答失敗: {e}")
+        return None
+
+
+async def _coalesced(key, cancel_event, function, *args, **kwargs):
+    """Run engine work in the threadpool, shared with identical concurrent requests.
+
+    A cached result for ``key`` is returned without running anything; a
+    finished computation that was not cancelled is cached for later requests.
+    A request that joins another's computation reports that computation's
+    stages in its own ``budget``.
+    """
+    cached = analysis_cache.get(key)
+    if cached is not None:
+        return cached
+
+    budget = kwargs.get("budget")
+
+    async def compute(shared_cancel):
+        partition = TT_PARTITION_BY_KIND[key[0]]
+        result = await run_in_threadpool(
+            _cancellable, shared_cancel, _in_tt_partition, partition, function, *args, **kwargs
+        )
+        if not shared_cancel.is_set():
+            analysis_cache.put(key, result)
+        return result, budget
+
+    result, flight_budget = await engine_flights.run(key, compute, cancel_event)
+    if budget is not None and flight_budget is not None:
+        # 共用他人的計算時，回報實際執行那次搜尋的預算。
+        budget.adopt(flight_budget)
+    return result
+
+
+def _analysis_key(board, depth, budget):
+    return ("analysis", board.fen(), depth, budget.total)
+
+
+def _teaching_key(board, analysis, candidate_count, budget):
+    best_move = analysis.get("best_move")
+    return (
+        "teaching",
+        board.fen(),
+        best_move.uci() if best_move else None,
+        analysis.get("depth"),
+        candidate_count,
+        budget.total,
+    )
+
+
+def _review_key(game, perspective, depth):
+    moves = tuple(move.uci() for move in game.mainline_moves())
+    return ("review", game.board().fen(), moves, perspective, depth)
+
+
+# 選用的背景預測分析（SPECULATIVE_ANALYSIS=1）：/make_move 之後趁引擎空閒先分析新局面
+# 與玩家最可能的回應，之後的教練請求直接命中快取；真正的請求一進來就搶占。
+SPECULATIVE_REPLIES = 2
+speculator = None
+
+
+def _engine_busy():
+    return engine_admission.in_flight > 0 or engine_flights.in_flight() > 0
+
+
+def _predicted_positions(board, pv):
+    """The position after the bot's move, then after the player's likeliest replies."""
+    if board.is_game_over():
+        return []
+    replies = []
+    if len(pv) > 1:
+        predicted = chess.Move.from_uci(pv[1])
+        if board.is_legal(predicted):
+            replies.append(predicted)
+    for move in chess_engine.order_moves(board):
+        if len(replies) >= SPECULATIVE_REPLIES:
+            break
+        if move not in replies:
+            replies.append(move)
+    fens = [board.fen()]
+    for move in replies:
+        board.push(move)
+        fens.append(board.fen())
+        board.pop()
+    return fens
+
+
+def _speculate_position(fen, cancel_event):
+    """Fill the analysis cache for ``fen`` as a default /get_analysis or /explain would.
+
+    Returns False when a real request preempted the work; nothing partial is cached.
+    """
+    board = chess.Board(fen)
+    if board.is_game_over():
+        return True
+    budget = RequestBudget(DEFAULT_ANALYSIS_TIME_LIMIT)
+    key = _analysis_key(board, DEFAULT_ANALYSIS_DEPTH, budget)
+    with chess_engine.search_cancellation(cancel_event), chess_engine.tt_partition("analysis"):
+        analysis = analysis_cache.peek(key)
+        if analysis is None:
+            analysis = chess_engine.get_analysis(board, depth=DEFAULT_ANALYSIS_DEPTH, budget=budget)
+            if cancel_event.is_set():
+                return False
+            analysis_cache.put(key, analysis, speculative=True)
+        teaching_key = _teaching_key(board, analysis, TEACHING_CANDIDATE_COUNT, budget)
+        if teaching_key not in analysis_cache:
+            teaching_analysis = chess_engine.get_teaching_analysis(
+                board, analysis, candidate_count=TEACHING_CANDIDATE_COUNT, budget=budget
+            )
+            if cancel_event.is_set():
+                return False
+            analysis_cache.put(teaching_key, teaching_analysis, speculative=True)
+    return True
+
+def _bot_search_kwargs(difficulty, bot_style, time_limit, load_level=DEGRADATION_LEVELS[0]):
+    """get_analysis settings for one bot move; pondering uses them at the normal level."""
+    profile = BOT_DIFFICULTY_PROFILES[difficulty]
+    return {
+        "depth": profile["depth"],
+        "time_limit": load_level.scale(time_limit, minimum=MIN_DEGRADED_TIME_LIMIT),
+        "use_book": profile["use_book"],
+        "adaptive_depth": profile["adaptive_depth"],
+        "style": bot_style,
+        "difficulty": difficulty,
+        # 節點預算決定強度，不隨負載縮小。
+        "node_limit": profile["node_limit"],
+    }
+
+
+# 選用的伺服器端背景思考（PONDER=1）：玩家思考時先搜尋 PV 預期回應之後的局面。
+# 每個 session 每步最多一次機器人搜尋的預算；全域只有一條執行緒、只用空閒 CPU。
+ponderer = None
+
+
+def _ponder_position(board):
+    """Ponder key for ``board``: its root position and the moves played since."""
+    return board.root().fen(), tuple(move.uci() for move in board.move_stack)
+
+
+def _ponder_board(position):
+    root_fen, moves = position
+    board = chess.Board(root_fen)
+    for uci in moves:
+        board.push_uci(uci)
+    return board
+
+
+def _queue_ponder(session_id, board, pv, search_params, with_history=True):
+    if len(pv) < 2 or board.is_game_over():
+        return
+    expected_reply = chess.Move.from_uci(pv[1])
+    if not board.is_legal(expected_reply):
+        return
+    board.push(expected_reply)
+    try:
+        if not board.is_game_over():
+            position = _ponder_position(board) if with_history else (board.fen(), ())
+            ponderer.ponder(session_id, position, search_params)
+    finally:
+        board.pop()
+
+
+def _ponder_search(session_id, position, search_params, cancel_event):
+    """The bot search for the pondered position, or None when it was preempted."""
+    board = _ponder_board(position)
+    with chess_engine.search_cancellation(cancel_event), chess_engine.tt_partition(_game_partition(session_id)):
+        analysis = chess_engine.get_analysis(board, **_bot_search_kwargs(*search_params))
+    if analysis.get("cancelled") or cancel_event.is_set() or not analysis["best_move"]:
+        return None
+    return analysis
+
 # --- API 端點 ---
 
+@app.get("/ready")
+def read_ready():
+    """Readiness probe: 503 until the background warmup has finished."""
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content=readiness)
+    return {
+        **readiness,
+        "admission": engine_admission.snapshot(),
+        "single_flight": engine_flights.snapshot(),
+        "analysis_cache": analysis_cache.snapshot(),
+        "speculation": speculator.snapshot() if speculator is not None else None,
+        "ponder": ponderer.snapshot() if ponderer is not None else None,
+        "game_sessions": len(game_sessions),
+        "transposition_table": chess_engine.transposition_table.snapshot(),
+    }
+
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "Chess AI is running!"}
@@ -149,23 +616,30 @@ def make_move(request: MakeMoveRequest):
     difficulty = request.difficulty if request.difficulty in BOT_DIFFICULTY_PROFILES else "intermediate"
     profile = BOT_DIFFICULTY_PROFILES[difficulty]
     bot_style = request.bot_style if request.bot_style in {"balanced", "trickster"} else "balanced"
-
-    # 使用難度檔位控制搜尋深度、開局庫與殘局自動加深。
-    analysis = chess_engine.get_analysis(
-        board, 
-        depth=profile["depth"],
-        time_limit=min(request.time_limit, profile["time_limit"]),
-        use_book=profile["use_book"],
-        adaptive_depth=profile["adaptive_depth"],
-        style=bot_style,
-        difficulty=difficulty,
-    )
+    search_params = (difficulty, bot_style, min(request.time_limit, profile["time_limit"]))
+    session_id = request.session_id
+    if not session_id or not _known_http_session(session_id):
+        session_id = _issue_http_session()
+
+    # 玩家走了預期的回應時直接用背景思考的結果（ponder hit）；否則照常搜尋，
+    # 但置換表已被背景思考預熱。
+    analysis = ponderer.take(session_id, _ponder_position(board), search_params) if ponderer is not None else None
+    ponder_hit = analysis is not None
+    # 使用難度檔位控制搜尋深度、節點預算、開局庫與殘局自動加深；負載高時只縮小牆鐘上限。
+    with engine_admission.admit() as load_level, chess_engine.tt_partition(_game_partition(session_id)):
+        if analysis is None:
+            analysis = chess_engine.get_analysis(board, **_bot_search_kwargs(*search_params, load_level))
 
     if not analysis['best_move']:
         raise HTTPException(status_code=500, detail="Engine failed to find move")
 
     # 執行走法
     board.push(analysis['best_move'])
+    if speculator is not None:
+        speculator.submit(_predicted_positions(board, analysis.get("pv") or []))
+    if ponderer is not None:
+        # 下一個 HTTP 請求只會帶 FEN（沒有歷史），背景思考也用沒有歷史的局面。
+        _queue_ponder(session_id, board, analysis.get("pv") or [], search_params, with_history=False)
 
     return {
         "best_move": analysis['best_move'].uci(),
@@ -186,15 +660,22 @@ def make_move(request: MakeMoveRequest):
         "lmr_researches": analysis.get("lmr_researches", 0),
         "candidate_cache_hits": analysis.get("candidate_cache_hits", 0),
         "candidate_bound_skips": analysis.get("candidate_bound_skips", 0),
+        "legality_checks": analysis.get("legality_checks", 0),
         "timed_out": analysis.get("timed_out", False),
+        "node_limit_reached": analysis.get("node_limit_reached", False),
+        "degradation_level": load_level.level,
+        "degradation": load_level.name,
+        "session_id": session_id,
+        "ponder_hit": ponder_hit,
     }
 
 # 2. 深度分析端點 (用於分析與教練建議)
 @app.post("/get_analysis")
-def get_analysis_endpoint(request: GetAnalysisRequest):
+async def get_analysis_endpoint(request: GetAnalysisRequest, http_request: Request):
     """
     深度分析當前局面，包含引擎評估與 AI 教練建議
     允許較長時間運算以提供更準確的分析
+    引擎運算在 threadpool 執行，教練階段可直接 await 非同步模型呼叫
     """
     try:
         board = chess.Board(request.fen)
@@ -202,31 +683,131 @@ def get_analysis_endpoint(request: GetAnalysisRequest):
         raise HTTPException(status_code=400, detail="Invalid FEN string")
 
     if board.is_game_over():
-        return {
-            "game_over": True,
-            "result": board.result(),
-            "analysis": None,
-            "coach_advice": "遊戲已結束"
-        }
+        return _game_over_analysis(board)
+
+    with engine_admission.admit() as load_level:
+        async with cancel_on_disconnect(http_request) as cancel_event:
+            try:
+                return await _analyze_position(request, board, load_level, cancel_event)
+            except chess_engine.SearchCancelled:
+                _raise_if_disconnected(cancel_event)
+                raise
+
+
+def _game_over_analysis(board):
+    return {
+        "game_over": True,
+        "result": board.result(),
+        "analysis": None,
+        "coach_advice": "遊戲已結束"
+    }
+
+
+def _sse_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+
+@app.post("/get_analysis/stream")
+async def stream_analysis_endpoint(request: GetAnalysisRequest, http_request: Request):
+    """
+    /get_analysis 的串流版本（Server-Sent Events）：每完成一層迭代加深送出一個
+    iteration 事件（depth、score、pv、nodes、nps），最後的 analysis 事件與
+    /get_analysis 的回應相同，包含教學分析與教練建議。
+    """
+    try:
+        board = chess.Board(request.fen)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid FEN string")
+
+    return StreamingResponse(
+        _analysis_events(request, board, http_request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
+async def _analysis_events(request, board, http_request):
+    if board.is_game_over():
+        yield _sse_event("analysis", _game_over_analysis(board))
+        return
+
+    loop = asyncio.get_running_loop()
+    iterations = asyncio.Queue()
+
+    def on_iteration(report):
+        # 搜尋在 worker 執行緒回報，交給事件迴圈排入佇列。
+        loop.call_soon_threadsafe(iterations.put_nowait, report)
+
+    with engine_admission.admit() as load_level:
+        async with cancel_on_disconnect(http_request) as cancel_event:
+            task = asyncio.ensure_future(
+                _analyze_position(request, board, load_level, cancel_event, on_iteration=on_iteration)
+            )
+            # 迭代報告都在結果之前排入事件迴圈，收到 None 時已全部送出。
+            task.add_done_callback(lambda _task: iterations.put_nowait(None))
+            try:
+                while (report := await iterations.get()) is not None:
+                    yield _sse_event("iteration", report)
+                try:
+                    analysis = task.result()
+                except chess_engine.SearchCancelled:
+                    return
+                except HTTPException as e:
+                    yield _sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+                    return
+                yield _sse_event("analysis", analysis)
+            finally:
+                if not task.done():
+                    # 客戶端中途離開：停止搜尋，不再等教學分析與教練建議。
+                    cancel_event.set()
+                    task.cancel()
+
+
+async def _analyze_position(request, board, load_level, cancel_event, on_iteration=None):
+    """Engine analysis, teaching evidence and coaching advice at one load level.
+
+    The search, teaching and coaching stages share one ``RequestBudget`` of
+    ``request.time_limit`` seconds, so the response honors the requested limit.
+    Each stage stops early once ``cancel_event`` is set, and nothing further
+    runs for a client that has gone away. ``on_iteration`` receives a report
+    after each completed search iteration; a cached or shared search sends none.
+    """
+    budget = RequestBudget(load_level.scale(request.time_limit, minimum=MIN_DEGRADED_TIME_LIMIT))
+    depth = load_level.reduce_depth(request.depth)
     # 深度分析
-    analysis = chess_engine.get_analysis(
+    analysis = await _coalesced(
+        _analysis_key(board, depth, budget),
+        cancel_event,
+        chess_engine.get_analysis,
         board,
-        depth=request.depth,
-        time_limit=request.time_limit
+        depth=depth,
+        budget=budget,
+        on_iteration=on_iteration,
     )
-    teaching_time_limit = min(1.0, max(0.2, request.time_limit * 0.25)) if request.time_limit else None
-    teaching_analysis = chess_engine.get_teaching_analysis(
+    _raise_if_disconnected(cancel_event)
+    teaching_analysis = await _coalesced(
+        _teaching_key(board, analysis, load_level.candidate_count, budget),
+        cancel_event,
+        chess_engine.get_teaching_analysis,
         board,
         analysis,
-        time_limit=teaching_time_limit,
+        candidate_count=load_level.candidate_count,
+        budget=budget,
     )
+    _raise_if_disconnected(cancel_event)
     
     game_phase = chess_engine.detect_game_phase(board)
 
-    # 準備 AI 教練建議
-    coach_advice = None
-    if get_rag_engine:
+    # 準備 AI 教練建議（高負載時略過 RAG）
+    coach_advice = None if load_level.use_rag else "伺服器忙碌中，教練建議暫時略過"
+    coach_reply = None
+    rag_engine = None
+    if load_level.use_rag:
+        try:
+            rag_engine = await _load_coach(budget)
+        except asyncio.TimeoutError:
+            coach_advice = COACH_STARTING_MESSAGE
+    if rag_engine:
         # 安全防禦：清洗用戶輸入
         user_question = request.question or "請評估目前局勢並給出建議"
         
@@ -235,8 +816,8 @@ def get_analysis_endpoint(request: GetAnalysisRequest):
             user_question = user_question[:200]
         
         try:
-            rag_engine = get_rag_engine()
-            coach_advice = rag_engine.get_advice(
+            coach_advice = await run_in_threadpool(
+                rag_engine.get_advice,
                 request.fen,
                 request.history,
                 user_question,
@@ -244,10 +825,14 @@ def get_analysis_endpoint(request: GetAnalysisRequest):
                 pv_score=analysis['score'],
                 analysis_result=analysis,
                 teaching_analysis=teaching_analysis,
+                budget=budget,
             )
         except Exception as e:
             print(f"RAG 分析失敗: {e}")
             coach_advice = "教練分析暫時無法使用"
+        else:
+            _raise_if_disconnected(cancel_event)
+            coach_reply = await _coach_reply(rag_engine, coach_advice, request.question and user_question, budget)
 
     return {
         "evaluation": {
@@ -265,13 +850,208 @@ def get_analysis_endpoint(request: GetAnalysisRequest):
             "lmr_researches": analysis.get('lmr_researches', 0),
             "candidate_cache_hits": analysis.get('candidate_cache_hits', 0),
             "candidate_bound_skips": analysis.get('candidate_bound_skips', 0),
+            "legality_checks": analysis.get('legality_checks', 0),
             "timed_out": analysis.get('timed_out', False),
         },
         "teaching_analysis": teaching_analysis,
         "game_state": game_phase,
-        "coach_advice": coach_advice
+        "coach_advice": coach_advice,
+        "coach_reply": coach_reply,
+        "degradation_level": load_level.level,
+        "degradation": load_level.name,
+        "time_budget": budget.report(),
     }
 
+# 對局 session (WebSocket)：伺服器保存帶歷史的棋盤與棋鐘，客戶端每步只送 UCI。
+game_sessions = {}
+
+
+def _new_game_session(message):
+    difficulty = message.get("difficulty") if message.get("difficulty") in BOT_DIFFICULTY_PROFILES else "intermediate"
+    bot_style = message.get("bot_style") if message.get("bot_style") in {"balanced", "trickster"} else "balanced"
+    player_color = message.get("player_color", "white")
+    if player_color not in {"white", "black"}:
+        raise SessionError("player_color must be 'white' or 'black'")
+    session = GameSession(
+        Ponderer.new_session_id(),
+        fen=message.get("fen") or chess.STARTING_FEN,
+        moves=message.get("moves") or (),
+        difficulty=difficulty,
+        bot_style=bot_style,
+        bot_color=chess.BLACK if player_color == "white" else chess.WHITE,
+        clock=GameClock(message.get("clock_seconds"), message.get("increment_seconds", 0.0)),
+        push_analysis=bool(message.get("analysis")),
+    )
+    game_sessions[session.session_id] = session
+    return session
+
+
+def _close_game_session(session):
+    game_sessions.pop(session.session_id, None)
+    chess_engine.transposition_table.drop_partition(f"game:{session.session_id}")
+    if ponderer is not None:
+        ponderer.discard(session.session_id)
+
+
+def _session_search_params(session):
+    profile = BOT_DIFFICULTY_PROFILES[session.difficulty]
+    time_limit = session.clock.move_time(session.bot_color, profile["time_limit"])
+    return session.difficulty, session.bot_style, time_limit
+
+
+def _session_bot_move(session):
+    """Search and play the bot's move on the session board (runs in the threadpool)."""
+    search_params = _session_search_params(session)
+    analysis = ponderer.take(session.session_id, session.position_key(), search_params) if ponderer is not None else None
+    ponder_hit = analysis is not None
+    with engine_admission.admit() as load_level, chess_engine.tt_partition(_game_partition(session.session_id)):
+        if analysis is None:
+            analysis = chess_engine.get_analysis(session.board.copy(), **_bot_search_kwargs(*search_params, load_level))
+    if not analysis["best_move"]:
+        raise SessionError("Engine failed to find move")
+
+    move = analysis["best_move"]
+    san = session.board.san(move)
+    session.play_bot_move(move, analysis, ponder_hit)
+    if session.flagged_color is not None:
+        return {"type": "game_over", **session.status()}
+    pv = analysis.get("pv") or []
+    if not session.is_over:
+        if speculator is not None:
+            speculator.submit(_predicted_positions(session.board, pv))
+        if ponderer is not None:
+            _queue_ponder(session.session_id, session.board, pv, _session_search_params(session))
+    return {
+        "type": "bot_move",
+        "uci": move.uci(),
+        "san": san,
+        "ply": len(session.board.move_stack),
+        "is_game_over": session.is_over,
+        "result": session.result(),
+        "clock": session.clock.snapshot(),
+        "depth_reached": analysis["depth"],
+        "from_book": analysis.get("from_book", False),
+        "tt_hits": analysis.get("tt_hits", 0),
+        "ponder_hit": ponder_hit,
+        "degradation": load_level.name,
+    }
+
+
+async def _session_analysis(board, cancel_event):
+    """Analysis of a session board; it carries the game history, so it is cached apart from /get_analysis."""
+    with engine_admission.admit() as load_level:
+        budget = RequestBudget(load_level.scale(DEFAULT_ANALYSIS_TIME_LIMIT, minimum=MIN_DEGRADED_TIME_LIMIT))
+        depth = load_level.reduce_depth(DEFAULT_ANALYSIS_DEPTH)
+        key = (*_analysis_key(board, depth, budget), _ponder_position(board))
+        analysis = await _coalesced(key, cancel_event, chess_engine.get_analysis, board, depth=depth, budget=budget)
+    return {
+        "type": "analysis",
+        "ply": len(board.move_stack),
+        "score_cp": analysis["score"],
+        "display": analysis["eval_display"],
+        "winning_chance": analysis["winning_chance"],
+        "pv_line": analysis["pv"],
+        "depth_reached": analysis["depth"],
+    }
+
+
+class SessionAnalysisPush:
+    """The analysis a game socket is computing in the background, at most one.
+
+    Analysis never blocks the socket: the player's next move is read (and
+    timed) while it runs, and a move, a new game or a closed socket cancels it.
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.task = None
+        self.cancel_event = None
+
+    def start(self, session):
+        self.cancel()
+        self.cancel_event = threading.Event()
+        self.task = asyncio.create_task(self._push(session.board.copy(), self.cancel_event))
+
+    async def _push(self, board, cancel_event):
+        try:
+            analysis = await _session_analysis(board, cancel_event)
+            if not cancel_event.is_set():
+                await self.websocket.send_json(analysis)
+        except Exception as e:
+            # 連線已關閉或分析失敗：對局本身不受影響。
+            print(f"⚠️ 對局分析推送失敗: {e}")
+
+    def cancel(self):
+        if self.task is not None and not self.task.done():
+            self.cancel_event.set()
+            self.task.cancel()
+        self.task = None
+
+
+async def _handle_session_message(websocket, session, message, analysis_push):
+    """Apply one client message; returns the (possibly new) session."""
+    kind = message.get("type")
+    if kind in {"new", "move"}:
+        # 局面即將改變，進行中的分析已過時。
+        analysis_push.cancel()
+    if kind == "new":
+        new_session = _new_game_session(message)
+        if session is not None:
+            _close_game_session(session)
+        session = new_session
+        await websocket.send_json({"type": "session", **session.status()})
+    elif session is None:
+        raise SessionError("Start a game with a 'new' message first")
+    elif kind == "move":
+        session.play_player_move(message.get("uci"))
+        if session.is_over:
+            await websocket.send_json({"type": "game_over", **session.status()})
+    elif kind == "analysis":
+        analysis_push.start(session)
+        return session
+    elif kind == "sync":
+        moves = [move.uci() for move in session.board.move_stack]
+        await websocket.send_json({"type": "sync", **session.status(), "root_fen": session.root_fen, "moves": moves})
+        return session
+    else:
+        raise SessionError(f"Unknown message type: {kind}")
+
+    if session.bot_to_move:
+        await websocket.send_json(await run_in_threadpool(_session_bot_move, session))
+        if session.push_analysis and not session.is_over:
+            analysis_push.start(session)
+    return session
+
+
+@app.websocket("/ws/game")
+async def game_session_socket(websocket: WebSocket):
+    """
+    有狀態的對局連線：伺服器保存棋盤（含歷史）、棋鐘與搜尋統計。
+    客戶端訊息：new（開局設定）、move（UCI 走法）、analysis、sync；
+    伺服器推送 session、bot_move、analysis、sync、game_over 與 error。
+    """
+    await websocket.accept()
+    session = None
+    analysis_push = SessionAnalysisPush(websocket)
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+                if not isinstance(message, dict):
+                    raise SessionError("Messages must be JSON objects")
+                session = await _handle_session_message(websocket, session, message, analysis_push)
+            except json.JSONDecodeError:
+                await websocket.send_json({"type": "error", "detail": "Invalid JSON"})
+            except SessionError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        analysis_push.cancel()
+        if session is not None:
+            _close_game_session(session)
+
 # 3. 相容性端點 (保留舊版 API)
 @app.post("/analyze")
 def analyze_game(request: BoardRequest):
@@ -288,11 +1068,12 @@ def analyze_game(request: BoardRequest):
         return {"game_over": True, "result": board.result()}
 
     # 使用新的分析引擎，加上時限
-    analysis = chess_engine.get_analysis(
-        board, 
-        depth=request.depth,
-        time_limit=3.0
-    )
+    with chess_engine.tt_partition("analysis"):
+        analysis = chess_engine.get_analysis(
+            board, 
+            depth=request.depth,
+            time_limit=3.0
+        )
     game_phase = chess_engine.detect_game_phase(board)
 
     return {
@@ -358,6 +1139,8 @@ def _stockfish_wdl(info, color=chess.WHITE):
 
 
 def _analyze_full_with_stockfish(game, perspective, stockfish_path, nodes):
+    import chess.engine
+
     board = game.board()
     evaluations = []
     orient = lambda value: value if perspective == "white" else -value
@@ -382,6 +1165,7 @@ def _analyze_full_with_stockfish(game, perspective, stockfish_path, nodes):
         })
 
         for move_count, move in enumerate(game.mainline_moves(), start=1):
+            chess_engine.check_cancelled()
             side = "white" if board.turn == chess.WHITE else "black"
             mover = board.turn
             best_info = engine.analyse(board, limit)
@@ -428,6 +1212,7 @@ def _analyze_full_with_stockfish(game, perspective, stockfish_path, nodes):
 
 def _analyze_full_with_custom_engine(game, perspective, depth):
     board = game.board()
+    history = chess_engine.SearchHistory(board)
     evaluations = []
     chess_engine.begin_search_generation(deadline=time.monotonic() + 20.0)
 
@@ -445,6 +1230,7 @@ def _analyze_full_with_custom_engine(game, perspective, depth):
                 -math.inf,
                 math.inf,
                 search_board.turn == chess.WHITE,
+                history=history,
             )
         except chess_engine.SearchTimeout:
             return chess_engine.evaluate_board(search_board), None
@@ -463,6 +1249,7 @@ def _analyze_full_with_custom_engine(game, perspective, depth):
 
     move_count = 1
     for move in game.mainline_moves():
+        chess_engine.check_cancelled()
         side = "white" if board.turn == chess.WHITE else "black"
         
         # 1. 計算這一步之前的「最佳建議」
@@ -471,6 +1258,7 @@ def _analyze_full_with_custom_engine(game, perspective, depth):
 
         # 2. 執行「實際走的那一步」
         board.push(move)
+        history.push(board)
         move_eval, _ = search_position(board, depth - 1)
         fen_after = board.fen()
         is_checkmate = board.is_checkmate()
@@ -509,8 +1297,22 @@ def _analyze_full_with_custom_engine(game, perspective, depth):
 
 
 # 完整賽局分析：優先使用 Stockfish 作賽後裁判；遊戲走子仍由自製引擎負責。
+def _analyze_full(game, perspective, depth):
+    stockfish_path = _find_stockfish_path()
+    if stockfish_path:
+        nodes = max(100, int(os.getenv("STOCKFISH_REVIEW_NODES", "4000")))
+        try:
+            return _analyze_full_with_stockfish(game, perspective, stockfish_path, nodes)
+        except chess_engine.SearchCancelled:
+            raise
+        except Exception as exc:
+            print(f"Stockfish 賽後分析失敗，改用自製引擎: {exc}")
+
+    return _analyze_full_with_custom_engine(game, perspective, depth)
+
+
 @app.post("/analyze_full")
-def analyze_full_game(request: AnalysisRequest):
+async def analyze_full_game(request: AnalysisRequest, http_request: Request):
     game = chess.pgn.read_game(io.StringIO(request.pgn))
     if not game:
         raise HTTPException(status_code=400, detail="Invalid PGN")
@@ -519,20 +1321,25 @@ def analyze_full_game(request: AnalysisRequest):
     if perspective not in ("white", "black"):
         perspective = "white"
 
-    stockfish_path = _find_stockfish_path()
-    if stockfish_path:
-        nodes = max(100, int(os.getenv("STOCKFISH_REVIEW_NODES", "4000")))
+    # 長棋譜可能跑數十秒；客戶端離線後每一步之間與搜尋節點內都會停下。
+    async with cancel_on_disconnect(http_request) as cancel_event:
         try:
-            return _analyze_full_with_stockfish(game, perspective, stockfish_path, nodes)
-        except Exception as exc:
-            print(f"Stockfish 賽後分析失敗，改用自製引擎: {exc}")
-
-    return _analyze_full_with_custom_engine(game, perspective, request.depth)
+            return await _coalesced(
+                _review_key(game, perspective, request.depth),
+                cancel_event,
+                _analyze_full,
+                game,
+                perspective,
+                request.depth,
+            )
+        except chess_engine.SearchCancelled:
+            _raise_if_disconnected(cancel_event)
+            raise
 
 # 3. 儲存比賽
 @app.post("/games", response_model=GameResponse)
-def save_game(game: GameCreate, db: Session = Depends(get_db)):
-    db_game = Game(
+def save_game(game: GameCreate, db=Depends(get_db)):
+    db_game = _database().Game(
         pgn=game.pgn,
         result=game.result,
         fen=game.fen,
@@ -546,7 +1353,8 @@ def save_game(game: GameCreate, db: Session = Depends(get_db)):
 
 # 4. 查詢歷史比賽
 @app.get("/games", response_model=List[GameResponse])
-def read_games(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+def read_games(skip: int = 0, limit: int = 10, db=Depends(get_db)):
+    Game = _database().Game
     games = db.query(Game).order_by(Game.date.desc()).offset(skip).limit(limit).all()
     return games
 
@@ -555,18 +1363,19 @@ class ExplainRequest(BaseModel):
     fen: str
     history: str = ""
     question: Optional[str] = None
-    depth: int = 5
+    depth: int = DEFAULT_ANALYSIS_DEPTH
+    time_limit: float = DEFAULT_ANALYSIS_TIME_LIMIT
     max_question_length: int = 200
 
 @app.post("/explain")
-def explain_position(request: ExplainRequest):
+async def explain_position(request: ExplainRequest):
     """
     相容性端點，提供 AI 教練建議
     建議使用 /get_analysis 替代，功能更完整
     """
-    if not get_rag_engine:
-        return {"advice": "RAG 引擎未啟動，請檢查 API Key 設定"}
-    
+    # 預算從請求進來就開始計時；教練引擎的載入在 "coach_startup" 階段內等待。
+    budget = RequestBudget(request.time_limit)
+
     # 安全防禦：清洗用戶輸入
     user_question = request.question or "請評估目前局勢並給出建議"
     
@@ -583,26 +1392,40 @@ def explain_position(request: ExplainRequest):
     try:
         board = chess.Board(request.fen)
         if not board.is_game_over():
-            analysis = chess_engine.get_analysis(
-                board, 
+            analysis = await _coalesced(
+                _analysis_key(board, request.depth, budget),
+                None,
+                chess_engine.get_analysis,
+                board,
                 depth=request.depth,
-                time_limit=4.0
+                budget=budget,
             )
             pv_line = analysis['pv']
             pv_score = analysis['score']
-            teaching_analysis = chess_engine.get_teaching_analysis(
+            teaching_analysis = await _coalesced(
+                _teaching_key(board, analysis, TEACHING_CANDIDATE_COUNT, budget),
+                None,
+                chess_engine.get_teaching_analysis,
                 board,
                 analysis,
-                time_limit=0.8,
+                candidate_count=TEACHING_CANDIDATE_COUNT,
+                budget=budget,
             )
             print(f"PV Line: {pv_line} | Score: {analysis['eval_display']} | Win%: {analysis['winning_chance']}% | From Book: {analysis.get('from_book', False)}")
     except Exception as e:
         print(f"引擎分析失敗: {e}")
-    
+
+    try:
+        rag_engine = await _load_coach(budget)
+    except asyncio.TimeoutError:
+        return {"advice": COACH_STARTING_MESSAGE, "coach_reply": None}
+    if not rag_engine:
+        return {"advice": "RAG 引擎未啟動，請檢查 API Key 設定", "coach_reply": None}
+
     # 傳遞給 RAG 教練
     try:
-        rag_engine = get_rag_engine()
-        advice = rag_engine.get_advice(
+        advice = await run_in_threadpool(
+            rag_engine.get_advice,
             request.fen,
             request.history,
             user_question,
@@ -610,9 +1433,11 @@ def explain_position(request: ExplainRequest):
             pv_score=pv_score,
             analysis_result=analysis,
             teaching_analysis=teaching_analysis,
+            budget=budget,
         )
     except Exception as e:
         print(f"RAG 分析失敗: {e}")
-        advice = "教練分析暫時無法使用"
-    
-    return {"advice": advice}
+        return {"advice": "教練分析暫時無法使用", "coach_reply": None}
+
+    coach_reply = await _coach_reply(rag_engine, advice, request.question and user_question, budget)
+    return {"advice": advice, "coach_reply": coach_reply}
@@ -0,0 +1,173 @@
+"""Fixed-depth engine bench with a deterministic node signature.
+
+Every position is searched at the same depth through ``get_analysis`` with a
+cleared transposition table, so the total node count is a signature of the
+search itself: a change to ``minimax``, ``order_moves`` or the evaluator that
+alters the tree changes it, while a pure speedup keeps it and shows up as
+nodes per second. ``--baseline`` compares a run against a stored JSON report.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import chess
+
+import chess_engine
+
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BACKEND_DIR, "calibration", "bench_baseline.json")
+DEFAULT_DEPTH = 3
+
+# Openings, middlegames and endgames, including long-halfmove and promotion races.
+BENCH_POSITIONS = (
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 10",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 11",
+    "4rrk1/pp1n3p/3q2pQ/2p1pb2/2PP4/2P3N1/P2B2PP/4RRK1 b - - 7 19",
+    "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15",
+    "r1bbk1nr/pp3p1p/2n5/1N4p1/2Np1B2/8/PPP2PPP/2KR1B1R w kq - 0 13",
+    "r1bq1rk1/ppp1nppp/4n3/3p3Q/3P4/1BP1B3/PP1N2PP/R4RK1 w - - 1 16",
+    "4r1k1/r1q2ppp/ppp2n2/4P3/5Rb1/1N1BQ3/PPP3PP/R5K1 w - - 1 17",
+    "2rqkb1r/ppp2p2/2npb1p1/1N1Nn2p/2P1PP2/8/PP2B1PP/R1BQK2R b KQ - 0 11",
+    "r1bq1r1k/b1p1npp1/p2p3p/1p6/3PP3/1B2NN2/PP3PPP/R2Q1RK1 w - - 1 16",
+    "3r1rk1/p5pp/bpp1pp2/8/q1PP1P2/b3P3/P2NQRPP/1R2B1K1 b - - 6 22",
+    "r1q2rk1/2p1bppp/2Pp4/p6b/Q1PNp3/4B3/PP1R1PPP/2K4R w - - 2 18",
+    "4k2r/1pb2ppp/1p2p3/1R1p4/3P4/2r1PN2/P4PPP/1R4K1 b - - 3 22",
+    "3q2k1/pb3p1p/4pbp1/2r5/PpN2N2/1P2P2P/5PP1/Q2R2K1 b - - 4 26",
+    "6k1/6p1/6Pp/ppp5/3pn2P/1P3K2/1PP2P2/3N4 b - - 0 1",
+    "3b4/5kp1/1p1p1p1p/pP1PpP1P/P1P1P3/3KN3/8/8 w - - 0 1",
+    "8/6pk/1p6/8/PP3p1p/5P2/4KP1q/3Q4 w - - 0 1",
+    "7k/3p2pp/4q3/8/4Q3/5Kp1/P6b/8 w - - 0 1",
+    "8/2p5/8/2kPKp1p/2p4P/2P5/3P4/8 w - - 0 1",
+    "8/1p3pp1/7p/5P1P/2k3P1/8/2K2P2/8 w - - 0 1",
+    "8/pp2r1k1/2p1p3/3pP2p/1P1P1P1P/P5KR/8/8 w - - 0 1",
+    "8/3p4/p1bk3p/Pp6/1Kp1PpPp/2P2P1P/2P5/5B2 b - - 0 1",
+    "5k2/7R/4P2p/5K2/p1r2P1p/8/8/8 b - - 0 1",
+    "6k1/6p1/P6p/r1N5/5p2/7P/1b3PP1/4R1K1 w - - 0 1",
+    "1r3k2/4q3/2Pp3b/3Bp3/2Q2p2/1p1P2P1/1P2KP2/3N4 w - - 0 1",
+    "6k1/4pp1p/3p2p1/P1pPb3/R7/1r2P1PP/3B1P2/6K1 w - - 0 1",
+    "8/3p3B/5p2/5P2/p7/PP5b/k7/6K1 w - - 0 1",
+    "5rk1/q6p/2p3bR/1pPp1rP1/1P1Pp3/P3B1Q1/1K3P2/R7 w - - 93 90",
+    "4rrk1/1p1nq3/p7/2p1P1pp/3P2bp/3Q1Bn1/PPPB4/1K2R1NR w - - 40 21",
+    "r3k2r/3nnpbp/q2pp1p1/p7/Pp1PPPP1/4BNN1/1P5P/R2Q1RK1 w kq - 0 16",
+    "3Qb1k1/1r2ppb1/pN1n2q1/Pp1Pp1Pr/4P2p/4BP2/4B1R1/1R5K b - - 11 40",
+    "4k3/3q1r2/1N2r1b1/3ppN2/2nPP3/1B1R2n1/2R1Q3/3K4 w - - 5 1",
+    "8/8/8/8/5kp1/P7/8/1K1N4 w - - 0 1",
+    "8/8/8/5N2/8/p7/8/2NK3k w - - 0 1",
+    "8/8/1P6/5pr1/8/4R3/7k/2K5 w - - 0 1",
+    "8/2p4P/8/kr6/6R1/8/8/1K6 w - - 0 1",
+    "8/8/3P3k/8/1p6/8/1P6/1K3n2 b - - 0 1",
+    "8/R7/2q5/8/6k1/8/1P5p/K6R w - - 0 124",
+    "6k1/3b3r/1p1p4/p1n2p2/1PPNpP1q/P3Q1p1/1R1RB1P1/5K2 b - - 0 1",
+    "r2r1n2/pp2bk2/2p1p2p/3q4/3PN1QP/2P3R1/P4PP1/5RK1 w - - 0 1",
+)
+
+
+def bench_position(fen, depth=DEFAULT_DEPTH):
+    """Search one position from a cleared transposition table."""
+    chess_engine.reset_transposition_table()
+    board = chess.Board(fen)
+    started_at = time.perf_counter()
+    analysis = chess_engine.get_analysis(board, depth=depth, use_book=False, adaptive_depth=False)
+    elapsed = time.perf_counter() - started_at
+    best_move = analysis["best_move"]
+    return {
+        "fen": fen,
+        "nodes": analysis["nodes"],
+        "best_move": best_move.uci() if best_move else None,
+        "score": analysis["score"],
+        "seconds": round(elapsed, 3),
+        "nps": round(analysis["nodes"] / elapsed) if elapsed > 0 else 0,
+    }
+
+
+def run(depth=DEFAULT_DEPTH, positions=BENCH_POSITIONS):
+    """Bench every position; ``signature`` is the total node count."""
+    results = [bench_position(fen, depth) for fen in positions]
+    nodes = sum(item["nodes"] for item in results)
+    seconds = sum(item["seconds"] for item in results)
+    return {
+        "depth": depth,
+        "positions": len(results),
+        "signature": nodes,
+        "seconds": round(seconds, 3),
+        "nps": round(nodes / seconds) if seconds > 0 else 0,
+        "results": results,
+    }
+
+
+def compare(report, baseline):
+    """Compare a bench report with a stored one: functional drift and speed."""
+    baseline_results = {item["fen"]: item for item in baseline["results"]}
+    drifted = []
+    for item in report["results"]:
+        stored = baseline_results.get(item["fen"])
+        if stored is None or (stored["nodes"], stored["best_move"]) != (item["nodes"], item["best_move"]):
+            drifted.append({
+                "fen": item["fen"],
+                "nodes": item["nodes"],
+                "baseline_nodes": stored["nodes"] if stored else None,
+                "best_move": item["best_move"],
+                "baseline_best_move": stored["best_move"] if stored else None,
+            })
+    return {
+        "signature_match": report["depth"] == baseline["depth"] and report["signature"] == baseline["signature"],
+        "signature": report["signature"],
+        "baseline_signature": baseline["signature"],
+        "speedup": round(report["nps"] / baseline["nps"], 3) if baseline["nps"] else None,
+        "drifted": drifted,
+    }
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bench the engine at a fixed depth and report its node signature.")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="Fixed search depth.")
+    parser.add_argument("--baseline", nargs="?", const=BASELINE_PATH, help="Compare with a stored report.")
+    parser.add_argument("--save-baseline", nargs="?", const=BASELINE_PATH, help="Write this run as the baseline.")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON.")
+    args = parser.parse_args()
+
+    report = run(args.depth)
+    comparison = compare(report, load_baseline(args.baseline)) if args.baseline else None
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, ensure_ascii=False, indent=2)
+            handle.write("\n")
+
+    if args.json:
+        print(json.dumps({**report, "comparison": comparison}, ensure_ascii=False, indent=2))
+    else:
+        for index, item in enumerate(report["results"], start=1):
+            print(
+                f"  {index:2d}. nodes={item['nodes']:7d} {item['seconds']:6.2f}s {item['nps']:6d} nodes/s "
+                f"best={item['best_move']} score={item['score']}  {item['fen']}"
+            )
+        print(
+            f"Bench depth {report['depth']}: {report['positions']} positions, signature {report['signature']}, "
+            f"{report['seconds']:.2f}s, {report['nps']} nodes/s"
+        )
+        if comparison:
+            status = "match" if comparison["signature_match"] else "DRIFT"
+            print(
+                f"Baseline signature {comparison['baseline_signature']}: {status}, "
+                f"speed x{comparison['speedup']}"
+            )
+            for item in comparison["drifted"]:
+                print(
+                    f"  drift: nodes {item['baseline_nodes']} -> {item['nodes']}, "
+                    f"best {item['baseline_best_move']} -> {item['best_move']}  {item['fen']}"
+                )
+    if comparison and not comparison["signature_match"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 import chess
+import itertools
 import math
 import chess.polyglot
 import os
 import threading
 import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 
+from search_board import SearchBoard, zobrist_hash
+from transposition import PartitionedTranspositionTable
+
 from evaluation import (
     BISHOP_TABLE,
     DEFAULT_EVALUATOR,
@@ -18,12 +23,17 @@ from evaluation import (
     QUEEN_TABLE,
     ROOK_TABLE,
     get_piece_square_value,
+    insufficient_material,
     middlegame_king_exposure_penalty,
 )
 
-# Transposition table shared across iterative-deepening passes and requests.
-transposition_table = {}
+# Transposition table shared across iterative-deepening passes and requests,
+# partitioned per game or workload (see ``tt_partition``).
 TT_MAX_ENTRIES = 200_000
+# Largest share of the table one partition kind may hold; batch game reviews
+# evict their own entries instead of every live game's.
+TT_PARTITION_LIMITS = {"review": 0.25}
+transposition_table = PartitionedTranspositionTable(TT_MAX_ENTRIES, limits=TT_PARTITION_LIMITS)
 TT_EXACT = "exact"
 TT_LOWER = "lower"
 TT_UPPER = "upper"
@@ -37,14 +47,46 @@ search_stats = {
     "lmr_researches": 0,
     "candidate_cache_hits": 0,
     "candidate_bound_skips": 0,
+    "quiescence_tt_hits": 0,
+    "legality_checks": 0,
 }
-search_runtime = threading.local()
+
+
+class SearchRuntime(threading.local):
+    """Per-thread search limits, node count and TT generation.
+
+    Node budgets count only the calling thread's nodes, and TT replacement
+    uses the generation the search started with, so a budgeted search stops
+    at the same node however many other searches run concurrently. The
+    cancel event outlives single searches; see ``search_cancellation``.
+    """
+
+    deadline = None
+    node_limit = None
+    nodes = 0
+    generation = 0
+    cancel_event = None
+
+
+search_runtime = SearchRuntime()
 ENGINE_DIR = os.path.dirname(os.path.abspath(__file__))
 BOOK_PATH = os.path.join(ENGINE_DIR, "books", "gm2001.bin")
 
 # --- 評估與搜尋合約常數 ---
 MATE_THRESHOLD = 15000
 ONLY_MOVE_LOSS_CP = 250
+# get_teaching_analysis searches candidates in this share of its time limit and
+# keeps the rest for their reasons, themes and PVs.
+TEACHING_SEARCH_SHARE = 0.9
+QUIESCENCE_MAX_DEPTH = 10
+# Quiescence TT entries use depths below zero (-1 at the first capture, one
+# lower per capture ply), so they never answer a main-search probe while a
+# depth-0 leaf entry, which is a full quiescence result, still answers them.
+QUIESCENCE_TT_DEPTH = -1
+# A repeated position scores as a draw unless one side is this far ahead; that
+# side then sees it as a heavy loss, so a winning engine does not shuffle.
+REPETITION_CONTEMPT_THRESHOLD = 500
+REPETITION_AVOIDANCE_SCORE = 1000
 
 # Backwards-compatible aliases for search helpers and external callers. The
 # authoritative definitions now live under backend/evaluation/.
@@ -57,6 +99,11 @@ queenstable = QUEEN_TABLE
 king_table_opening = KING_TABLE_OPENING
 king_table_endgame = KING_TABLE_ENDGAME
 
+# With a root move table, the overlay searches at most this many extra candidates.
+OVERLAY_SEARCH_LIMIT = 4
+# Share of the time budget given to the main search when a move overlay follows.
+OVERLAY_SEARCH_SHARE = 0.8
+
 DIFFICULTY_MOVE_PROFILES = {
     "newbie": {"target_loss": 220, "max_loss": 350, "error_rate": 60, "candidates": 18},
     "beginner": {"target_loss": 140, "max_loss": 240, "error_rate": 45, "candidates": 16},
@@ -75,48 +122,146 @@ class TTEntry:
     generation: int
 
 
+@dataclass(frozen=True)
+class RootMoveScore:
+    depth: int
+    score: int | float
+    flag: str
+
+
 class SearchTimeout(Exception):
     pass
 
 
+class NodeLimitReached(SearchTimeout):
+    """The search used up its node budget (see ``begin_search_generation``)."""
+
+
+class SearchCancelled(SearchTimeout):
+    """The caller cancelled the search (see ``search_cancellation``)."""
+
+
+@contextmanager
+def search_cancellation(cancel_event):
+    """Stop every search on this thread once ``cancel_event`` is set.
+
+    Searches raise ``SearchCancelled`` within 64 nodes of the event being set;
+    loops that run several searches can call ``check_cancelled`` between them.
+    """
+    previous = search_runtime.cancel_event
+    search_runtime.cancel_event = cancel_event
+    try:
+        yield cancel_event
+    finally:
+        search_runtime.cancel_event = previous
+
+
+def check_cancelled():
+    cancel_event = search_runtime.cancel_event
+    if cancel_event is not None and cancel_event.is_set():
+        raise SearchCancelled
+
+
 def visit_search_node():
     search_stats["nodes"] += 1
-    if search_stats["nodes"] % 64 != 0:
+    runtime = search_runtime
+    nodes = runtime.nodes = runtime.nodes + 1
+    if runtime.node_limit is not None and nodes > runtime.node_limit:
+        raise NodeLimitReached
+    if nodes % 64 != 0:
         return
-    deadline = getattr(search_runtime, "deadline", None)
+    deadline = runtime.deadline
     if deadline is not None and time.monotonic() >= deadline:
         raise SearchTimeout
+    cancel_event = runtime.cancel_event
+    if cancel_event is not None and cancel_event.is_set():
+        raise SearchCancelled
 
 
-def tt_key(board, use_lmr=True):
+def tt_key(board, use_lmr=True, position_hash=None):
     """Partition cached search results by position and selective-search mode."""
-    return chess.polyglot.zobrist_hash(board), board.halfmove_clock, bool(use_lmr)
+    if position_hash is None:
+        position_hash = zobrist_hash(board)
+    return position_hash, board.halfmove_clock, bool(use_lmr)
 
 
-def build_repetition_counts(board):
-    counts = {}
-    history = board.copy(stack=True)
-    while True:
-        position_hash = chess.polyglot.zobrist_hash(history)
-        counts[position_hash] = counts.get(position_hash, 0) + 1
-        if not history.move_stack:
-            break
-        history.pop()
-    return counts
+class SearchHistory:
+    """Zobrist hashes of the game's reversible tail plus the current search path.
 
+    Only positions since the last capture or pawn move can recur, so the stack
+    is seeded from the last ``halfmove_clock`` plies instead of the whole
+    game, and per-hash counts answer repetition queries in O(1). The top of
+    the stack is always the position being searched; callers push and pop it
+    together with the board.
+    """
+
+    __slots__ = ("hashes", "counts")
+
+    def __init__(self, board):
+        self.hashes = []
+        self.counts = {}
+        if isinstance(board, SearchBoard):
+            tail = board.reversible_hashes()
+        else:
+            window = min(board.halfmove_clock, len(board.move_stack))
+            history = board.copy(stack=window)
+            tail = [chess.polyglot.zobrist_hash(history)]
+            for _ in range(window):
+                history.pop()
+                tail.append(chess.polyglot.zobrist_hash(history))
+            tail.reverse()
+        for position_hash in tail:
+            self._append(position_hash)
+
+    def _append(self, position_hash):
+        self.hashes.append(position_hash)
+        self.counts[position_hash] = self.counts.get(position_hash, 0) + 1
+
+    @property
+    def current(self):
+        return self.hashes[-1]
+
+    def push(self, board):
+        position_hash = zobrist_hash(board)
+        self._append(position_hash)
+        return position_hash
+
+    def pop(self):
+        position_hash = self.hashes.pop()
+        remaining = self.counts[position_hash] - 1
+        if remaining:
+            self.counts[position_hash] = remaining
+        else:
+            del self.counts[position_hash]
 
-def push_repetition(repetition_counts, board):
-    position_hash = chess.polyglot.zobrist_hash(board)
-    repetition_counts[position_hash] = repetition_counts.get(position_hash, 0) + 1
-    return position_hash
+    def occurrences(self):
+        """How many times the current position has occurred, itself included."""
+        return self.counts[self.hashes[-1]]
 
 
-def pop_repetition(repetition_counts, position_hash):
-    remaining = repetition_counts[position_hash] - 1
-    if remaining:
-        repetition_counts[position_hash] = remaining
+def repetition_draw_score(board, ply_from_root):
+    """Search-level score for a repeated position.
+
+    A repetition is a draw, except that the side clearly ahead on the static
+    evaluation is steered away from it.
+    """
+    static_score = evaluate_board(board, ply_from_root, check_terminal=False)
+    if static_score > REPETITION_CONTEMPT_THRESHOLD:
+        return -REPETITION_AVOIDANCE_SCORE
+    if static_score < -REPETITION_CONTEMPT_THRESHOLD:
+        return REPETITION_AVOIDANCE_SCORE
+    return 0
+
+
+def record_root_score(root_scores, move, score, depth, window_low, window_high):
+    """Remember a root move's score and whether the search window bounded it."""
+    if score <= window_low:
+        flag = TT_UPPER
+    elif score >= window_high:
+        flag = TT_LOWER
     else:
-        repetition_counts.pop(position_hash)
+        flag = TT_EXACT
+    root_scores[move] = RootMoveScore(depth=depth, score=score, flag=flag)
 
 
 def score_to_tt(score, ply_from_root):
@@ -136,23 +281,22 @@ def score_from_tt(score, ply_from_root):
 
 
 def store_tt(key, depth, score, flag, best_move, ply_from_root):
+    generation = search_runtime.generation
     current = transposition_table.get(key)
-    if current and current.generation == tt_generation and current.depth > depth:
+    if current and current.generation == generation and current.depth > depth:
         return
 
-    if key not in transposition_table and len(transposition_table) >= TT_MAX_ENTRIES:
-        transposition_table.pop(next(iter(transposition_table)))
-
+    # A full table evicts the oldest entry of the largest partition (fair share).
     transposition_table[key] = TTEntry(
         depth=depth,
         score=score_to_tt(score, ply_from_root),
         flag=flag,
         best_move=best_move,
-        generation=tt_generation,
+        generation=generation,
     )
 
 
-def begin_search_generation(deadline=None):
+def begin_search_generation(deadline=None, node_limit=None):
     global tt_generation
     tt_generation += 1
     search_stats.update(
@@ -164,21 +308,37 @@ def begin_search_generation(deadline=None):
         lmr_researches=0,
         candidate_cache_hits=0,
         candidate_bound_skips=0,
+        quiescence_tt_hits=0,
+        legality_checks=0,
     )
     search_runtime.deadline = deadline
-
-    if len(transposition_table) > TT_MAX_ENTRIES // 2:
-        oldest_allowed = tt_generation - 2
+    search_runtime.node_limit = node_limit
+    search_runtime.nodes = 0
+    search_runtime.generation = tt_generation
+
+    # Age is measured in this partition's own searches: bot moves of a live
+    # game keep their entries however many analyses run elsewhere.
+    oldest_allowed = transposition_table.begin_search(tt_generation)
+    if oldest_allowed is not None and transposition_table.total_size() > transposition_table.capacity // 2:
         stale_keys = [
-            key for key, entry in transposition_table.items()
+            key for key, entry in list(transposition_table.items())
             if entry.generation < oldest_allowed
         ]
         for key in stale_keys:
             transposition_table.pop(key, None)
 
 
+def tt_partition(name):
+    """Context manager: this thread's searches use TT partition ``name``.
+
+    Names are ``"kind"`` or ``"kind:key"`` (one partition per game), and
+    statistics are reported per kind.
+    """
+    return transposition_table.use_partition(name)
+
+
 def reset_transposition_table():
-    transposition_table.clear()
+    transposition_table.reset()
     search_stats.update(
         nodes=0,
         tt_hits=0,
@@ -188,8 +348,12 @@ def reset_transposition_table():
         lmr_researches=0,
         candidate_cache_hits=0,
         candidate_bound_skips=0,
+        quiescence_tt_hits=0,
+        legality_checks=0,
     )
     search_runtime.deadline = None
+    search_runtime.node_limit = None
+    search_runtime.nodes = 0
 
 def format_evaluation(score):
     """將 centipawn 分數格式化為用戶友好的顯示"""
@@ -212,8 +376,9 @@ def calculate_winning_chance(score):
     except OverflowError:
         return 100.0 if score > 0 else 0.0
 
-def order_moves(board, tt_best_move=None):
-    moves = list(board.legal_moves)
+def order_moves(board, tt_best_move=None, moves=None):
+    if moves is None:
+        moves = board.legal_moves
     
     def score_move(move):
         if move == tt_best_move:
@@ -241,6 +406,44 @@ def order_moves(board, tt_best_move=None):
 
     return sorted(moves, key=score_move, reverse=True)
 
+
+def legal_move_test(board):
+    """Return a pin and king-safety test for pseudo-legal moves when not in check.
+
+    The king square and pinned pieces are computed once per node; each call
+    counts as one ``legality_checks`` in the search stats.
+    """
+    king = board.king(board.turn)
+    if king is None:
+        return lambda move: True
+    blockers = board._slider_blockers(king)
+
+    def is_legal(move):
+        search_stats["legality_checks"] += 1
+        return board._is_safe(king, blockers, move)
+
+    return is_legal
+
+
+def search_moves(board, tt_best_move=None):
+    """Yield the legal moves of a search node best-first, testing legality lazily.
+
+    Out of check the transposition-table move is tried before anything else is
+    generated, then the remaining pseudo-legal moves are ordered; legality is
+    tested only on a move the search is about to play, so a beta cutoff skips
+    both the ordering and the tests of the moves after it. In check, the few
+    legal evasions are generated directly.
+    """
+    if board.is_check():
+        yield from order_moves(board, tt_best_move)
+        return
+    is_legal = legal_move_test(board)
+    if tt_best_move is not None and board.is_pseudo_legal(tt_best_move) and is_legal(tt_best_move):
+        yield tt_best_move
+    for move in order_moves(board, moves=board.generate_pseudo_legal_moves()):
+        if move != tt_best_move and is_legal(move):
+            yield move
+
 def choose_book_entry(reader, board):
     """Return the highest-weight Polyglot entry for deterministic book play."""
     entries = list(reader.find_all(board))
@@ -248,6 +451,16 @@ def choose_book_entry(reader, board):
         return None
     return max(entries, key=lambda entry: entry.weight)
 
+def warm_opening_book():
+    """Read the Polyglot book once so the first book probe hits the page cache."""
+    if not os.path.isfile(BOOK_PATH):
+        return 0
+    with open(BOOK_PATH, "rb") as handle:
+        while handle.read(1 << 20):
+            pass
+    with chess.polyglot.open_reader(BOOK_PATH) as reader:
+        return len(list(reader.find_all(chess.Board())))
+
 def build_book_line(reader, board, first_move, max_plies=6):
     """Build a short SAN book line from the current position."""
     line = []
@@ -268,39 +481,129 @@ def build_book_line(reader, board, first_move, max_plies=6):
 
     return line
 
-def evaluate_board(board, ply_from_root=0):
+def evaluate_board(board, ply_from_root=0, check_terminal=True):
     """Compatibility score entrypoint used by search and API fallbacks."""
-    return DEFAULT_EVALUATOR.score(board, ply_from_root)
+    return DEFAULT_EVALUATOR.score(board, ply_from_root, check_terminal)
 
 
 def evaluate_position(board, ply_from_root=0):
     """Return the modular evaluator's score, phase, and component breakdown."""
     return DEFAULT_EVALUATOR.evaluate(board, ply_from_root)
 
+def search_termination(board, has_legal_moves, history=None):
+    """Return the termination ``board.outcome()`` would report, or None.
+
+    Search already knows whether the side to move has a legal move from its
+    own move generation, and counts repetitions in its ``SearchHistory``, so
+    this never regenerates moves or replays the move stack.
+    """
+    if not has_legal_moves and board.is_check():
+        return chess.Termination.CHECKMATE
+    if insufficient_material(board):
+        return chess.Termination.INSUFFICIENT_MATERIAL
+    if not has_legal_moves:
+        return chess.Termination.STALEMATE
+    if board.halfmove_clock >= 150:
+        return chess.Termination.SEVENTYFIVE_MOVES
+    if history is not None:
+        if history.occurrences() >= 5:
+            return chess.Termination.FIVEFOLD_REPETITION
+    # A fivefold repetition needs at least 16 reversible plies.
+    elif board.halfmove_clock >= 16 and board.is_fivefold_repetition():
+        return chess.Termination.FIVEFOLD_REPETITION
+    return None
+
+
+def tactical_moves(board):
+    """Pseudo-legal captures and quiet promotions, most valuable victim first."""
+    moves = list(board.generate_pseudo_legal_captures())
+    promotion_rank = chess.BB_RANK_7 if board.turn == chess.WHITE else chess.BB_RANK_2
+    back_rank = chess.BB_RANK_8 if board.turn == chess.WHITE else chess.BB_RANK_1
+    promoting_pawns = board.pawns & board.occupied_co[board.turn] & promotion_rank
+    if promoting_pawns:
+        moves.extend(board.generate_pseudo_legal_moves(promoting_pawns, back_rank & ~board.occupied))
+
+    def score_move(move):
+        victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+        attacker = board.piece_type_at(move.from_square)
+        score = piece_values.get(victim, 0) * 10 - piece_values.get(attacker, 0) if victim else 0
+        if move.promotion:
+            score += piece_values.get(move.promotion, 0)
+        return score
+
+    return sorted(moves, key=score_move, reverse=True)
+
+
 def quiescence_search(board, alpha, beta, q_depth=0, ply_from_root=0):
     visit_search_node()
-    if board.is_game_over():
+    if q_depth > QUIESCENCE_MAX_DEPTH:
         return evaluate_board(board, ply_from_root)
 
-    if q_depth > 10:
+    if board.is_check():
+        moves = order_moves(board)
+        is_legal = None
+        has_legal_moves = bool(moves)
+    else:
+        # Captures are generated only past the stand-pat test and tested for
+        # legality only when searched. Stalemate is checked only when none of
+        # them turns out to be legal (see ``_quiescence_moves``).
+        moves = None
+        is_legal = legal_move_test(board)
+        has_legal_moves = True
+    if search_termination(board, has_legal_moves) is not None:
         return evaluate_board(board, ply_from_root)
 
-    in_check = board.is_check()
-    stand_pat = evaluate_board(board, ply_from_root)
-    if in_check:
-        tactical_moves = order_moves(board)
-    else:
-        tactical_moves = [
-            move for move in order_moves(board)
-            if board.is_capture(move) or move.promotion
-        ]
+    # After a capture or pawn move the stored score cannot depend on the
+    # path: no earlier position can repeat. The leaf itself is stored by minimax.
+    key = None
+    if q_depth and board.halfmove_clock == 0:
+        key = tt_key(board)
+        tt_depth = QUIESCENCE_TT_DEPTH - q_depth
+        entry = transposition_table.probe(key)
+        if entry and tt_depth <= entry.depth <= 0:
+            cached_score = score_from_tt(entry.score, ply_from_root)
+            if entry.flag == TT_EXACT:
+                search_stats["quiescence_tt_hits"] += 1
+                return max(alpha, min(beta, cached_score))
+            if entry.flag == TT_LOWER and cached_score >= beta:
+                search_stats["quiescence_tt_hits"] += 1
+                return beta
+            if entry.flag == TT_UPPER and cached_score <= alpha:
+                search_stats["quiescence_tt_hits"] += 1
+                return alpha
+
+    score = _quiescence_moves(board, moves, is_legal, alpha, beta, q_depth, ply_from_root)
+    if key is not None:
+        if score <= alpha:
+            flag = TT_UPPER
+        elif score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        store_tt(key, tt_depth, score, flag, None, ply_from_root)
+    return score
+
+
+def _quiescence_moves(board, moves, is_legal, alpha, beta, q_depth, ply_from_root):
+    """Search ``moves``, or the tactical moves after a stand-pat test when None.
 
+    Out of check, a node where no tactical move is legal probes the quiet
+    moves for a legal one and scores a stalemate as terminal.
+    """
+    in_check = moves is not None
+    if not in_check:
+        stand_pat = evaluate_board(board, ply_from_root, check_terminal=False)
+    searched = False
     if board.turn == chess.WHITE:
         if not in_check:
             if stand_pat >= beta: return beta
             if stand_pat > alpha: alpha = stand_pat
+            moves = tactical_moves(board)
 
-        for move in tactical_moves:
+        for move in moves:
+            if is_legal is not None and not is_legal(move):
+                continue
+            searched = True
             board.push(move)
             try:
                 score = quiescence_search(board, alpha, beta, q_depth + 1, ply_from_root + 1)
@@ -308,13 +611,19 @@ def quiescence_search(board, alpha, beta, q_depth=0, ply_from_root=0):
                 board.pop()
             if score >= beta: return beta
             if score > alpha: alpha = score
+        if not searched and not in_check and _is_stalemate(board, is_legal):
+            return evaluate_board(board, ply_from_root)
         return alpha
 
     if not in_check:
         if stand_pat <= alpha: return alpha
         if stand_pat < beta: beta = stand_pat
+        moves = tactical_moves(board)
 
-    for move in tactical_moves:
+    for move in moves:
+        if is_legal is not None and not is_legal(move):
+            continue
+        searched = True
         board.push(move)
         try:
             score = quiescence_search(board, alpha, beta, q_depth + 1, ply_from_root + 1)
@@ -322,9 +631,16 @@ def quiescence_search(board, alpha, beta, q_depth=0, ply_from_root=0):
             board.pop()
         if score <= alpha: return alpha
         if score < beta: beta = score
+    if not searched and not in_check and _is_stalemate(board, is_legal):
+        return evaluate_board(board, ply_from_root)
     return beta
 
 
+def _is_stalemate(board, is_legal):
+    """Whether a side not in check has no legal move; stops at the first legal one."""
+    return not any(is_legal(move) for move in board.generate_pseudo_legal_moves())
+
+
 def can_late_move_reduce(board, move, depth, move_index):
     """Return whether a deliberately conservative one-ply LMR is safe to try."""
     if depth < 4 or move_index < 4 or board.is_check():
@@ -347,22 +663,32 @@ def minimax(
     beta,
     maximizing_player,
     ply_from_root=0,
-    repetition_counts=None,
+    history=None,
     use_lmr=True,
+    root_scores=None,
 ):
+    """Alpha-beta search returning ``(score, best_move)`` from White's perspective.
+
+    When ``root_scores`` is a dict, every move searched at this node is recorded
+    in it as a ``RootMoveScore`` (exact or bound), so callers can reuse the root
+    move table of an iteration without searching the moves again.
+
+    ``history`` is the ``SearchHistory`` whose top is ``board``; one is built
+    from the board's move stack when omitted. Below the root, a repeated
+    position is scored by ``repetition_draw_score`` without searching it.
+    """
     visit_search_node()
-    if repetition_counts is None:
-        repetition_counts = build_repetition_counts(board)
-    position_hash = chess.polyglot.zobrist_hash(board)
-    is_repetition = repetition_counts.get(position_hash, 0) >= 2
-    if is_repetition:
-        if depth == 0: 
-             return evaluate_board(board, ply_from_root), None
+    if history is None:
+        history = SearchHistory(board)
+    position_hash = history.current
+    is_repetition = history.occurrences() >= 2
+    if is_repetition and ply_from_root > 0:
+        return repetition_draw_score(board, ply_from_root), None
 
     alpha_original = alpha
     beta_original = beta
-    key = tt_key(board, use_lmr)
-    entry = None if is_repetition else transposition_table.get(key)
+    key = tt_key(board, use_lmr, position_hash)
+    entry = None if is_repetition else transposition_table.probe(key)
     tt_move = entry.best_move if entry else None
 
     if entry:
@@ -380,12 +706,17 @@ def minimax(
                 search_stats["tt_cutoffs"] += 1
                 return cached_score, entry.best_move
 
-    if depth == 0 or board.is_game_over():
-        if board.is_game_over():
+    val = None
+    if depth == 0:
+        val = quiescence_search(board, alpha, beta, ply_from_root=ply_from_root)
+    else:
+        moves = search_moves(board, tt_move)
+        first_move = next(moves, None)
+        if search_termination(board, first_move is not None, history) is not None:
             val = evaluate_board(board, ply_from_root)
-        else:
-            val = quiescence_search(board, alpha, beta, ply_from_root=ply_from_root)
-        
+        moves = itertools.chain((first_move,), moves)
+
+    if val is not None:
         if val <= alpha_original:
             flag = TT_UPPER
         elif val >= beta_original:
@@ -396,44 +727,49 @@ def minimax(
             store_tt(key, depth, val, flag, None, ply_from_root)
         return val, None
 
-    moves = order_moves(board, tt_move) 
-
     best_move = None
     if maximizing_player:
         max_eval = -math.inf
         for move_index, move in enumerate(moves):
             reduce_move = use_lmr and can_late_move_reduce(board, move, depth, move_index)
             board.push(move)
-            child_hash = push_repetition(repetition_counts, board)
+            history.push(board)
             try:
+                search_depth = depth - 1
+                window = (alpha, beta)
                 if move_index == 0:
                     eval_score, _ = minimax(
                         board, depth - 1, alpha, beta, False, ply_from_root + 1,
-                        repetition_counts, use_lmr=use_lmr
+                        history, use_lmr=use_lmr
                     )
                 else:
                     search_depth = depth - 2 if reduce_move else depth - 1
+                    window = (alpha, alpha + 1)
                     if reduce_move:
                         search_stats["lmr_reductions"] += 1
                     eval_score, _ = minimax(
-                        board, search_depth, alpha, alpha + 1, False, ply_from_root + 1,
-                        repetition_counts, use_lmr=use_lmr
+                        board, search_depth, *window, False, ply_from_root + 1,
+                        history, use_lmr=use_lmr
                     )
                     if reduce_move and eval_score > alpha:
                         search_stats["lmr_researches"] += 1
+                        search_depth = depth - 1
                         eval_score, _ = minimax(
                             board, depth - 1, alpha, alpha + 1, False, ply_from_root + 1,
-                            repetition_counts, use_lmr=use_lmr
+                            history, use_lmr=use_lmr
                         )
                     if alpha < eval_score < beta:
                         search_stats["pvs_researches"] += 1
+                        window = (alpha, beta)
                         eval_score, _ = minimax(
                             board, depth - 1, alpha, beta, False, ply_from_root + 1,
-                            repetition_counts, use_lmr=use_lmr
+                            history, use_lmr=use_lmr
                         )
             finally:
-                pop_repetition(repetition_counts, child_hash)
+                history.pop()
                 board.pop()
+            if root_scores is not None:
+                record_root_score(root_scores, move, eval_score, search_depth, *window)
             
             if eval_score > max_eval:
                 max_eval = eval_score
@@ -454,36 +790,43 @@ def minimax(
         for move_index, move in enumerate(moves):
             reduce_move = use_lmr and can_late_move_reduce(board, move, depth, move_index)
             board.push(move)
-            child_hash = push_repetition(repetition_counts, board)
+            history.push(board)
             try:
+                search_depth = depth - 1
+                window = (alpha, beta)
                 if move_index == 0:
                     eval_score, _ = minimax(
                         board, depth - 1, alpha, beta, True, ply_from_root + 1,
-                        repetition_counts, use_lmr=use_lmr
+                        history, use_lmr=use_lmr
                     )
                 else:
                     search_depth = depth - 2 if reduce_move else depth - 1
+                    window = (beta - 1, beta)
                     if reduce_move:
                         search_stats["lmr_reductions"] += 1
                     eval_score, _ = minimax(
-                        board, search_depth, beta - 1, beta, True, ply_from_root + 1,
-                        repetition_counts, use_lmr=use_lmr
+                        board, search_depth, *window, True, ply_from_root + 1,
+                        history, use_lmr=use_lmr
                     )
                     if reduce_move and eval_score < beta:
                         search_stats["lmr_researches"] += 1
+                        search_depth = depth - 1
                         eval_score, _ = minimax(
                             board, depth - 1, beta - 1, beta, True, ply_from_root + 1,
-                            repetition_counts, use_lmr=use_lmr
+                            history, use_lmr=use_lmr
                         )
                     if alpha < eval_score < beta:
                         search_stats["pvs_researches"] += 1
+                        window = (alpha, beta)
                         eval_score, _ = minimax(
                             board, depth - 1, alpha, beta, True, ply_from_root + 1,
-                            repetition_counts, use_lmr=use_lmr
+                            history, use_lmr=use_lmr
                         )
             finally:
-                pop_repetition(repetition_counts, child_hash)
+                history.pop()
                 board.pop()
+            if root_scores is not None:
+                record_root_score(root_scores, move, eval_score, search_depth, *window)
             
             if eval_score < min_eval:
                 min_eval = eval_score
@@ -588,14 +931,29 @@ def should_apply_difficulty_error(board, profile):
     error_rate = profile["error_rate"]
     if error_rate <= 0:
         return False
-    position_bucket = (chess.polyglot.zobrist_hash(board) >> 40) % 100
+    position_bucket = (zobrist_hash(board) >> 40) % 100
     return position_bucket < error_rate
 
 
-def select_difficulty_move(board, depth, best_move, best_score, difficulty, style):
-    """Select a reproducible, safe move from a difficulty-specific loss band."""
+def _root_bound_is_upper(mover, flag):
+    """Whether a White-perspective bound caps the mover's score from above."""
+    return (mover == chess.WHITE and flag == TT_UPPER) or (mover == chess.BLACK and flag == TT_LOWER)
+
+
+def select_difficulty_move(
+    board, depth, best_move, best_score, difficulty, style, root_scores=None, history=None
+):
+    """Select a reproducible, safe move from a difficulty-specific loss band.
+
+    ``root_scores`` is the root move table of the main search. Exact entries
+    are used as-is and upper bounds already below the loss band are skipped;
+    only the remaining candidates are searched, with a window that stops at
+    the bottom of the band. ``history`` is the main search's ``SearchHistory``.
+    """
     if best_move is None:
         return best_move, best_score, 0, 0
+    if history is None:
+        history = SearchHistory(board)
 
     mover = board.turn
     profile = DIFFICULTY_MOVE_PROFILES.get(difficulty, DIFFICULTY_MOVE_PROFILES["advanced"])
@@ -603,49 +961,72 @@ def select_difficulty_move(board, depth, best_move, best_score, difficulty, styl
     candidates = []
     ordered_candidates = order_moves(board)[:profile["candidates"]]
     candidate_moves = [best_move, *[move for move in ordered_candidates if move != best_move]]
+    band_floor = (best_score if mover == chess.WHITE else -best_score) - profile["max_loss"]
+    search_alpha, search_beta = -math.inf, math.inf
+    overlay_searches = 0
+    if root_scores is not None:
+        if mover == chess.WHITE:
+            search_alpha = band_floor - 1
+        else:
+            search_beta = -band_floor + 1
 
     for move in candidate_moves:
         if major_piece_loss_after_move(board, move):
             continue
 
-        try:
-            board.push(move)
+        score = None
+        root_entry = root_scores.get(move) if root_scores else None
+        if root_entry and root_entry.depth >= candidate_depth:
+            root_perspective = root_entry.score if mover == chess.WHITE else -root_entry.score
+            if root_entry.flag == TT_EXACT:
+                search_stats["candidate_cache_hits"] += 1
+                score = root_entry.score
+            elif _root_bound_is_upper(mover, root_entry.flag) and root_perspective < band_floor:
+                search_stats["candidate_bound_skips"] += 1
+                continue
+
+        if score is None:
+            if root_scores is not None:
+                if overlay_searches >= OVERLAY_SEARCH_LIMIT:
+                    continue
+                overlay_searches += 1
             try:
-                cached_entry = transposition_table.get(tt_key(board))
-                cached_score = None
-                if cached_entry and cached_entry.depth >= candidate_depth:
-                    cached_score = score_from_tt(cached_entry.score, 1)
-                    if cached_entry.flag == TT_EXACT:
-                        search_stats["candidate_cache_hits"] += 1
-                    elif candidates:
-                        bound_is_upper = (
-                            mover == chess.WHITE and cached_entry.flag == TT_UPPER
-                        ) or (
-                            mover == chess.BLACK and cached_entry.flag == TT_LOWER
+                board.push(move)
+                history.push(board)
+                try:
+                    cached_entry = transposition_table.get(tt_key(board, position_hash=history.current))
+                    cached_score = None
+                    if cached_entry and cached_entry.depth >= candidate_depth:
+                        cached_score = score_from_tt(cached_entry.score, 1)
+                        if cached_entry.flag == TT_EXACT:
+                            search_stats["candidate_cache_hits"] += 1
+                        elif candidates:
+                            bound_is_upper = _root_bound_is_upper(mover, cached_entry.flag)
+                            bound_perspective = cached_score if mover == chess.WHITE else -cached_score
+                            best_known = max(item["perspective_score"] for item in candidates)
+                            if bound_is_upper and bound_perspective < best_known - profile["max_loss"]:
+                                search_stats["candidate_bound_skips"] += 1
+                                continue
+
+                    if cached_entry and cached_entry.depth >= candidate_depth and cached_entry.flag == TT_EXACT:
+                        score = cached_score
+                    else:
+                        # minimax scores a finished game itself (search_termination on
+                        # its own move generation and ``history``), without is_game_over.
+                        score, _ = minimax(
+                            board,
+                            candidate_depth,
+                            search_alpha,
+                            search_beta,
+                            board.turn == chess.WHITE,
+                            1,
+                            history,
                         )
-                        bound_perspective = cached_score if mover == chess.WHITE else -cached_score
-                        best_known = max(item["perspective_score"] for item in candidates)
-                        if bound_is_upper and bound_perspective < best_known - profile["max_loss"]:
-                            search_stats["candidate_bound_skips"] += 1
-                            continue
-
-                if cached_entry and cached_entry.depth >= candidate_depth and cached_entry.flag == TT_EXACT:
-                    score = cached_score
-                elif board.is_game_over():
-                    score = evaluate_board(board, 1)
-                else:
-                    score, _ = minimax(
-                        board,
-                        candidate_depth,
-                        -math.inf,
-                        math.inf,
-                        board.turn == chess.WHITE,
-                        1,
-                    )
-            finally:
-                board.pop()
-        except SearchTimeout:
-            break
+                finally:
+                    history.pop()
+                    board.pop()
+            except SearchTimeout:
+                break
 
         perspective_score = score if mover == chess.WHITE else -score
         bonus = score_trickster_move(board, move) if style == "trickster" else 0
@@ -993,21 +1374,17 @@ def _theme_evidence(theme, reason):
     return "heuristic"
 
 
-def _candidate_moves(board, best_move, candidate_count):
+def _root_moves(board, best_move):
+    """Every legal move, the base engine choice first, then in search order."""
     moves = []
     if best_move and best_move in board.legal_moves:
         moves.append(best_move)
-    for move in order_moves(board):
-        if move not in moves:
-            moves.append(move)
-        if len(moves) >= candidate_count:
-            break
+    moves.extend(move for move in order_moves(board) if move != best_move)
     return moves
 
 
-def _candidate_score(board, depth):
-    if board.is_game_over():
-        return evaluate_board(board, 1)
+def _candidate_score(board, depth, history=None):
+    """Full-window score of ``board``; minimax detects a finished game via ``search_termination``."""
     score, _move = minimax(
         board,
         max(1, depth),
@@ -1015,10 +1392,104 @@ def _candidate_score(board, depth):
         math.inf,
         board.turn == chess.WHITE,
         1,
+        history,
     )
     return score
 
 
+def _budgeted_time_limit(budget, stage, time_limit):
+    """Cap ``time_limit`` by one stage's share of a request budget."""
+    if budget is None:
+        return time_limit
+    stage_limit = budget.allocate(stage)
+    if stage_limit is None:
+        return time_limit
+    return min(time_limit, stage_limit) if time_limit else stage_limit
+
+
+def _root_move_search(board, move, depth, history, window, mover_sign):
+    """Search one root move within a mover-perspective ``window``; mover-perspective score."""
+    low, high = window if mover_sign > 0 else (-window[1], -window[0])
+    board.push(move)
+    history.push(board)
+    try:
+        score, _move = minimax(board, depth, low, high, board.turn == chess.WHITE, 1, history)
+    finally:
+        history.pop()
+        board.pop()
+    return mover_sign * score
+
+
+def multipv_search(board, moves, depth, multipv=None, required=(), deadline=None):
+    """Exact scores for the best ``multipv`` root moves in one root search.
+
+    Every move in ``moves`` is searched (``depth`` plies below the root move)
+    with an alpha of the ``multipv``-th best exact score so far: a null-window
+    search proves most moves no better, and only a move that beats the
+    threshold is re-searched for its exact score. ``required`` moves are
+    always scored exactly. Iterative deepening reorders the root by the
+    previous iteration, so the transposition table and move ordering carry
+    over between moves and depths.
+
+    Returns ``(scores, reached_depth, complete)``: ``scores`` maps the top
+    moves and ``required`` moves to White-perspective scores from the deepest
+    iteration that finished, and ``reached_depth`` is that iteration's depth.
+    ``complete`` is False when the target depth was not reached; if even the
+    first iteration was cut short, ``scores`` holds only the moves it
+    finished and ``reached_depth`` is 0, since no depth was completed.
+    """
+    mover_sign = 1 if board.turn == chess.WHITE else -1
+    multipv = len(moves) if multipv is None else multipv
+    required = set(required)
+    board = SearchBoard.from_board(board)
+    history = SearchHistory(board)
+    order = list(moves)
+    target_depth = max(1, depth)
+    scores = {}
+    reached_depth = 0
+
+    def top_moves(exact):
+        ranked = sorted(exact, key=exact.get, reverse=True)
+        kept = set(ranked[:multipv]) | (required & exact.keys())
+        return {move: mover_sign * exact[move] for move in ranked if move in kept}
+
+    for current_depth in range(1, target_depth + 1):
+        exact = {}
+        bounded = []
+        try:
+            for move in order:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise SearchTimeout
+                check_cancelled()
+                ranked = sorted(exact.values(), reverse=True)
+                if move in required or len(ranked) < multipv:
+                    exact[move] = _root_move_search(
+                        board, move, current_depth, history, (-math.inf, math.inf), mover_sign
+                    )
+                    continue
+                threshold = ranked[multipv - 1]
+                score = _root_move_search(
+                    board, move, current_depth, history, (threshold, threshold + 1), mover_sign
+                )
+                if score > threshold:
+                    search_stats["pvs_researches"] += 1
+                    score = _root_move_search(
+                        board, move, current_depth, history, (threshold, math.inf), mover_sign
+                    )
+                if score > threshold:
+                    exact[move] = score
+                else:
+                    bounded.append(move)
+        except SearchTimeout:
+            if not scores:
+                return top_moves(exact), 0, False
+            return scores, reached_depth, False
+        scores = top_moves(exact)
+        reached_depth = current_depth
+        order = sorted(exact, key=exact.get, reverse=True) + bounded
+    return scores, reached_depth, True
+
+
 def _teaching_score_type(score):
     return "mate" if abs(score) >= MATE_THRESHOLD else "centipawn"
 
@@ -1029,24 +1500,44 @@ def get_teaching_analysis(
     candidate_count=5,
     depth=None,
     time_limit=None,
+    budget=None,
 ):
-    """Return structured candidate comparisons and teaching evidence."""
+    """Return structured candidate comparisons and teaching evidence.
+
+    With a request ``budget`` the candidates are searched within its
+    ``"teaching"`` share, including any time the main search left unused.
+    The search stops at ``TEACHING_SEARCH_SHARE`` of the time limit; the
+    candidates are then described in score order until the limit, and any
+    left over mark the comparison as partial.
+    """
+    time_limit = _budgeted_time_limit(budget, "teaching", time_limit)
     original_fen = board.fen()
     mover = board.turn
     best_move = base_analysis.get("best_move")
     base_depth = depth if depth is not None else max(1, int(base_analysis.get("depth") or 1) - 1)
     started_at = time.monotonic()
     deadline = started_at + time_limit if time_limit else None
-    begin_search_generation(deadline=deadline)
+    search_deadline = started_at + time_limit * TEACHING_SEARCH_SHARE if time_limit else None
+    begin_search_generation(deadline=search_deadline)
 
-    planned_moves = _candidate_moves(board, best_move, candidate_count)
+    root_moves = _root_moves(board, best_move)
+    requested_count = min(candidate_count, len(root_moves))
+    scores, search_depth, analysis_complete = multipv_search(
+        board,
+        root_moves,
+        base_depth,
+        multipv=requested_count,
+        required=root_moves[:1] if best_move in root_moves else (),
+        deadline=search_deadline,
+    )
+    sign = 1 if mover == chess.WHITE else -1
+    # The base engine choice first, then the best scores: those are kept if time runs out.
+    ranked = sorted(scores.items(), key=lambda item: (item[0] != best_move, -sign * item[1]))
     candidates = []
-    analysis_complete = True
-    for move in planned_moves:
-        if deadline is not None and time.monotonic() >= deadline:
+    for move, score in ranked:
+        if candidates and deadline is not None and time.monotonic() >= deadline:
             analysis_complete = False
             break
-
         san = board.san(move)
         warnings = []
         if major_piece_loss_after_move(board, move):
@@ -1056,24 +1547,19 @@ def get_teaching_analysis(
 
         search_board = board.copy()
         search_board.push(move)
-        try:
-            score = _candidate_score(search_board, base_depth)
-        except SearchTimeout:
-            analysis_complete = False
-            break
-
         reason = _move_reason(board, move, warnings)
         themes = _move_themes(board, move, reason)
         theme_evidence = {theme: _theme_evidence(theme, reason) for theme in themes}
-        pv = [move.uci(), *get_pv_line(search_board, base_depth)]
-        perspective_score = score if mover == chess.WHITE else -score
+        pv = [move.uci(), *get_pv_line(search_board, search_depth)]
+        perspective_score = sign * score
         candidates.append({
             "move_obj": move,
             "move": move.uci(),
             "san": san,
             "score_cp": int(score),
             "score_type": _teaching_score_type(score),
-            "score_status": "complete",
+            # Scores from an unfinished first iteration are not comparable.
+            "score_status": "complete" if search_depth else "partial",
             "display": format_evaluation(score),
             "perspective_score": perspective_score,
             "base_engine_choice": bool(best_move and move == best_move),
@@ -1134,7 +1620,7 @@ def get_teaching_analysis(
         mistake_warnings.update(item["warnings"])
     position_themes = set(candidates[0]["themes"] if candidates else [])
 
-    comparison_complete = analysis_complete and len(candidates) == len(planned_moves)
+    comparison_complete = analysis_complete and len(candidates) >= requested_count
     if not comparison_complete:
         criticality = "partial"
     elif len(candidates) >= 2 and candidates[1]["comparison_loss"] >= ONLY_MOVE_LOSS_CP:
@@ -1172,11 +1658,26 @@ def get_teaching_analysis(
         "position_theme_evidence": position_theme_evidence,
         "mistake_warnings": sorted(mistake_warnings),
         "analysis_complete": comparison_complete,
+        "search_depth": search_depth,
         "evaluated_candidate_count": sum(
             item.get("score_status") == "complete" for item in candidates
         ),
         "returned_candidate_count": len(candidates),
-        "requested_candidate_count": len(planned_moves),
+        "requested_candidate_count": requested_count,
+    }
+
+
+def _iteration_report(board, depth, score, nodes, started_at, use_lmr):
+    elapsed = time.monotonic() - started_at
+    return {
+        'depth': depth,
+        'score': score,
+        'eval_display': format_evaluation(score),
+        'winning_chance': calculate_winning_chance(score),
+        'pv': get_pv_line(board, depth, use_lmr=use_lmr),
+        'nodes': nodes,
+        'nps': int(nodes / elapsed) if elapsed > 0 else 0,
+        'elapsed': round(elapsed, 3),
     }
 
 
@@ -1189,6 +1690,9 @@ def get_analysis(
     style="balanced",
     difficulty="advanced",
     use_lmr=True,
+    node_limit=None,
+    budget=None,
+    on_iteration=None,
 ):
     """
     深度分析棋盤局面
@@ -1202,6 +1706,11 @@ def get_analysis(
         style: balanced 或 trickster
         difficulty: newbie、beginner、intermediate 或 advanced
         use_lmr: 是否對排序後段的安靜走法嘗試保守型 late-move reduction
+        node_limit: 節點預算；達到後停在最後完成的迭代。只計算本執行緒的節點，
+            結果不受伺服器負載影響；time_limit 則作為牆鐘安全上限
+        budget: 整個請求共用的 RequestBudget；搜尋只使用其中 "search" 階段的份額
+        on_iteration: 每完成一層迭代加深就以該層的 depth、score、pv、nodes、nps 呼叫一次，
+            在搜尋所在的執行緒上執行，供串流分析即時回報進度
     
     Returns:
         dict: {
@@ -1214,6 +1723,7 @@ def get_analysis(
             'nodes': 搜尋節點數
         }
     """
+    time_limit = _budgeted_time_limit(budget, "search", time_limit)
     # 🔥 優先使用開局庫（開局階段）
     if use_book and len(board.move_stack) < 10:  # 前 10 手使用開局庫
         try:
@@ -1250,12 +1760,18 @@ def get_analysis(
     overall_deadline = started_at + time_limit if time_limit else None
     needs_move_overlay = style == "trickster" or difficulty not in {"advanced", "challenge"}
     if overall_deadline and needs_move_overlay:
-        search_deadline = started_at + time_limit * 0.65
+        search_deadline = started_at + time_limit * OVERLAY_SEARCH_SHARE
     else:
         search_deadline = overall_deadline
-    begin_search_generation(deadline=search_deadline)
+    if node_limit and needs_move_overlay:
+        search_node_limit = int(node_limit * OVERLAY_SEARCH_SHARE)
+    else:
+        search_node_limit = node_limit
+    begin_search_generation(deadline=search_deadline, node_limit=search_node_limit)
     is_maximizing = board.turn == chess.WHITE
-    repetition_counts = build_repetition_counts(board)
+    # 搜尋在輕量棋盤上進行；PV、備援走法等仍使用原本的棋盤
+    search_board = SearchBoard.from_board(board)
+    history = SearchHistory(search_board)
     
     # 根據子力數量動態調整基礎深度
     if adaptive_depth:
@@ -1270,36 +1786,55 @@ def get_analysis(
     nodes_searched = 0
     final_depth = depth
     timed_out = False
+    node_limit_reached = False
+    cancelled = False
+    # 每次迭代順便記錄根節點各走法分數（精確值或上下界），難度覆蓋層直接取用
+    root_scores = {} if needs_move_overlay else None
     
     # 迭代加深搜尋 (Iterative Deepening)
-    if time_limit:
+    if time_limit or node_limit:
         for current_depth in range(1, depth + 1):
-            if time.monotonic() >= search_deadline:
+            if search_deadline is not None and time.monotonic() >= search_deadline:
                 break
             try:
                 score, move = minimax(
-                    board, current_depth, -math.inf, math.inf, is_maximizing,
-                    repetition_counts=repetition_counts, use_lmr=use_lmr,
+                    search_board, current_depth, -math.inf, math.inf, is_maximizing,
+                    history=history, use_lmr=use_lmr,
+                    root_scores=root_scores,
                 )
+            except NodeLimitReached:
+                node_limit_reached = True
+                break
+            except SearchCancelled:
+                cancelled = True
+                break
             except SearchTimeout:
                 timed_out = True
                 break
             best_move = move
             best_score = score
             final_depth = current_depth
-            nodes_searched = search_stats["nodes"]
+            nodes_searched = search_runtime.nodes
+            if on_iteration is not None:
+                on_iteration(_iteration_report(board, current_depth, score, nodes_searched, started_at, use_lmr))
     else:
-        # 固定深度搜尋
-        best_score, best_move = minimax(
-            board,
-            depth,
-            -math.inf,
-            math.inf,
-            is_maximizing,
-            repetition_counts=repetition_counts,
-            use_lmr=use_lmr,
-        )
-        nodes_searched = search_stats["nodes"]
+        # 固定深度搜尋（只會被取消打斷）
+        try:
+            best_score, best_move = minimax(
+                search_board,
+                depth,
+                -math.inf,
+                math.inf,
+                is_maximizing,
+                history=history,
+                use_lmr=use_lmr,
+                root_scores=root_scores,
+            )
+        except SearchCancelled:
+            cancelled = True
+        nodes_searched = search_runtime.nodes
+        if on_iteration is not None and not cancelled:
+            on_iteration(_iteration_report(board, depth, best_score, nodes_searched, started_at, use_lmr))
 
     if best_move is None:
         safe_moves = [move for move in order_moves(board) if not major_piece_loss_after_move(board, move)]
@@ -1312,24 +1847,30 @@ def get_analysis(
             finally:
                 board.pop()
         final_depth = 0
-        nodes_searched = search_stats["nodes"]
+        nodes_searched = search_runtime.nodes
 
     style_bonus = 0
     difficulty_loss = 0
-    if best_move and needs_move_overlay:
+    if best_move and needs_move_overlay and not cancelled:
         search_runtime.deadline = overall_deadline
+        search_runtime.node_limit = node_limit
         try:
             best_move, best_score, style_bonus, difficulty_loss = select_difficulty_move(
-                board,
+                search_board,
                 final_depth,
                 best_move,
                 best_score,
                 difficulty,
                 style,
+                root_scores=root_scores,
+                history=history,
             )
+        except NodeLimitReached:
+            node_limit_reached = True
+        except SearchCancelled:
+            cancelled = True
         except SearchTimeout:
             timed_out = True
-            pass
     
     # 提取 PV Line
     pv_line = get_pv_line(board, final_depth, use_lmr=use_lmr)
@@ -1351,11 +1892,14 @@ def get_analysis(
         'lmr_researches': search_stats["lmr_researches"],
         'candidate_cache_hits': search_stats["candidate_cache_hits"],
         'candidate_bound_skips': search_stats["candidate_bound_skips"],
+        'legality_checks': search_stats["legality_checks"],
         'from_book': False,
         'style': style,
         'style_bonus': style_bonus,
         'difficulty_loss': difficulty_loss,
         'timed_out': timed_out,
+        'node_limit_reached': node_limit_reached,
+        'cancelled': cancelled,
     }
 
 def get_best_move(board, depth=5):
@@ -1,4 +1,5 @@
 import os
+import threading
 
 from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
 from sqlalchemy.ext.declarative import declarative_base
@@ -31,5 +32,16 @@ class Game(Base):
     pgn = Column(Text)       # 完整的棋譜文字
     fen = Column(String)     # 最後局面的 FEN
 
-# 自動建立資料表
-Base.metadata.create_all(bind=engine)
+_tables_ready = False
+_tables_lock = threading.Lock()
+
+
+def init_db():
+    """Create missing tables once, on first use instead of at import time."""
+    global _tables_ready
+    if _tables_ready:
+        return
+    with _tables_lock:
+        if not _tables_ready:
+            Base.metadata.create_all(bind=engine)
+            _tables_ready = True
@@ -24,6 +24,7 @@ from .pawn_structure import pawn_structure_score
 from .phase import is_endgame, phase_name, strategic_weight_percent
 from .piece_activity import piece_activity_score
 from .rook_activity import rook_activity_score
+from .terminal import insufficient_material
 
 __all__ = [
     "BISHOP_TABLE",
@@ -40,6 +41,7 @@ __all__ = [
     "QUEEN_TABLE",
     "ROOK_TABLE",
     "get_piece_square_value",
+    "insufficient_material",
     "is_endgame",
     "king_activity_score",
     "middlegame_king_exposure_penalty",
@@ -47,14 +47,21 @@ class PositionEvaluator:
             terminal=is_terminal,
         )
 
-    def score(self, board: chess.Board, ply_from_root: int = 0) -> int:
-        score, _, _, _ = self._evaluate(board, ply_from_root)
+    def score(
+        self, board: chess.Board, ply_from_root: int = 0, check_terminal: bool = True
+    ) -> int:
+        """Return the white-centric score.
+
+        Search passes ``check_terminal=False`` once its own move generation has
+        shown the position is not mate, stalemate or a dead draw.
+        """
+        score, _, _, _ = self._evaluate(board, ply_from_root, check_terminal)
         return score
 
     def _evaluate(
-        self, board: chess.Board, ply_from_root: int
+        self, board: chess.Board, ply_from_root: int, check_terminal: bool = True
     ) -> tuple[int, str, dict[str, int], bool]:
-        terminal = terminal_score(board, ply_from_root)
+        terminal = terminal_score(board, ply_from_root) if check_terminal else None
         if terminal is not None:
             return terminal, "terminal", {"terminal": terminal}, True
 
@@ -92,18 +99,6 @@ class PositionEvaluator:
         )
         score = sum(components.values())
 
-        # This preserves the old public behavior during modularization. Repetition
-        # policy can move to the search layer in a separately benchmarked change.
-        if board.is_repetition(2):
-            if score > 500:
-                repetition_score = -1000
-            elif score < -500:
-                repetition_score = 1000
-            else:
-                repetition_score = 0
-            components["repetition_policy"] = repetition_score - score
-            score = repetition_score
-
         return score, "endgame" if endgame else "middlegame", components, False
 
     @staticmethod
@@ -8,7 +8,7 @@ def middlegame_king_exposure_penalty(board: chess.Board, color: chess.Color) ->
     if king_square is None:
         return 0
 
-    total_pieces = len(board.piece_map())
+    total_pieces = chess.popcount(board.occupied)
     if total_pieces < 14:
         return 0
 
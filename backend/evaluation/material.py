@@ -40,6 +40,10 @@ def get_piece_square_value(
 
 def material_and_piece_square_scores(board: chess.Board, endgame: bool) -> tuple[int, int]:
     """Calculate both board-scan components without traversing pieces twice."""
+    # Search boards keep both sums incrementally; skip the scan for them.
+    incremental = getattr(board, "material_and_piece_square", None)
+    if incremental is not None:
+        return incremental(endgame)
     material = 0
     piece_square = 0
     for square, piece in board.piece_map().items():
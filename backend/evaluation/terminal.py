@@ -5,10 +5,21 @@ import chess
 from .constants import MATE_SCORE
 
 
+def insufficient_material(board: chess.Board) -> bool:
+    """``board.is_insufficient_material()`` without the per-piece scan in most positions.
+
+    Any pawn, rook or queen is mating material, so only minor-piece endings
+    reach python-chess's full check.
+    """
+    if board.pawns or board.rooks or board.queens:
+        return False
+    return board.is_insufficient_material()
+
+
 def terminal_score(board: chess.Board, ply_from_root: int = 0) -> int | None:
     if board.is_checkmate():
         score = MATE_SCORE - ply_from_root
         return -score if board.turn == chess.WHITE else score
-    if board.is_stalemate() or board.is_insufficient_material():
+    if board.is_stalemate() or insufficient_material(board):
         return 0
     return None
@@ -0,0 +1,164 @@
+"""Server-held game state for WebSocket bot sessions."""
+
+import time
+
+import chess
+
+
+# A timed bot spends its remaining time as if this many moves were still to come.
+MOVES_TO_GO = 30
+MIN_BOT_MOVE_SECONDS = 0.1
+
+
+class SessionError(ValueError):
+    """A client message the session cannot apply (reported back, not fatal)."""
+
+
+class GameClock:
+    """Remaining seconds per side with a Fischer increment; ``base=None`` is untimed."""
+
+    def __init__(self, base=None, increment=0.0, clock=time.monotonic):
+        try:
+            self.base = float(base) if base is not None else None
+            self.increment = float(increment or 0.0)
+        except (TypeError, ValueError):
+            raise SessionError("Clock settings must be numbers")
+        if (self.base is not None and self.base <= 0) or self.increment < 0:
+            raise SessionError("Clock settings must be positive")
+        self.remaining = {chess.WHITE: self.base, chess.BLACK: self.base}
+        self._clock = clock
+        self._turn_started = clock()
+
+    def start_turn(self):
+        self._turn_started = self._clock()
+
+    def stop_turn(self, color):
+        """Charge the side that just moved for its thinking time; returns the seconds used."""
+        elapsed = self._clock() - self._turn_started
+        if self.base is not None:
+            self.remaining[color] = max(0.0, self.remaining[color] - elapsed)
+            if self.remaining[color] > 0:
+                self.remaining[color] += self.increment
+        return elapsed
+
+    def flagged(self, color):
+        return self.base is not None and self.remaining[color] <= 0
+
+    def move_time(self, color, cap):
+        """Seconds ``color`` may spend on its next move, at most ``cap``.
+
+        Depends only on ``color``'s own clock, so it is the same while the
+        opponent thinks as when the move is finally searched.
+        """
+        if self.base is None:
+            return cap
+        share = self.remaining[color] / MOVES_TO_GO + self.increment
+        return round(max(MIN_BOT_MOVE_SECONDS, min(cap, share)), 3)
+
+    def snapshot(self):
+        return {
+            "white": round(self.remaining[chess.WHITE], 3) if self.base is not None else None,
+            "black": round(self.remaining[chess.BLACK], 3) if self.base is not None else None,
+            "increment": self.increment,
+        }
+
+
+class GameSession:
+    """One bot game: the board with its full move history, clock and search stats.
+
+    Keeping the history on the server gives the engine what a bare FEN
+    cannot: repetition detection and the real ply count for the opening
+    book. Moves arrive as UCI strings and are validated here.
+    """
+
+    def __init__(
+        self,
+        session_id,
+        fen=chess.STARTING_FEN,
+        moves=(),
+        difficulty="intermediate",
+        bot_style="balanced",
+        bot_color=chess.BLACK,
+        clock=None,
+        push_analysis=False,
+    ):
+        try:
+            self.board = chess.Board(fen)
+        except ValueError:
+            raise SessionError("Invalid FEN string")
+        self.root_fen = self.board.fen()
+        self.session_id = session_id
+        self.difficulty = difficulty
+        self.bot_style = bot_style
+        self.bot_color = bot_color
+        self.clock = clock or GameClock()
+        self.push_analysis = push_analysis
+        self.flagged_color = None
+        self.stats = {"bot_moves": 0, "nodes": 0, "tt_hits": 0, "ponder_hits": 0, "book_moves": 0}
+        for uci in moves:
+            self.board.push(self._parse_move(uci))
+
+    def _parse_move(self, uci):
+        try:
+            move = chess.Move.from_uci(str(uci))
+        except ValueError:
+            raise SessionError(f"Invalid move: {uci}")
+        if not self.board.is_legal(move):
+            raise SessionError(f"Illegal move: {uci}")
+        return move
+
+    @property
+    def is_over(self):
+        return self.flagged_color is not None or self.board.is_game_over()
+
+    @property
+    def bot_to_move(self):
+        return not self.is_over and self.board.turn == self.bot_color
+
+    def result(self):
+        if self.flagged_color is not None:
+            return "0-1" if self.flagged_color == chess.WHITE else "1-0"
+        return self.board.result() if self.board.is_game_over() else None
+
+    def position_key(self):
+        """The root position and moves, which identify the position and its history."""
+        return self.root_fen, tuple(move.uci() for move in self.board.move_stack)
+
+    def play_player_move(self, uci):
+        if self.is_over:
+            raise SessionError("Game is over")
+        if self.board.turn == self.bot_color:
+            raise SessionError("Not your turn")
+        move = self._parse_move(uci)
+        self._finish_turn(move)
+        return move
+
+    def play_bot_move(self, move, analysis, ponder_hit=False):
+        self._finish_turn(move)
+        self.stats["bot_moves"] += 1
+        self.stats["nodes"] += analysis.get("nodes", 0)
+        self.stats["tt_hits"] += analysis.get("tt_hits", 0)
+        self.stats["ponder_hits"] += int(ponder_hit)
+        self.stats["book_moves"] += int(bool(analysis.get("from_book")))
+
+    def _finish_turn(self, move):
+        mover = self.board.turn
+        self.clock.stop_turn(mover)
+        if self.clock.flagged(mover):
+            self.flagged_color = mover
+            return
+        self.board.push(move)
+        self.clock.start_turn()
+
+    def status(self):
+        nodes = self.stats["nodes"]
+        return {
+            "session_id": self.session_id,
+            "fen": self.board.fen(),
+            "ply": len(self.board.move_stack),
+            "bot_color": "white" if self.bot_color == chess.WHITE else "black",
+            "is_game_over": self.is_over,
+            "result": self.result(),
+            "clock": self.clock.snapshot(),
+            "stats": {**self.stats, "tt_hit_rate": round(self.stats["tt_hits"] / nodes, 3) if nodes else None},
+        }
@@ -0,0 +1,245 @@
+"""Async Gemini calls with a shared connection pool, coalescing and a fallback budget."""
+
+import asyncio
+import hashlib
+import os
+import threading
+
+import httpx
+
+
+FALLBACK_MESSAGE = "AI 教練暫時無法連線，請稍後再試。"
+DEFAULT_TOTAL_BUDGET = 12.0
+DEFAULT_HEDGE_DELAY = 4.0
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+def generation_request(model, prompt, system_instruction):
+    """Return the contents and config for one model, folding instructions for Gemma."""
+    from google.genai import types
+
+    # Gemma 模型不支援 system_instruction，需要把指令融入 prompt
+    if "gemma" in model.lower():
+        return (
+            f"{system_instruction}\n\n---\n\n{prompt}",
+            types.GenerateContentConfig(temperature=0.2, max_output_tokens=1024),
+        )
+    return prompt, types.GenerateContentConfig(
+        system_instruction=system_instruction,
+        temperature=0.2,
+        max_output_tokens=1024,
+    )
+
+
+def describe_model_error(model, error):
+    error_msg = str(error)
+    if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
+        return f"⚠️ 模型 {model} 額度已滿，切換下一個..."
+    if "404" in error_msg or "NOT_FOUND" in error_msg:
+        return f"⚠️ 找不到模型 {model}，跳過..."
+    if "INVALID_ARGUMENT" in error_msg and "system_instruction" in error_msg.lower():
+        return f"⚠️ 模型 {model} 不支援 system_instruction，跳過..."
+    return f"⚠️ 錯誤 ({model}): {error_msg}"
+
+
+async def _close_on_loop_shutdown(http):
+    try:
+        yield
+    finally:
+        await http.aclose()
+
+
+def _forget_inflight(inflight, key, task):
+    # Only the task's own entry: a later request for the same prompt may have replaced it.
+    if inflight.get(key) is task:
+        del inflight[key]
+
+
+class AsyncGeminiClient:
+    """Gemini client for event-loop callers.
+
+    Identical in-flight prompts share one upstream request. Each request gets a
+    total time budget: the first model is tried immediately, and the next model
+    in ``models`` starts either when the current one fails or, as a hedge, when
+    it has not answered within ``hedge_delay`` seconds. The first successful
+    answer wins and the remaining attempts are cancelled.
+    """
+
+    def __init__(
+        self,
+        api_key,
+        models,
+        base_url=None,
+        total_budget=DEFAULT_TOTAL_BUDGET,
+        hedge_delay=DEFAULT_HEDGE_DELAY,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    ):
+        self.api_key = api_key
+        self.models = list(models)
+        self.base_url = base_url or os.getenv("GEMINI_API_BASE_URL") or None
+        self.total_budget = total_budget
+        self.hedge_delay = hedge_delay
+        self.max_concurrency = max_concurrency
+        self.stats = {
+            "requests": 0,
+            "coalesced": 0,
+            "attempts": 0,
+            "hedges": 0,
+            "failed_attempts": 0,
+            "budget_exhausted": 0,
+        }
+        self._loop = None
+        self._client = None
+        self._http = None
+        self._pool_guard = None
+        self._semaphore = None
+        self._inflight = {}
+
+    async def _bind_to_running_loop(self):
+        # Pools and semaphores belong to one event loop. Rebind when a caller
+        # (for example a test using asyncio.run) arrives on a new loop.
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        from google import genai
+        from google.genai import types
+
+        self._release_pool()
+        self._loop = loop
+        self._inflight = {}
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+        )
+        self._client = genai.Client(
+            api_key=self.api_key,
+            http_options=types.HttpOptions(
+                base_url=self.base_url,
+                timeout=int(self.total_budget * 1000),
+                retry_options=types.HttpRetryOptions(attempts=1),
+                httpx_async_client=self._http,
+            ),
+        )
+        # The loop finalizes live async generators when it shuts down, which
+        # closes this pool on its own loop even if ``aclose`` is never called.
+        self._pool_guard = _close_on_loop_shutdown(self._http)
+        await self._pool_guard.__anext__()
+
+    def _release_pool(self):
+        """Close the previous loop's pool on that loop, if it is still open."""
+        guard, loop = self._pool_guard, self._loop
+        self._http = None
+        self._client = None
+        self._pool_guard = None
+        if guard is None or loop is None or loop.is_closed():
+            # A closed loop already closed the pool while shutting down its async generators.
+            return
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(guard.aclose(), loop)
+            return
+        # A stopped loop would never run a scheduled close. The calling thread
+        # already runs a loop, so the stopped one finishes the close on a helper thread.
+        closer = threading.Thread(target=loop.run_until_complete, args=(guard.aclose(),), name="gemini-pool-close")
+        closer.start()
+        closer.join()
+
+    async def aclose(self):
+        if self._pool_guard is not None and self._loop is asyncio.get_running_loop():
+            guard, self._pool_guard = self._pool_guard, None
+            await guard.aclose()
+        self._release_pool()
+        self._loop = None
+
+    async def generate(self, prompt, system_instruction, budget=None):
+        """Return model text, or ``FALLBACK_MESSAGE`` when every model fails in budget."""
+        await self._bind_to_running_loop()
+        self.stats["requests"] += 1
+        budget = self.total_budget if budget is None else min(budget, self.total_budget)
+        # Only callers with the same budget share a request, so none is cut short or kept waiting.
+        key = hashlib.sha256(
+            f"{system_instruction}\0{prompt}\0{budget}".encode("utf-8")
+        ).hexdigest()
+        inflight = self._inflight
+        task = inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._generate_with_fallback(prompt, system_instruction, budget)
+            )
+            inflight[key] = task
+            task.add_done_callback(lambda done: _forget_inflight(inflight, key, done))
+        else:
+            self.stats["coalesced"] += 1
+        # A caller that goes away must not cancel the shared request.
+        return await asyncio.shield(task)
+
+    async def _attempt(self, model, prompt, system_instruction, deadline):
+        async with self._semaphore:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            self.stats["attempts"] += 1
+            contents, config = generation_request(model, prompt, system_instruction)
+            response = await asyncio.wait_for(
+                self._client.aio.models.generate_content(
+                    model=model, contents=contents, config=config
+                ),
+                timeout=remaining,
+            )
+            return response.text
+
+    async def _generate_with_fallback(self, prompt, system_instruction, budget):
+        deadline = self._loop.time() + budget
+        queued_models = list(self.models)
+        running = {}
+
+        def start_next():
+            model = queued_models.pop(0)
+            attempt = asyncio.ensure_future(
+                self._attempt(model, prompt, system_instruction, deadline)
+            )
+            running[attempt] = model
+
+        try:
+            if queued_models:
+                start_next()
+            while running:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    self.stats["budget_exhausted"] += 1
+                    break
+                wait_for = min(remaining, self.hedge_delay) if queued_models else remaining
+                done, _pending = await asyncio.wait(
+                    running, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if queued_models:
+                        self.stats["hedges"] += 1
+                        start_next()
+                    continue
+
+                failures = 0
+                for attempt in done:
+                    model = running.pop(attempt)
+                    try:
+                        text = attempt.result()
+                    except asyncio.TimeoutError:
+                        failures += 1
+                        print(f"⚠️ 模型 {model} 逾時，切換下一個...")
+                    except Exception as error:
+                        failures += 1
+                        print(describe_model_error(model, error))
+                    else:
+                        if text:
+                            return text
+                        failures += 1
+                self.stats["failed_attempts"] += failures
+                # A failed model is replaced right away instead of waiting for the hedge timer.
+                for _ in range(min(failures, len(queued_models))):
+                    start_next()
+        finally:
+            for attempt in running:
+                attempt.cancel()
+        return FALLBACK_MESSAGE
@@ -0,0 +1,62 @@
+"""Cold-import regression benchmark for the API process (``python -X importtime``)."""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Modules that must stay out of ``import api``; they load on first use instead.
+DEFERRED_MODULES = ("rag", "google.genai", "sqlalchemy", "chromadb", "database")
+DEFAULT_BUDGET_MS = 1500
+
+
+def measure_imports(module="api"):
+    """Import ``module`` in a fresh interpreter and return per-module cumulative ms."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us) / 1000
+    return {
+        "module": module,
+        "total_ms": round(cumulative.get(module, 0.0), 1),
+        "modules": cumulative,
+        "deferred_loaded": [name for name in DEFERRED_MODULES if name in cumulative],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check cold-import time of the API module.")
+    parser.add_argument("--module", default="api", help="Module to import.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Fail above this total.")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list.")
+    parser.add_argument("--json", action="store_true", help="Print the full JSON report.")
+    args = parser.parse_args()
+
+    report = measure_imports(args.module)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"import {report['module']}: {report['total_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        slowest = sorted(report["modules"].items(), key=lambda item: item[1], reverse=True)
+        for name, elapsed in slowest[1:args.top + 1]:
+            print(f"  {elapsed:8.1f} ms  {name}")
+        if report["deferred_loaded"]:
+            print(f"Deferred modules imported eagerly: {', '.join(report['deferred_loaded'])}")
+    if report["deferred_loaded"] or report["total_ms"] > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
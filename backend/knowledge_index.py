@@ -0,0 +1,142 @@
+"""Bilingual BM25 inverted index for coaching-rule retrieval."""
+
+import heapq
+import math
+import re
+from pathlib import Path
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#=\-]*|[㐀-鿿]+")
+DOCUMENT_SUFFIXES = {".md", ".txt"}
+# Terms found in more than this share of a large corpus only re-rank documents
+# matched by rarer terms; they never pull in candidates on their own.
+STOP_TERM_RATIO = 0.5
+STOP_TERM_MIN_DOCUMENTS = 100
+
+
+def tokenize(text):
+    """Split English/SAN words into tokens and Chinese runs into bigrams."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer((text or "").lower()):
+        token = match.group()
+        if token[0].isascii():
+            tokens.append(token.rstrip("-"))
+        elif len(token) == 1:
+            tokens.append(token)
+        else:
+            tokens.extend(token[index:index + 2] for index in range(len(token) - 1))
+    return tokens
+
+
+def read_documents(directory):
+    """Yield paragraphs from ``*.md``/``*.txt`` files, skipping headings and READMEs."""
+    root = Path(directory)
+    if not root.is_dir():
+        return
+    for path in sorted(root.rglob("*")):
+        if path.suffix.lower() not in DOCUMENT_SUFFIXES or path.stem.lower() == "readme":
+            continue
+        text = path.read_text(encoding="utf-8")
+        for paragraph in re.split(r"\n\s*\n", text):
+            lines = [
+                line.strip() for line in paragraph.splitlines()
+                if line.strip() and not line.lstrip().startswith("#")
+            ]
+            if lines:
+                yield " ".join(lines)
+
+
+class KnowledgeIndex:
+    """Immutable BM25 index with per-posting weights computed at build time.
+
+    Queries sum precomputed weights term by term, rarest (highest weight)
+    first. Once the remaining terms cannot lift an unseen document into the
+    top ``limit`` (MaxScore pruning), they only update existing candidates, so
+    common terms stop costing a full posting-list scan. Stop terms (see
+    ``STOP_TERM_RATIO``) are always handled that way.
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = tuple(documents)
+        self.k1 = k1
+        self.b = b
+        term_frequencies = []
+        document_frequency = {}
+        for document in self.documents:
+            counts = {}
+            for token in tokenize(document):
+                counts[token] = counts.get(token, 0) + 1
+            term_frequencies.append(counts)
+            for token in counts:
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+
+        total = len(self.documents)
+        lengths = [sum(counts.values()) for counts in term_frequencies]
+        average_length = (sum(lengths) / total) if total else 0.0
+        self.stop_terms = frozenset(
+            token for token, df in document_frequency.items()
+            if total >= STOP_TERM_MIN_DOCUMENTS and df > total * STOP_TERM_RATIO
+        )
+        self.postings = {}
+        for doc_id, counts in enumerate(term_frequencies):
+            length_norm = k1 * (1 - b + b * lengths[doc_id] / average_length) if average_length else k1
+            for token, frequency in counts.items():
+                df = document_frequency[token]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                weight = idf * frequency * (k1 + 1) / (frequency + length_norm)
+                self.postings.setdefault(token, []).append((doc_id, weight))
+        self.max_weights = {}
+        self.weight_lookup = {}
+        for token, postings in self.postings.items():
+            self.postings[token] = tuple(postings)
+            self.max_weights[token] = max(weight for _doc_id, weight in postings)
+            self.weight_lookup[token] = dict(postings)
+
+    def __len__(self):
+        return len(self.documents)
+
+    @classmethod
+    def from_directory(cls, directory, seed_documents=(), **kwargs):
+        return cls([*seed_documents, *read_documents(directory)], **kwargs)
+
+    def search(self, query, limit=3, extra_terms=()):
+        """Return up to ``limit`` ``(score, doc_id)`` pairs, best first, ties by doc_id."""
+        terms = set(tokenize(query))
+        for term in extra_terms:
+            terms.update(tokenize(term))
+
+        matched = sorted(
+            ((self.max_weights[term], term) for term in terms if term in self.postings),
+            reverse=True,
+        )
+        remaining = sum(max_weight for max_weight, _term in matched)
+        processed = 0.0
+        scores = {}
+        get = scores.get
+        essential = True
+        for max_weight, term in matched:
+            remaining -= max_weight
+            processed += max_weight
+            if term in self.stop_terms:
+                essential = False
+            if essential:
+                for doc_id, weight in self.postings[term]:
+                    scores[doc_id] = get(doc_id, 0.0) + weight
+                # No score can exceed ``processed``, so skip the top-k scan until it could matter.
+                if len(scores) >= limit and remaining < processed:
+                    threshold = heapq.nlargest(limit, scores.values())[-1]
+                    if remaining < threshold:
+                        essential = False
+                        scores = {
+                            doc_id: score for doc_id, score in scores.items()
+                            if score + remaining >= threshold
+                        }
+                        get = scores.get
+            else:
+                lookup = self.weight_lookup[term]
+                for doc_id in scores:
+                    weight = lookup.get(doc_id)
+                    if weight:
+                        scores[doc_id] += weight
+        best = heapq.nsmallest(limit, ((-score, doc_id) for doc_id, score in scores.items()))
+        return [(-negative_score, doc_id) for negative_score, doc_id in best]
@@ -0,0 +1,229 @@
+"""Perft harness for move generation and make/unmake throughput.
+
+Counts the leaf nodes of the full legal move tree on standard positions and
+checks them against published counts. The same tree can be walked with
+python-chess's ``chess.Board`` or the engine's ``SearchBoard``, which makes
+this the regression check and the benchmark for move-generation changes.
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import chess
+
+from search_board import SearchBoard
+
+
+@dataclass(frozen=True)
+class PerftPosition:
+    name: str
+    suite: str
+    fen: str
+    # Expected leaf counts for depth 1, 2, 3, ...
+    nodes: tuple[int, ...]
+
+
+POSITIONS = (
+    PerftPosition(
+        name="start",
+        suite="start",
+        fen=chess.STARTING_FEN,
+        nodes=(20, 400, 8902, 197281, 4865609),
+    ),
+    PerftPosition(
+        name="kiwipete",
+        suite="kiwipete",
+        fen="r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        nodes=(48, 2039, 97862, 4085603),
+    ),
+    PerftPosition(
+        name="position5",
+        suite="kiwipete",
+        fen="rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        nodes=(44, 1486, 62379, 2103487),
+    ),
+    PerftPosition(
+        name="position6",
+        suite="kiwipete",
+        fen="r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        nodes=(46, 2079, 89890, 3894594),
+    ),
+    PerftPosition(
+        name="rook_endgame",
+        suite="endgame",
+        fen="8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        nodes=(14, 191, 2812, 43238, 674624),
+    ),
+    PerftPosition(
+        name="pinned_en_passant",
+        suite="endgame",
+        fen="8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+        nodes=(15, 126, 1928, 13931, 206379, 1440467),
+    ),
+    PerftPosition(
+        name="promotion_castling",
+        suite="promotion",
+        fen="r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        nodes=(6, 264, 9467, 422333),
+    ),
+    PerftPosition(
+        name="promotion_castling_mirrored",
+        suite="promotion",
+        fen="r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+        nodes=(6, 264, 9467, 422333),
+    ),
+    PerftPosition(
+        name="underpromotion",
+        suite="promotion",
+        fen="n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+        nodes=(24, 496, 9483, 182838, 3605103),
+    ),
+)
+
+POSITIONS_BY_NAME = {position.name: position for position in POSITIONS}
+SUITES = tuple(dict.fromkeys(position.suite for position in POSITIONS))
+BOARD_TYPES = {
+    "python-chess": chess.Board,
+    "search": SearchBoard,
+}
+
+
+def perft(board, depth):
+    """Count the leaves of the legal move tree, pushing and popping every move."""
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in board.generate_legal_moves():
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def _divide_move(board_type, fen, uci, depth):
+    board = BOARD_TYPES[board_type](fen)
+    board.push(chess.Move.from_uci(uci))
+    return perft(board, depth - 1)
+
+
+def divide(fen, depth, board_type="python-chess", processes=1):
+    """Return ``{uci: leaf count}`` for every root move.
+
+    With ``processes > 1`` the root moves are split across worker processes.
+    """
+    if depth < 1:
+        raise ValueError("divide needs a depth of at least 1")
+    board = BOARD_TYPES[board_type](fen)
+    moves = [move.uci() for move in board.generate_legal_moves()]
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            counts = executor.map(
+                _divide_move,
+                [board_type] * len(moves),
+                [fen] * len(moves),
+                moves,
+                [depth] * len(moves),
+            )
+            return dict(zip(moves, counts))
+    return {uci: _divide_move(board_type, fen, uci, depth) for uci in moves}
+
+
+def run_position(position, depth=None, board_type="python-chess", processes=1, include_divide=False):
+    """Time one perft run and compare it with the expected count when known."""
+    depth = depth or len(position.nodes)
+    started_at = time.perf_counter()
+    if processes > 1 or include_divide:
+        counts = divide(position.fen, depth, board_type, processes)
+        nodes = sum(counts.values())
+    else:
+        counts = None
+        nodes = perft(BOARD_TYPES[board_type](position.fen), depth)
+    elapsed = time.perf_counter() - started_at
+    expected = position.nodes[depth - 1] if depth <= len(position.nodes) else None
+    result = {
+        "name": position.name,
+        "suite": position.suite,
+        "board": board_type,
+        "depth": depth,
+        "nodes": nodes,
+        "expected": expected,
+        "passed": expected is None or nodes == expected,
+        "seconds": round(elapsed, 3),
+        "nps": round(nodes / elapsed) if elapsed > 0 else 0,
+    }
+    if include_divide:
+        result["divide"] = counts
+    return result
+
+
+def run(positions=POSITIONS, depth=None, board_types=("python-chess",), processes=1, include_divide=False):
+    """Run perft for every position and board type.
+
+    ``depth`` caps each position at its deepest known count, so one small
+    depth runs a whole suite quickly; positions without counts use it as is.
+    """
+    results = []
+    for position in positions:
+        position_depth = min(depth, len(position.nodes)) if depth and position.nodes else depth
+        for board_type in board_types:
+            results.append(run_position(position, position_depth, board_type, processes, include_divide))
+    nodes = sum(item["nodes"] for item in results)
+    seconds = sum(item["seconds"] for item in results)
+    return {
+        "positions": len(results),
+        "passed": sum(item["passed"] for item in results),
+        "nodes": nodes,
+        "seconds": round(seconds, 3),
+        "nps": round(nodes / seconds) if seconds > 0 else 0,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count perft nodes and measure move-generation throughput.")
+    parser.add_argument("--suite", choices=(*SUITES, "all"), default="all", help="Position suite to run.")
+    parser.add_argument("--position", choices=sorted(POSITIONS_BY_NAME), help="Run a single named position.")
+    parser.add_argument("--fen", help="Run a custom FEN (requires --depth; no expected count).")
+    parser.add_argument("--depth", type=int, help="Search depth; defaults to each position's deepest known count.")
+    parser.add_argument("--board", choices=(*BOARD_TYPES, "both"), default="python-chess", help="Board implementation.")
+    parser.add_argument("--divide", action="store_true", help="Print per-root-move counts.")
+    parser.add_argument("--processes", type=int, default=1, help="Split root moves across this many processes.")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON.")
+    args = parser.parse_args()
+
+    if args.fen:
+        if not args.depth:
+            parser.error("--fen requires --depth")
+        positions = (PerftPosition(name="custom", suite="custom", fen=args.fen, nodes=()),)
+    elif args.position:
+        positions = (POSITIONS_BY_NAME[args.position],)
+    else:
+        positions = tuple(position for position in POSITIONS if args.suite in ("all", position.suite))
+    board_types = tuple(BOARD_TYPES) if args.board == "both" else (args.board,)
+
+    report = run(positions, args.depth, board_types, max(1, args.processes), args.divide)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(
+            f"Perft: {report['passed']}/{report['positions']} passed, "
+            f"{report['nodes']} nodes in {report['seconds']:.2f}s ({report['nps']} nodes/s)"
+        )
+        for item in report["results"]:
+            mark = "OK" if item["passed"] else "MISS"
+            expected = item["expected"] if item["expected"] is not None else "?"
+            print(
+                f"  [{mark}] {item['suite']}/{item['name']} {item['board']} depth={item['depth']}: "
+                f"{item['nodes']} (expected {expected}) {item['seconds']:.2f}s {item['nps']} nodes/s"
+            )
+            for uci, count in sorted((item.get("divide") or {}).items()):
+                print(f"      {uci}: {count}")
+    if report["passed"] != report["positions"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Server-side pondering for bot game sessions."""
+
+import threading
+import uuid
+from collections import OrderedDict
+
+from speculation import Preemption
+
+
+class _PonderCancel:
+    """Stop one ponder search when the engine gets busy or its job is superseded."""
+
+    def __init__(self, preemption, superseded):
+        self._preemption = preemption
+        self._superseded = superseded
+
+    def is_set(self):
+        return self._superseded.is_set() or self._preemption.is_set()
+
+
+class _PonderJob:
+    def __init__(self, position, params):
+        self.position = position
+        self.params = params
+        self.result = None
+        self.superseded = threading.Event()
+
+
+class Ponderer:
+    """Search each session's expected next position while the player thinks.
+
+    ``ponder(session_id, position, params)`` queues a search of the position
+    after the player's predicted reply, using the same ``params`` the next
+    bot move would use; the worker calls ``search(session_id, position,
+    params, cancel_event)``. ``position`` is only compared for equality here.
+    ``take`` then returns the finished result when the player did play that
+    reply (a ponder hit); otherwise the job is dropped and the real search
+    runs on the transposition table the ponder warmed.
+
+    CPU use is capped per session, at one bot search per move, and globally:
+    a single worker thread, only while no live request runs, preempted
+    within 64 nodes when one arrives, and at most ``max_sessions`` sessions.
+    """
+
+    def __init__(self, search, is_busy, max_sessions=64, idle_poll_seconds=0.05):
+        self.search = search
+        self.is_busy = is_busy
+        self.max_sessions = max(1, int(max_sessions))
+        self.idle_poll_seconds = idle_poll_seconds
+        self.stats = {"pondered": 0, "hits": 0, "misses": 0, "preempted": 0, "evicted_sessions": 0}
+        self._sessions = OrderedDict()
+        self._queue = []
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._preemption = Preemption(self._stop_event, is_busy)
+        self._thread = None
+
+    @staticmethod
+    def new_session_id():
+        return uuid.uuid4().hex
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="ponder", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def ponder(self, session_id, position, params):
+        with self._condition:
+            self._drop_job(session_id)
+            self._sessions[session_id] = _PonderJob(position, params)
+            self._sessions.move_to_end(session_id)
+            self._queue.append(session_id)
+            while len(self._sessions) > self.max_sessions:
+                oldest, _job = next(iter(self._sessions.items()))
+                self._drop_job(oldest)
+                self.stats["evicted_sessions"] += 1
+            self._condition.notify_all()
+
+    def take(self, session_id, position, params):
+        """Return the pondered result for ``position``, or None on a ponder miss."""
+        with self._condition:
+            job = self._sessions.get(session_id)
+            if job is None:
+                return None
+            self._drop_job(session_id)
+            if job.result is not None and job.position == position and job.params == params:
+                self.stats["hits"] += 1
+                return job.result
+            self.stats["misses"] += 1
+            return None
+
+    def discard(self, session_id):
+        """Forget a finished session and stop any search still running for it."""
+        with self._condition:
+            self._drop_job(session_id)
+
+    def _drop_job(self, session_id):
+        job = self._sessions.pop(session_id, None)
+        if job is not None:
+            job.superseded.set()
+        if session_id in self._queue:
+            self._queue.remove(session_id)
+
+    def _next_job(self):
+        with self._condition:
+            while not self._queue and not self._stop_event.is_set():
+                self._condition.wait()
+            if not self._queue:
+                return None, None
+            session_id = self._queue[0]
+            return session_id, self._sessions[session_id]
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            session_id, job = self._next_job()
+            if job is None:
+                continue
+            if self.is_busy():
+                self._stop_event.wait(self.idle_poll_seconds)
+                continue
+            self._preemption.reset()
+            cancel = _PonderCancel(self._preemption, job.superseded)
+            try:
+                result = self.search(session_id, job.position, job.params, cancel)
+            except Exception as e:
+                print(f"Ponder search failed: {e}")
+                result = None
+            with self._condition:
+                if job.superseded.is_set():
+                    continue
+                if self._preemption.is_set() and result is None:
+                    # Preempted by a live request: retry after the others.
+                    self.stats["preempted"] += 1
+                    self._queue.remove(session_id)
+                    self._queue.append(session_id)
+                    continue
+                job.result = result
+                self.stats["pondered"] += 1
+                if session_id in self._queue:
+                    self._queue.remove(session_id)
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "sessions": len(self._sessions),
+                "queued": len(self._queue),
+                **self.stats,
+            }
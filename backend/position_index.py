@@ -0,0 +1,320 @@
+"""Local nearest-neighbour index of master/Lichess positions ingested from PGN.
+
+Each position is reduced to structural features: a 768-bit piece-square set
+(12 piece kinds x 64 squares), plus the pawn skeleton, material signature and
+game phase derived from it. Candidates come from MinHash banding (LSH over the
+set bits) and are ranked by an exact feature distance, so lookups touch a few
+buckets instead of the whole collection and always return the same answer.
+"""
+
+import argparse
+import io
+import random
+import struct
+from pathlib import Path
+
+import chess
+import chess.pgn
+
+
+INDEX_MAGIC = b"CCPI"
+INDEX_VERSION = 1
+HEADER = struct.Struct("<4sHBBII")
+RECORD_PREFIX = "<96sBIH"
+SQUARE_BITS = 12 * 64
+MINHASH_PRIME = 2_147_483_647
+MINHASH_SEED = 20240611
+DEFAULT_BANDS = 8
+DEFAULT_ROWS = 4
+DEFAULT_MAX_PLIES = 40
+DEFAULT_MAX_DISTANCE = 12
+# Early-opening structures collide with thousands of positions; a bucket keeps
+# its first entries only, which bounds query cost without losing close matches.
+MAX_BUCKET_SIZE = 256
+PHASE_WEIGHTS = {chess.KNIGHT: 1, chess.BISHOP: 1, chess.ROOK: 2, chess.QUEEN: 4}
+MATERIAL_PIECES = [
+    (color, piece_type)
+    for color in chess.COLORS
+    for piece_type in (chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN)
+]
+PAWN_MASK = (1 << 64) - 1
+
+
+def _plane(color, piece_type):
+    return (0 if color == chess.WHITE else 6) + piece_type - 1
+
+
+def piece_squares(board):
+    """Pack every piece's (kind, square) into one 768-bit integer."""
+    bits = 0
+    for color in chess.COLORS:
+        for piece_type in chess.PIECE_TYPES:
+            bits |= int(board.pieces_mask(piece_type, color)) << (64 * _plane(color, piece_type))
+    return bits
+
+
+def _bitboard(squares, color, piece_type):
+    return (squares >> (64 * _plane(color, piece_type))) & PAWN_MASK
+
+
+def pawn_signature(squares):
+    return _bitboard(squares, chess.WHITE, chess.PAWN), _bitboard(squares, chess.BLACK, chess.PAWN)
+
+
+def material_signature(squares):
+    return tuple(
+        _bitboard(squares, color, piece_type).bit_count()
+        for color, piece_type in MATERIAL_PIECES
+    )
+
+
+def game_phase(squares):
+    """Return 0 (bare kings and pawns) .. 24 (all minor and major pieces)."""
+    phase = sum(
+        weight * _bitboard(squares, color, piece_type).bit_count()
+        for color in chess.COLORS
+        for piece_type, weight in PHASE_WEIGHTS.items()
+    )
+    return min(phase, 24)
+
+
+def _set_bits(value):
+    while value:
+        low = value & -value
+        yield low.bit_length() - 1
+        value ^= low
+
+
+def _hash_tables(count):
+    """Precompute each MinHash function's value for every one of the 768 bits."""
+    rng = random.Random(MINHASH_SEED)
+    tables = []
+    for _ in range(count):
+        a, b = rng.randrange(1, MINHASH_PRIME), rng.randrange(MINHASH_PRIME)
+        tables.append([(a * bit + b) % MINHASH_PRIME for bit in range(SQUARE_BITS)])
+    return tables
+
+
+def _fold(values):
+    key = 0
+    for value in values:
+        key = ((key * 1_000_003) ^ value) & 0xFFFFFFFF
+    return key
+
+
+class PositionEntry:
+    __slots__ = ("squares", "turn", "game", "move", "band_keys")
+
+    def __init__(self, squares, turn, game, move):
+        self.squares = squares
+        self.turn = turn
+        self.game = game
+        self.move = move
+        self.band_keys = ()
+
+
+def feature_distance(squares, other, limit):
+    """Piece-square Hamming distance plus material, phase and pawn-skeleton differences.
+
+    Returns None as soon as the distance is known to exceed ``limit``.
+    """
+    distance = (squares ^ other).bit_count()
+    if distance > limit:
+        return None
+    distance += 2 * sum(
+        abs(a - b) for a, b in zip(material_signature(squares), material_signature(other))
+    )
+    distance += abs(game_phase(squares) - game_phase(other))
+    if pawn_signature(squares) != pawn_signature(other):
+        distance += 1
+    return distance if distance <= limit else None
+
+
+def _encode_move(move):
+    promotion = move.promotion or 0
+    return move.from_square | (move.to_square << 6) | (promotion << 12)
+
+
+def _decode_move(value):
+    promotion = value >> 12
+    return chess.Move(value & 63, (value >> 6) & 63, promotion=promotion or None)
+
+
+class PositionIndex:
+    """Deduplicated positions with MinHash-band buckets for similarity lookup."""
+
+    def __init__(self, games=(), entries=(), bands=DEFAULT_BANDS, rows=DEFAULT_ROWS):
+        self.games = list(games)
+        self.entries = []
+        self.bands = bands
+        self.rows = rows
+        self._record = struct.Struct(f"{RECORD_PREFIX}{bands}I")
+        self._tables = _hash_tables(bands * rows)
+        self._buckets = {}
+        self._seen = set()
+        for entry, band_keys in entries:
+            self._add(entry, band_keys)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _band_keys(self, squares, turn):
+        """Fold each band of the MinHash signature (and the side to move) into 32 bits."""
+        bits = list(_set_bits(squares))
+        signature = [min(map(table.__getitem__, bits)) for table in self._tables]
+        rows = self.rows
+        return [
+            _fold((int(turn), *signature[band * rows:(band + 1) * rows]))
+            for band in range(self.bands)
+        ]
+
+    def _add(self, entry, band_keys=None):
+        identity = (entry.squares, entry.turn)
+        if identity in self._seen:
+            return False
+        self._seen.add(identity)
+        entry_id = len(self.entries)
+        self.entries.append(entry)
+        # Band keys are stored on disk so loading never recomputes signatures.
+        entry.band_keys = band_keys or self._band_keys(entry.squares, entry.turn)
+        for band, key in enumerate(entry.band_keys):
+            bucket = self._buckets.setdefault((band, key), [])
+            if len(bucket) < MAX_BUCKET_SIZE:
+                bucket.append(entry_id)
+        return True
+
+    def add_game(self, game, max_plies=DEFAULT_MAX_PLIES, source=None):
+        """Index the position before each mainline move; return how many were new."""
+        headers = game.headers
+        site = headers.get("Site", "")
+        self.games.append({
+            "white": headers.get("White", "?"),
+            "black": headers.get("Black", "?"),
+            "result": headers.get("Result", "*"),
+            "source": source or ("lichess" if "lichess" in site.lower() else "master"),
+        })
+        game_id = len(self.games) - 1
+        board = game.board()
+        added = 0
+        for ply, move in enumerate(game.mainline_moves()):
+            if ply >= max_plies:
+                break
+            entry = PositionEntry(piece_squares(board), board.turn, game_id, _encode_move(move))
+            added += self._add(entry)
+            board.push(move)
+        return added
+
+    def add_pgn(self, handle, max_plies=DEFAULT_MAX_PLIES, source=None):
+        games = 0
+        while True:
+            game = chess.pgn.read_game(handle)
+            if game is None:
+                return games
+            if game.errors:
+                continue
+            self.add_game(game, max_plies=max_plies, source=source)
+            games += 1
+
+    def nearest(self, board, max_distance=DEFAULT_MAX_DISTANCE):
+        """Return ``(distance, entry)`` for the closest indexed position, or None."""
+        squares = piece_squares(board)
+        candidates = set()
+        for band, key in enumerate(self._band_keys(squares, board.turn)):
+            candidates.update(self._buckets.get((band, key), ()))
+        best = None
+        for entry_id in sorted(candidates):
+            limit = max_distance if best is None else best[0] - 1
+            distance = feature_distance(squares, self.entries[entry_id].squares, limit)
+            if distance is not None:
+                best = (distance, entry_id)
+        if best is None:
+            return None
+        return best[0], self.entries[best[1]]
+
+    def describe(self, entry):
+        game = self.games[entry.game]
+        return {**game, "move": _decode_move(entry.move).uci()}
+
+    def save(self, path):
+        """Write fixed-size position records followed by the game table."""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        chunks = [HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.bands, self.rows, len(self.entries), len(self.games))]
+        for entry in self.entries:
+            chunks.append(self._record.pack(
+                entry.squares.to_bytes(SQUARE_BITS // 8, "little"),
+                int(entry.turn),
+                entry.game,
+                entry.move,
+                *entry.band_keys,
+            ))
+        for game in self.games:
+            fields = (game["white"], game["black"], game["result"], game["source"])
+            chunks.append("\t".join(field.replace("\t", " ") for field in fields).encode("utf-8") + b"\n")
+        temporary = target.with_name(f"{target.name}.tmp")
+        temporary.write_bytes(b"".join(chunks))
+        temporary.replace(target)
+
+    @classmethod
+    def load(cls, path):
+        data = Path(path).read_bytes()
+        magic, version, bands, rows, entry_count, game_count = HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"Unsupported position index: {path}")
+        record = struct.Struct(f"{RECORD_PREFIX}{bands}I")
+        offset = HEADER.size
+        entries = []
+        for squares, turn, game, move, *band_keys in record.iter_unpack(
+            data[offset:offset + entry_count * record.size]
+        ):
+            entry = PositionEntry(int.from_bytes(squares, "little"), bool(turn), game, move)
+            entries.append((entry, band_keys))
+        offset += entry_count * record.size
+        games = []
+        for line in data[offset:].decode("utf-8").splitlines()[:game_count]:
+            white, black, result, source = line.split("\t")
+            games.append({"white": white, "black": black, "result": result, "source": source})
+        return cls(games=games, entries=entries, bands=bands, rows=rows)
+
+
+def build_index(pgn_paths, max_plies=DEFAULT_MAX_PLIES):
+    index = PositionIndex()
+    for pgn_path in pgn_paths:
+        path = Path(pgn_path)
+        files = sorted(path.rglob("*.pgn")) if path.is_dir() else [path]
+        for file in files:
+            with io.open(file, encoding="utf-8", errors="replace") as handle:
+                index.add_pgn(handle, max_plies=max_plies)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the local similar-position index.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build", help="Ingest PGN files or directories.")
+    build.add_argument("pgn", nargs="+", help="PGN files or directories containing *.pgn.")
+    build.add_argument("--output", required=True, help="Index file to write.")
+    build.add_argument("--max-plies", type=int, default=DEFAULT_MAX_PLIES, help="Plies indexed per game.")
+    query = subcommands.add_parser("query", help="Look up the closest indexed position.")
+    query.add_argument("fen")
+    query.add_argument("--index", required=True, help="Index file to read.")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = build_index(args.pgn, max_plies=args.max_plies)
+        index.save(args.output)
+        print(f"Indexed {len(index)} positions from {len(index.games)} games -> {args.output}")
+        return
+
+    index = PositionIndex.load(args.index)
+    match = index.nearest(chess.Board(args.fen))
+    if match is None:
+        print("No similar position.")
+        return
+    distance, entry = match
+    info = index.describe(entry)
+    print(f"distance={distance} {info['white']} vs {info['black']} ({info['result']}, {info['source']}) played {info['move']}")
+
+
+if __name__ == "__main__":
+    main()
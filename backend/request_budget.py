@@ -0,0 +1,91 @@
+"""Per-request wall-clock budget split across the stages of one response."""
+
+import time
+
+
+# Share of the request budget for each stage, in the order the stages run.
+DEFAULT_STAGE_SHARES = {
+    "search": 0.7,
+    "teaching": 0.2,
+    "coach_startup": 0.05,
+    "coaching": 0.05,
+}
+# A stage never gets zero seconds: engine calls treat a zero limit as unbounded.
+MIN_STAGE_SECONDS = 0.01
+
+
+class RequestBudget:
+    """Wall-clock budget for one request, allocated stage by stage.
+
+    ``allocate(stage)`` gives a stage its share of the time still left,
+    counting only that stage and the ones after it, so time an earlier stage
+    did not use rolls over to the later ones and the whole request stays
+    within ``total`` seconds. A budget without a total allocates ``None``
+    (no limit) to every stage.
+    """
+
+    def __init__(self, total, shares=None, clock=time.monotonic):
+        self.total = total or None
+        self.shares = dict(shares or DEFAULT_STAGE_SHARES)
+        self._clock = clock
+        self.started_at = clock()
+        self.deadline = self.started_at + self.total if self.total else None
+        self.stages = {}
+        self._open_stage = None
+
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self._clock())
+
+    def allocate(self, stage):
+        """Start ``stage`` and return its time limit in seconds (None when unbounded)."""
+        if stage not in self.shares:
+            raise ValueError(f"Unknown budget stage: {stage}")
+        self._close_open_stage()
+        now = self._clock()
+        if self.deadline is None:
+            limit = None
+        else:
+            stage_names = list(self.shares)
+            later_shares = sum(self.shares[name] for name in stage_names[stage_names.index(stage):])
+            share = self.shares[stage] / later_shares if later_shares else 1.0
+            limit = max(MIN_STAGE_SECONDS, (self.deadline - now) * share)
+        self.stages[stage] = {"allocated": limit, "started_at": now, "used": None}
+        self._open_stage = stage
+        return limit
+
+    def adopt(self, other):
+        """Record the stages ``other`` ran that this budget has not, for shared work.
+
+        A request that awaited another request's computation reports the time
+        that computation was given and used instead of an empty stage.
+        """
+        now = other._clock()
+        for stage, record in other.stages.items():
+            if stage in self.stages:
+                continue
+            used = record["used"] if record["used"] is not None else now - record["started_at"]
+            self.stages[stage] = {**record, "used": used}
+
+    def _close_open_stage(self):
+        if self._open_stage is not None:
+            record = self.stages[self._open_stage]
+            record["used"] = self._clock() - record["started_at"]
+            self._open_stage = None
+
+    def report(self):
+        """Allocated and used seconds per stage, for response telemetry."""
+        self._close_open_stage()
+        elapsed = self._clock() - self.started_at
+        return {
+            "total": self.total,
+            "elapsed": round(elapsed, 3),
+            "stages": {
+                stage: {
+                    "allocated": round(record["allocated"], 3) if record["allocated"] is not None else None,
+                    "used": round(record["used"], 3),
+                }
+                for stage, record in self.stages.items()
+            },
+        }
@@ -0,0 +1,309 @@
+"""Compact make/unmake board for the engine's search hot path.
+
+``SearchBoard`` keeps python-chess's bitboard layout, so move generation,
+attack tests and the evaluator run on it unchanged. It replaces ``push`` and
+``pop`` with a tuple undo stack (no ``_BoardState`` objects, castling-rights
+cleaning or chess960 translation per move) and maintains the Polyglot Zobrist
+hash, material and piece-square sums incrementally. Only standard chess is
+supported; boards are converted once at the search boundary with
+``SearchBoard.from_board``.
+"""
+
+import chess
+import chess.polyglot
+
+from evaluation import PIECE_VALUES, get_piece_square_value
+
+
+_KEYS = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+CASTLING_KEYS = ((chess.BB_H1, _KEYS[768]), (chess.BB_A1, _KEYS[769]), (chess.BB_H8, _KEYS[770]), (chess.BB_A8, _KEYS[771]))
+EP_KEYS = _KEYS[772:780]
+TURN_KEY = _KEYS[780]
+CASTLING_ROOKS = {
+    chess.G1: (chess.H1, chess.F1),
+    chess.C1: (chess.A1, chess.D1),
+    chess.G8: (chess.H8, chess.F8),
+    chess.C8: (chess.A8, chess.D8),
+}
+BB_SQUARES = chess.BB_SQUARES
+
+
+def _piece_tables():
+    """Index by ``piece_type * 2 + color``: (zobrist keys, material, opening PST, endgame PST)."""
+    tables = [None] * 14
+    for piece_type in chess.PIECE_TYPES:
+        for color in chess.COLORS:
+            sign = 1 if color == chess.WHITE else -1
+            tables[piece_type * 2 + color] = (
+                [_KEYS[64 * ((piece_type - 1) * 2 + color) + square] for square in chess.SQUARES],
+                sign * PIECE_VALUES[piece_type],
+                [sign * get_piece_square_value(piece_type, square, color, False) for square in chess.SQUARES],
+                [sign * get_piece_square_value(piece_type, square, color, True) for square in chess.SQUARES],
+            )
+    return tables
+
+
+PIECE_TABLES = _piece_tables()
+
+
+def zobrist_hash(board):
+    """Polyglot hash of ``board``, read incrementally from a ``SearchBoard``."""
+    if type(board) is SearchBoard:
+        return board.zobrist
+    return chess.polyglot.zobrist_hash(board)
+
+
+class SearchBoard(chess.Board):
+    """Standard-chess board with cheap make/unmake and incremental search state.
+
+    Only ``push``/``pop`` keep the incremental state; other mutators are not
+    meant for search boards. ``pop`` can only undo moves pushed on this board.
+    """
+
+    def __init__(self, fen=chess.STARTING_FEN):
+        super().__init__(fen)
+        self._undo = []
+        self._root_hashes = ()
+        self._refresh()
+
+    @classmethod
+    def from_board(cls, board):
+        """Convert ``board``, remembering its reversible tail for repetition checks."""
+        search_board = cls(None)
+        search_board.pawns = board.pawns
+        search_board.knights = board.knights
+        search_board.bishops = board.bishops
+        search_board.rooks = board.rooks
+        search_board.queens = board.queens
+        search_board.kings = board.kings
+        search_board.occupied_co = list(board.occupied_co)
+        search_board.occupied = board.occupied
+        search_board.promoted = board.promoted
+        search_board.turn = board.turn
+        search_board.castling_rights = board.clean_castling_rights()
+        search_board.ep_square = board.ep_square
+        search_board.halfmove_clock = board.halfmove_clock
+        search_board.fullmove_number = board.fullmove_number
+        search_board._refresh()
+
+        window = min(board.halfmove_clock, len(board.move_stack))
+        if window:
+            history = board.copy(stack=window)
+            tail = []
+            for _ in range(window):
+                history.pop()
+                tail.append(chess.polyglot.zobrist_hash(history))
+            search_board._root_hashes = tuple(reversed(tail))
+        return search_board
+
+    def _refresh(self):
+        """Recompute the incremental sums from the bitboards."""
+        self.castling_rights = chess.Board.clean_castling_rights(self)
+        piece_hash = material = opening = endgame = 0
+        for square, piece in self.piece_map().items():
+            keys, value, opening_table, endgame_table = PIECE_TABLES[piece.piece_type * 2 + piece.color]
+            piece_hash ^= keys[square]
+            material += value
+            opening += opening_table[square]
+            endgame += endgame_table[square]
+        self.piece_hash = piece_hash
+        self.material = material
+        self.pst_opening = opening
+        self.pst_endgame = endgame
+        self.zobrist = self._full_hash()
+
+    def _full_hash(self):
+        zobrist = self.piece_hash
+        castling_rights = self.castling_rights
+        if castling_rights:
+            for mask, key in CASTLING_KEYS:
+                if castling_rights & mask:
+                    zobrist ^= key
+        ep_square = self.ep_square
+        if ep_square is not None:
+            # Polyglot hashes the file only when a pawn could capture.
+            turn = self.turn
+            behind = ep_square - 8 if turn == chess.WHITE else ep_square + 8
+            file = ep_square & 7
+            capturers = (BB_SQUARES[behind - 1] if file > 0 else 0) | (BB_SQUARES[behind + 1] if file < 7 else 0)
+            if capturers & self.pawns & self.occupied_co[turn]:
+                zobrist ^= EP_KEYS[file]
+        if self.turn == chess.WHITE:
+            zobrist ^= TURN_KEY
+        return zobrist
+
+    def material_and_piece_square(self, endgame):
+        """The evaluator's material and piece-square components, kept incrementally."""
+        return self.material, self.pst_endgame if endgame else self.pst_opening
+
+    def clean_castling_rights(self):
+        # Rights are cleaned on conversion and only ever removed by push.
+        return self.castling_rights
+
+    def _lift(self, square, piece_type, color):
+        mask = BB_SQUARES[square]
+        if piece_type == chess.PAWN:
+            self.pawns ^= mask
+        elif piece_type == chess.KNIGHT:
+            self.knights ^= mask
+        elif piece_type == chess.BISHOP:
+            self.bishops ^= mask
+        elif piece_type == chess.ROOK:
+            self.rooks ^= mask
+        elif piece_type == chess.QUEEN:
+            self.queens ^= mask
+        else:
+            self.kings ^= mask
+        self.occupied ^= mask
+        self.occupied_co[color] ^= mask
+        keys, value, opening_table, endgame_table = PIECE_TABLES[piece_type * 2 + color]
+        self.piece_hash ^= keys[square]
+        self.material -= value
+        self.pst_opening -= opening_table[square]
+        self.pst_endgame -= endgame_table[square]
+
+    def _place(self, square, piece_type, color):
+        mask = BB_SQUARES[square]
+        if piece_type == chess.PAWN:
+            self.pawns |= mask
+        elif piece_type == chess.KNIGHT:
+            self.knights |= mask
+        elif piece_type == chess.BISHOP:
+            self.bishops |= mask
+        elif piece_type == chess.ROOK:
+            self.rooks |= mask
+        elif piece_type == chess.QUEEN:
+            self.queens |= mask
+        else:
+            self.kings |= mask
+        self.occupied |= mask
+        self.occupied_co[color] |= mask
+        keys, value, opening_table, endgame_table = PIECE_TABLES[piece_type * 2 + color]
+        self.piece_hash ^= keys[square]
+        self.material += value
+        self.pst_opening += opening_table[square]
+        self.pst_endgame += endgame_table[square]
+
+    def push(self, move):
+        turn = self.turn
+        occupied_co = self.occupied_co
+        self._undo.append((
+            self.pawns, self.knights, self.bishops, self.rooks, self.queens, self.kings,
+            occupied_co[chess.WHITE], occupied_co[chess.BLACK], self.occupied, self.promoted,
+            self.castling_rights, self.ep_square, self.halfmove_clock, self.fullmove_number,
+            self.piece_hash, self.material, self.pst_opening, self.pst_endgame, self.zobrist,
+        ))
+        self.move_stack.append(move)
+        ep_square = self.ep_square
+        self.ep_square = None
+        self.halfmove_clock += 1
+        if turn == chess.BLACK:
+            self.fullmove_number += 1
+        if not move:
+            self.turn = not turn
+            self.zobrist = self._full_hash()
+            return
+
+        from_square = move.from_square
+        to_square = move.to_square
+        from_mask = BB_SQUARES[from_square]
+        to_mask = BB_SQUARES[to_square]
+        piece_type = self.piece_type_at(from_square)
+        promoted = self.promoted & from_mask
+        self._lift(from_square, piece_type, turn)
+
+        castling_rook = None
+        if piece_type == chess.KING:
+            self.castling_rights &= ~(chess.BB_RANK_1 if turn == chess.WHITE else chess.BB_RANK_8)
+            if occupied_co[turn] & to_mask:
+                # King-takes-own-rook notation: castle towards that rook.
+                to_square = (chess.C1 if to_square < from_square else chess.G1) + (56 if turn == chess.BLACK else 0)
+                to_mask = BB_SQUARES[to_square]
+            if to_square - from_square in (2, -2):
+                castling_rook = CASTLING_ROOKS[to_square]
+        self.castling_rights &= ~from_mask & ~to_mask
+
+        captured_type = self.piece_type_at(to_square)
+        if captured_type:
+            self._lift(to_square, captured_type, not turn)
+            self.halfmove_clock = 0
+        if piece_type == chess.PAWN:
+            self.halfmove_clock = 0
+            delta = to_square - from_square
+            if delta == 16 or delta == -16:
+                self.ep_square = from_square + delta // 2
+            elif to_square == ep_square and not captured_type:
+                self._lift(to_square - 8 if turn == chess.WHITE else to_square + 8, chess.PAWN, not turn)
+            if move.promotion:
+                piece_type = move.promotion
+                promoted = to_mask
+        self.promoted &= ~from_mask & ~to_mask
+        if promoted:
+            self.promoted |= to_mask
+
+        self._place(to_square, piece_type, turn)
+        if castling_rook is not None:
+            rook_from, rook_to = castling_rook
+            self._lift(rook_from, chess.ROOK, turn)
+            self._place(rook_to, chess.ROOK, turn)
+        self.turn = not turn
+        self.zobrist = self._full_hash()
+
+    def pop(self):
+        move = self.move_stack.pop()
+        (
+            self.pawns, self.knights, self.bishops, self.rooks, self.queens, self.kings,
+            white, black, self.occupied, self.promoted,
+            self.castling_rights, self.ep_square, self.halfmove_clock, self.fullmove_number,
+            self.piece_hash, self.material, self.pst_opening, self.pst_endgame, self.zobrist,
+        ) = self._undo.pop()
+        self.occupied_co = [black, white]
+        self.turn = not self.turn
+        return move
+
+    def reversible_hashes(self):
+        """Hashes since the last irreversible move, oldest first, ending with the current one."""
+        window = self.halfmove_clock
+        hashes = [*self._root_hashes, *(state[-1] for state in self._undo)]
+        return [*hashes[max(0, len(hashes) - window):], self.zobrist] if window else [self.zobrist]
+
+    def is_repetition(self, count=3):
+        """Count the current position among hashes since the last irreversible move."""
+        return self.reversible_hashes().count(self.zobrist) >= count
+
+    def copy(self, *, stack=True):
+        """Return a ``SearchBoard`` of this position, with history as in ``chess.Board.copy``.
+
+        ``stack=True`` keeps every move, ``False`` (or 0) none and an int
+        the last that many plies; the copy can pop exactly those, and its
+        repetition checks see only the history it kept.
+        """
+        board = type(self)(None)
+        board.pawns = self.pawns
+        board.knights = self.knights
+        board.bishops = self.bishops
+        board.rooks = self.rooks
+        board.queens = self.queens
+        board.kings = self.kings
+        board.occupied_co = list(self.occupied_co)
+        board.occupied = self.occupied
+        board.promoted = self.promoted
+        board.turn = self.turn
+        board.castling_rights = self.castling_rights
+        board.ep_square = self.ep_square
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+        board.piece_hash = self.piece_hash
+        board.material = self.material
+        board.pst_opening = self.pst_opening
+        board.pst_endgame = self.pst_endgame
+        board.zobrist = self.zobrist
+        if stack:
+            plies = len(self.move_stack) + len(self._root_hashes) if stack is True else stack
+            start = max(0, len(self.move_stack) - plies)
+            board.move_stack = self.move_stack[start:]
+            board._undo = self._undo[start:]
+            # Positions from before the root board count as the oldest plies.
+            older = plies - len(self.move_stack)
+            board._root_hashes = self._root_hashes[-older:] if older > 0 else ()
+        return board
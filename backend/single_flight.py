@@ -0,0 +1,88 @@
+"""Single-flight coalescing of identical concurrent engine requests."""
+
+import asyncio
+import copy
+
+
+class SharedCancelEvent:
+    """Cancel event for a shared computation: set only once every waiter has cancelled.
+
+    Duck-types the ``is_set`` check that ``chess_engine.search_cancellation``
+    uses, so one disconnected client does not cancel work others still await.
+    Once seen set it stays set (``fired``): the search has stopped by then, and
+    a waiter added later cannot revive it.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.fired = False
+
+    def add(self, event):
+        self.events.append(event)
+
+    def is_set(self):
+        if not self.fired:
+            self.fired = bool(self.events) and all(event is not None and event.is_set() for event in self.events)
+        return self.fired
+
+
+class SingleFlight:
+    """Registry of in-flight computations keyed by ``(kind, *parameters)``.
+
+    The first caller for a key starts ``compute(cancel_event)``; concurrent
+    callers with the same key await that task instead of starting their own.
+    Every caller gets its own deep copy of the result, so one request cannot
+    mutate what another returns. A flight cancelled because every earlier
+    waiter left is not joined, and a caller still waiting when such a flight
+    ends computes again instead of getting its partial result. Like ``AsyncGeminiClient``, the registry is
+    used from the event loop only and needs no lock.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self._inflight = {}
+
+    def _count(self, kind, field):
+        counts = self.stats.setdefault(kind, {"computed": 0, "coalesced": 0})
+        counts[field] += 1
+
+    async def run(self, key, compute, cancel_event=None):
+        while True:
+            flight = self._inflight.get(key)
+            if flight is None or flight[1].fired:
+                shared_cancel = SharedCancelEvent()
+                task = asyncio.ensure_future(compute(shared_cancel))
+                flight = self._inflight[key] = (task, shared_cancel)
+                task.add_done_callback(lambda _task, flight=flight: self._drop(key, flight))
+                self._count(key[0], "computed")
+            else:
+                self._count(key[0], "coalesced")
+            task, shared_cancel = flight
+            shared_cancel.add(cancel_event)
+            # A caller that goes away must not cancel the shared computation.
+            try:
+                result = await asyncio.shield(task)
+            except Exception:
+                if not self._cut_short_for(shared_cancel, cancel_event):
+                    raise
+                continue
+            if not self._cut_short_for(shared_cancel, cancel_event):
+                return copy.deepcopy(result)
+
+    @staticmethod
+    def _cut_short_for(shared_cancel, cancel_event):
+        """Whether the flight was cancelled although this caller still waits for it."""
+        return shared_cancel.fired and not (cancel_event is not None and cancel_event.is_set())
+
+    def _drop(self, key, flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def in_flight(self):
+        return len(self._inflight)
+
+    def snapshot(self):
+        return {
+            "in_flight": len(self._inflight),
+            "by_kind": {kind: dict(counts) for kind, counts in self.stats.items()},
+        }
@@ -0,0 +1,183 @@
+"""Speculative background analysis and the cache it fills."""
+
+import copy
+import threading
+from collections import OrderedDict
+
+
+class AnalysisCache:
+    """Thread-safe LRU of finished engine results, keyed like ``SingleFlight``.
+
+    Speculative entries are low priority: they are evicted before any entry a
+    real request computed, and the first hit promotes one to a normal entry.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max(1, int(max_entries))
+        self.stats = {"hits": 0, "speculative_hits": 0, "misses": 0, "evictions": 0}
+        self._entries = OrderedDict()
+        self._speculative = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries) + len(self._speculative)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries or key in self._speculative
+
+    def get(self, key):
+        with self._lock:
+            if key in self._speculative:
+                value = self._entries[key] = self._speculative.pop(key)
+                self.stats["speculative_hits"] += 1
+            elif key in self._entries:
+                value = self._entries[key]
+                self._entries.move_to_end(key)
+            else:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return copy.deepcopy(value)
+
+    def peek(self, key):
+        """Return a copy of an entry without counting a hit or promoting it."""
+        with self._lock:
+            value = self._entries.get(key, self._speculative.get(key))
+        return copy.deepcopy(value) if value is not None else None
+
+    def put(self, key, value, speculative=False):
+        with self._lock:
+            if speculative:
+                if key in self._entries:
+                    return
+                self._speculative[key] = value
+                self._speculative.move_to_end(key)
+            else:
+                self._speculative.pop(key, None)
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) + len(self._speculative) > self.max_entries:
+                oldest = self._speculative if self._speculative else self._entries
+                oldest.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._speculative.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "speculative_entries": len(self._speculative),
+                **self.stats,
+            }
+
+
+class Preemption:
+    """Cancel event for speculative work: set when stopping or when real work arrives.
+
+    Duck-types ``threading.Event.is_set`` for ``chess_engine.search_cancellation``,
+    so a running speculative search stops within 64 nodes of a real request.
+    Once set it stays set until ``reset``, so a job can still tell it was cut
+    short after the real request has finished.
+    """
+
+    def __init__(self, stop_event, is_busy):
+        self._stop_event = stop_event
+        self._is_busy = is_busy
+        self._fired = False
+
+    def reset(self):
+        self._fired = False
+
+    def is_set(self):
+        if not self._fired and (self._stop_event.is_set() or self._is_busy()):
+            self._fired = True
+        return self._fired
+
+
+class SpeculativeAnalyzer:
+    """Background worker that analyzes predicted positions while the engine is idle.
+
+    ``analyze(fen, cancel_event)`` does the work and fills the cache; it
+    returns False when it was preempted, and the position is then retried
+    once the engine is idle again. ``submit`` replaces the pending positions,
+    because a new move makes the older predictions stale.
+    """
+
+    def __init__(self, analyze, is_busy, max_pending=4, idle_poll_seconds=0.05):
+        self.analyze = analyze
+        self.is_busy = is_busy
+        self.max_pending = max(1, int(max_pending))
+        self.idle_poll_seconds = idle_poll_seconds
+        self.stats = {"submitted": 0, "completed": 0, "preempted": 0, "failed": 0}
+        self._pending = []
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._preemption = Preemption(self._stop_event, is_busy)
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="speculative-analysis", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, fens):
+        fens = list(dict.fromkeys(fens))[: self.max_pending]
+        with self._condition:
+            self._pending = fens
+            self.stats["submitted"] += len(fens)
+            self._condition.notify_all()
+
+    def pending(self):
+        with self._condition:
+            return list(self._pending)
+
+    def _next_position(self):
+        with self._condition:
+            while not self._pending and not self._stop_event.is_set():
+                self._condition.wait()
+            return self._pending[0] if self._pending else None
+
+    def _finish(self, fen):
+        with self._condition:
+            if self._pending and self._pending[0] == fen:
+                self._pending.pop(0)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            fen = self._next_position()
+            if fen is None:
+                continue
+            # Only idle CPU is used: wait while real requests are running, then
+            # take whatever is newest, since a move may have replaced the queue.
+            if self.is_busy():
+                self._stop_event.wait(self.idle_poll_seconds)
+                continue
+            self._preemption.reset()
+            try:
+                completed = self.analyze(fen, self._preemption)
+            except Exception as e:
+                print(f"Speculative analysis failed: {e}")
+                self.stats["failed"] += 1
+                self._finish(fen)
+                continue
+            if completed:
+                self.stats["completed"] += 1
+                self._finish(fen)
+            else:
+                self.stats["preempted"] += 1
+
+    def snapshot(self):
+        return {"running": bool(self._thread and self._thread.is_alive()), "pending": len(self.pending()), **self.stats}
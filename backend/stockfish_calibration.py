@@ -18,9 +18,12 @@ import chess_engine
 class CalibrationConfig:
     name: str
     depth: int
-    time_limit: float
+    time_limit: float | None
     use_book: bool
     adaptive_depth: bool
+    node_limit: int | None = None
+    # Difficulty overlay to apply; defaults to ``name``.
+    difficulty: str | None = None
 
 
 @dataclass(frozen=True)
@@ -30,12 +33,24 @@ class CalibrationPosition:
     fen: str
 
 
+# Mirrors api.BOT_DIFFICULTY_PROFILES.
 CONFIGS = (
-    CalibrationConfig("newbie", 1, 0.35, False, False),
-    CalibrationConfig("beginner", 2, 0.7, False, False),
-    CalibrationConfig("intermediate", 4, 1.25, True, False),
-    CalibrationConfig("advanced", 5, 1.5, True, True),
+    CalibrationConfig("newbie", 1, 1.0, False, False, 2_000),
+    CalibrationConfig("beginner", 2, 1.5, False, False, 6_000),
+    CalibrationConfig("intermediate", 4, 2.0, True, False, 12_000),
+    CalibrationConfig("advanced", 5, 2.0, True, True, 20_000),
 )
+# Node-budget ladders search without a wall clock up to this depth, so the
+# budget alone decides where iterative deepening stops.
+NODE_BUDGET_DEPTH = 8
+
+
+def node_budget_configs(budgets, depth=NODE_BUDGET_DEPTH):
+    """Full-strength configs that differ only in node budget, for mapping budgets to ACPL."""
+    return tuple(
+        CalibrationConfig(f"nodes_{budget}", depth, None, False, False, budget, difficulty="advanced")
+        for budget in budgets
+    )
 
 
 def fen_after(pgn):
@@ -196,7 +211,8 @@ def run_config(stockfish, config, positions, nodes):
             use_book=config.use_book,
             adaptive_depth=config.adaptive_depth,
             style="balanced",
-            difficulty=config.name,
+            difficulty=config.difficulty or config.name,
+            node_limit=config.node_limit,
         )
         move = analysis["best_move"]
         judge = analyze_with_stockfish(stockfish, board, move, nodes)
@@ -214,6 +230,7 @@ def run_config(stockfish, config, positions, nodes):
             "major_piece_hang": chess_engine.major_piece_loss_after_move(board, move),
             "missed_mate": judge["best_is_mate"] and not judge["played_is_mate"],
             "depth": analysis["depth"],
+            "nodes": analysis["nodes"],
             "difficulty_loss": analysis.get("difficulty_loss", 0),
         })
 
@@ -221,6 +238,7 @@ def run_config(stockfish, config, positions, nodes):
     expectation_losses = [item["expectation_loss"] for item in results]
     return {
         "config": config.name,
+        "node_limit": config.node_limit,
         "positions": len(results),
         "acpl": round(statistics.mean(losses), 1),
         "median_loss": round(statistics.median(losses), 1),
@@ -229,18 +247,20 @@ def run_config(stockfish, config, positions, nodes):
         "blunder_rate": round(sum(item["blunder"] for item in results) / len(results), 3),
         "major_piece_hangs": sum(item["major_piece_hang"] for item in results),
         "missed_mates": sum(item["missed_mate"] for item in results),
+        "avg_depth": round(statistics.mean(item["depth"] for item in results), 2),
+        "avg_nodes": round(statistics.mean(item["nodes"] for item in results)),
         "results": results,
     }
 
 
-def run(stockfish_path, nodes=12_000):
+def run(stockfish_path, nodes=12_000, configs=CONFIGS):
     engine = chess.engine.SimpleEngine.popen_uci(stockfish_path)
     try:
         engine.configure({"Threads": 1, "Hash": 64})
         return {
             "stockfish": engine.id.get("name", "Stockfish"),
             "nodes_per_analysis": nodes,
-            "reports": [run_config(engine, config, POSITIONS, nodes) for config in CONFIGS],
+            "reports": [run_config(engine, config, POSITIONS, nodes) for config in configs],
         }
     finally:
         engine.quit()
@@ -252,9 +272,16 @@ def main():
     parser.add_argument("--nodes", type=int, default=12_000, help="Nodes per Stockfish judgment.")
     parser.add_argument("--json", action="store_true", help="Print full JSON results.")
     parser.add_argument("--output", help="Write the full JSON report to this path.")
+    parser.add_argument(
+        "--node-budgets",
+        help="Comma-separated engine node budgets to map to ACPL instead of the level configs.",
+    )
     args = parser.parse_args()
 
-    report = run(find_stockfish(args.stockfish), nodes=args.nodes)
+    configs = CONFIGS
+    if args.node_budgets:
+        configs = node_budget_configs(int(budget) for budget in args.node_budgets.split(","))
+    report = run(find_stockfish(args.stockfish), nodes=args.nodes, configs=configs)
     if args.output:
         output_path = Path(args.output)
         output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -269,7 +296,8 @@ def main():
     print(f"Judge: {report['stockfish']} ({report['nodes_per_analysis']} nodes/analysis)")
     for item in report["reports"]:
         print(
-            f"{item['config']:12} ACPL={item['acpl']:6.1f} "
+            f"{item['config']:12} nodes<={item['node_limit'] or '-'} depth={item['avg_depth']:.2f} "
+            f"ACPL={item['acpl']:6.1f} "
             f"WPL={item['avg_expectation_loss']:.1%} "
             f"near-best={item['best_move_rate']:.0%} blunders={item['blunder_rate']:.0%} "
             f"hangs={item['major_piece_hangs']} missed_mates={item['missed_mates']}"
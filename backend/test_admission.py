@@ -0,0 +1,69 @@
+import threading
+import unittest
+
+from admission import DEGRADATION_LEVELS, AdmissionController
+
+
+class AdmissionControllerTests(unittest.TestCase):
+    def test_backlog_beyond_capacity_steps_down_one_level_at_a_time(self):
+        controller = AdmissionController(capacity=2)
+        with controller.admit() as first, controller.admit() as second:
+            with controller.admit() as third, controller.admit() as fourth:
+                with controller.admit() as fifth:
+                    self.assertEqual(controller.snapshot()["queued"], 3)
+                    levels = [level.name for level in (first, second, third, fourth, fifth)]
+
+        self.assertEqual(levels, ["normal", "normal", "reduced", "reduced", "minimal"])
+        snapshot = controller.snapshot()
+        self.assertEqual(snapshot["in_flight"], 0)
+        self.assertEqual(snapshot["level"], "normal")
+        self.assertEqual(snapshot["peak_in_flight"], 5)
+        self.assertEqual(snapshot["by_level"], {"normal": 2, "reduced": 2, "minimal": 1})
+
+    def test_slot_is_released_when_the_request_fails(self):
+        controller = AdmissionController(capacity=1)
+        with self.assertRaises(RuntimeError):
+            with controller.admit():
+                raise RuntimeError("engine failed")
+
+        with controller.admit() as level:
+            self.assertEqual(level.name, "normal")
+
+    def test_levels_shrink_budgets_and_keep_unbounded_limits(self):
+        normal, reduced, minimal = DEGRADATION_LEVELS
+
+        self.assertEqual(normal.scale(12_000), 12_000)
+        self.assertEqual(reduced.scale(12_000), 6_000)
+        self.assertEqual(minimal.scale(1_000, minimum=500), 500)
+        self.assertAlmostEqual(reduced.scale(2.0), 1.0)
+        self.assertIsNone(minimal.scale(None))
+        self.assertEqual(minimal.scale(0), 0)
+        self.assertEqual(minimal.reduce_depth(2), 1)
+        self.assertTrue(reduced.use_rag)
+        self.assertFalse(minimal.use_rag)
+        self.assertLess(minimal.candidate_count, normal.candidate_count)
+
+    def test_concurrent_requests_are_counted_exactly(self):
+        controller = AdmissionController(capacity=4)
+        start = threading.Barrier(8)
+
+        def request():
+            start.wait()
+            for _ in range(200):
+                with controller.admit():
+                    pass
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        snapshot = controller.snapshot()
+        self.assertEqual(snapshot["in_flight"], 0)
+        self.assertEqual(snapshot["admitted"], 1600)
+        self.assertEqual(sum(snapshot["by_level"].values()), 1600)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+import chess
+
+from advice_cache import AdviceCache
+from rag import ChessRAG, classify_question
+
+
+class AdviceCacheTests(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = AdviceCache(max_entries=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        self.assertEqual(cache.get("a"), "A")
+
+        cache.put("c", "C")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "A")
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_saved_cache_round_trips_and_ignores_unknown_format(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "advice.json")
+            cache = AdviceCache(path=path)
+            cache.put("key", "推薦手：Nf3")
+            self.assertTrue(cache.save())
+
+            restored = AdviceCache(path=path)
+            self.assertEqual(restored.load(), 1)
+            self.assertEqual(restored.get("key"), "推薦手：Nf3")
+
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write('{"format": 999, "entries": [["key", "stale"]]}')
+            self.assertEqual(AdviceCache(path=path).load(), 0)
+
+
+class CachedAdviceTests(unittest.TestCase):
+    def setUp(self):
+        self.rag = ChessRAG()
+        self.rag.client = object()
+        self.retrievals = []
+        self.rag.retrieve_rule = lambda query: self.retrievals.append(query) or "開局原則"
+        self.rag.retrieve_similar_game = lambda _fen: "無相似歷史對局。"
+        self.analysis = {
+            "best_move": chess.Move.from_uci("g1f3"),
+            "from_book": False,
+            "book_line": [],
+        }
+        self.teaching = {
+            "analysis_complete": True,
+            "best_move_reason": "develops_piece",
+            "best_move_evidence": "heuristic",
+            "position_themes": ["development"],
+            "candidates": [{"rank": 1, "san": "Nf3", "move": "g1f3", "base_engine_choice": True}],
+        }
+
+    def _advice(self, question="怎麼下？", teaching=None):
+        return self.rag.get_advice(
+            chess.STARTING_FEN,
+            "",
+            question,
+            pv_line=["g1f3", "g8f6"],
+            analysis_result=self.analysis,
+            teaching_analysis=teaching or self.teaching,
+        )
+
+    def test_repeat_request_skips_prompt_pipeline(self):
+        first = self._advice()
+        second = self._advice()
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.retrievals), 1)
+        self.assertEqual(self.rag.advice_cache.stats["hits"], 1)
+
+    def test_question_class_and_teaching_digest_partition_the_cache(self):
+        self._advice("怎麼下？")
+        self._advice("下一步呢？")
+        self.assertEqual(len(self.retrievals), 1)
+
+        self._advice("有沒有捉雙？")
+        changed = dict(self.teaching, best_move_reason="controls_center")
+        self._advice(teaching=changed)
+
+        self.assertEqual(len(self.retrievals), 3)
+
+    def test_questions_are_classified_by_rule_family(self):
+        self.assertEqual(classify_question("怎麼下？"), "general")
+        self.assertEqual(classify_question("殘局的王要怎麼走"), "endgame")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,19 @@
+import asyncio
+import io
+import json
+import threading
+import time
 import unittest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import chess
 import chess.engine
+import chess.pgn
 from fastapi.testclient import TestClient
 
+import api
+from admission import AdmissionController
+import chess_engine
 from api import _stockfish_wdl, app
 
 
@@ -15,6 +24,9 @@ class ApiEndpointTests(unittest.TestCase):
         cls.make_move_fen = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
         cls.analysis_fen = "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2"
 
+    def setUp(self):
+        api.analysis_cache.clear()
+
     def test_make_move_returns_playable_move(self):
         response = self.client.post(
             "/make_move",
@@ -56,6 +68,214 @@ class ApiEndpointTests(unittest.TestCase):
         self.assertGreaterEqual(len(data["teaching_analysis"]["candidates"]), 1)
         self.assertIn("criticality", data["teaching_analysis"])
 
+    def test_get_analysis_stays_within_the_requested_time_limit(self):
+        middlegame = "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15"
+        with patch("api.get_rag_engine", return_value=None):
+            started = time.perf_counter()
+            response = self.client.post(
+                "/get_analysis",
+                json={"fen": middlegame, "depth": 12, "time_limit": 0.5},
+            )
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, 200)
+        budget = response.json()["time_budget"]
+        self.assertEqual(budget["total"], 0.5)
+        self.assertEqual(set(budget["stages"]), {"search", "teaching", "coach_startup"})
+        self.assertLessEqual(budget["stages"]["search"]["allocated"], 0.35)
+        self.assertLess(elapsed, 0.8)
+
+    def test_streamed_analysis_reports_iterations_before_the_final_result(self):
+        middlegame = "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15"
+        with patch("api.get_rag_engine", return_value=None):
+            response = self.client.post(
+                "/get_analysis/stream",
+                json={"fen": middlegame, "depth": 3, "time_limit": 5.0},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            name_line, data_line = block.split("\n")
+            events.append((name_line.removeprefix("event: "), json.loads(data_line.removeprefix("data: "))))
+
+        names = [name for name, _data in events]
+        self.assertEqual(names, ["iteration"] * (len(events) - 1) + ["analysis"])
+        iterations = [data for name, data in events if name == "iteration"]
+        self.assertEqual([report["depth"] for report in iterations], list(range(1, len(iterations) + 1)))
+        evaluation = events[-1][1]["evaluation"]
+        self.assertEqual(evaluation["depth_reached"], iterations[-1]["depth"])
+        self.assertEqual(evaluation["pv_line"], iterations[-1]["pv"])
+        self.assertIn("teaching_analysis", events[-1][1])
+
+    def test_streamed_analysis_of_a_finished_game_sends_only_the_result(self):
+        response = self.client.post("/get_analysis/stream", json={"fen": "7k/5QQ1/8/8/8/8/8/K7 b - - 0 1"})
+
+        self.assertEqual(response.text.split("\n")[0], "event: analysis")
+        self.assertIn('"game_over": true', response.text)
+
+    def test_identical_concurrent_analyses_share_one_search(self):
+        class ConnectedRequest:
+            async def is_disconnected(self):
+                return False
+
+        middlegame = "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15"
+        request = api.GetAnalysisRequest(fen=middlegame, depth=3, time_limit=0.4)
+
+        async def classroom():
+            return await asyncio.gather(
+                *(api.get_analysis_endpoint(request, ConnectedRequest()) for _ in range(3))
+            )
+
+        with (
+            patch("api.engine_flights", api.SingleFlight()) as flights,
+            patch("api.engine_admission", AdmissionController(capacity=3)),
+            patch("api.get_rag_engine", return_value=None),
+            patch("api.chess_engine.get_analysis", wraps=api.chess_engine.get_analysis) as get_analysis,
+        ):
+            responses = asyncio.run(classroom())
+
+        get_analysis.assert_called_once()
+        self.assertEqual(flights.stats["analysis"], {"computed": 1, "coalesced": 2})
+        self.assertEqual(flights.stats["teaching"], {"computed": 1, "coalesced": 2})
+        self.assertEqual(len({response["evaluation"]["score_cp"] for response in responses}), 1)
+        # Requests that joined the shared search report the budget it ran with.
+        search_budgets = [response["time_budget"]["stages"]["search"] for response in responses]
+        self.assertEqual(len({budget["allocated"] for budget in search_budgets}), 1)
+        self.assertTrue(all("teaching" in response["time_budget"]["stages"] for response in responses))
+
+    def test_speculative_analysis_answers_the_next_coaching_request(self):
+        middlegame = "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15"
+        with patch("api.DEFAULT_ANALYSIS_TIME_LIMIT", 0.3):
+            self.assertTrue(api._speculate_position(middlegame, threading.Event()))
+        self.assertEqual(api.analysis_cache.snapshot()["speculative_entries"], 2)
+
+        with (
+            patch("api.get_rag_engine", return_value=None),
+            patch("api.chess_engine.get_analysis") as get_analysis,
+            patch("api.chess_engine.get_teaching_analysis") as get_teaching_analysis,
+        ):
+            response = self.client.post(
+                "/get_analysis",
+                json={"fen": middlegame, "depth": api.DEFAULT_ANALYSIS_DEPTH, "time_limit": 0.3},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        get_analysis.assert_not_called()
+        get_teaching_analysis.assert_not_called()
+        self.assertEqual(api.analysis_cache.stats["speculative_hits"], 2)
+        # Cached engine work runs no engine stage; only the coach is looked up.
+        self.assertEqual(set(response.json()["time_budget"]["stages"]), {"coach_startup"})
+
+    def test_preempted_speculation_caches_nothing(self):
+        cancelled = threading.Event()
+        cancelled.set()
+
+        self.assertFalse(api._speculate_position(self.analysis_fen, cancelled))
+        self.assertEqual(len(api.analysis_cache), 0)
+
+    def test_make_move_queues_the_resulting_position_and_likely_replies(self):
+        speculator = Mock()
+        with patch("api.speculator", speculator):
+            response = self.client.post(
+                "/make_move",
+                json={"fen": self.make_move_fen, "difficulty": "newbie"},
+            )
+
+        fens = speculator.submit.call_args.args[0]
+        self.assertEqual(fens[0], response.json()["fen"])
+        self.assertEqual(len(fens), 1 + api.SPECULATIVE_REPLIES)
+        board = chess.Board(fens[0])
+        replies = set()
+        for move in board.legal_moves:
+            board.push(move)
+            replies.add(board.fen())
+            board.pop()
+        self.assertLessEqual(set(fens[1:]), replies)
+
+    def test_get_analysis_degrades_under_load(self):
+        rag_engine = Mock()
+        controller = AdmissionController(capacity=1)
+        with (
+            patch("api.engine_admission", controller),
+            patch("api.get_rag_engine", return_value=rag_engine),
+            patch("api.chess_engine.get_analysis", wraps=api.chess_engine.get_analysis) as get_analysis,
+            patch("api.chess_engine.get_teaching_analysis", wraps=api.chess_engine.get_teaching_analysis) as teaching,
+            controller.admit(),
+            controller.admit(),
+        ):
+            response = self.client.post(
+                "/get_analysis",
+                json={"fen": self.analysis_fen, "depth": 3, "time_limit": 0.4},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["degradation"], "minimal")
+        self.assertEqual(data["degradation_level"], 2)
+        self.assertEqual(get_analysis.call_args.kwargs["depth"], 1)
+        self.assertAlmostEqual(get_analysis.call_args.kwargs["budget"].total, 0.1)
+        self.assertEqual(teaching.call_args.kwargs["candidate_count"], 2)
+        rag_engine.get_advice.assert_not_called()
+        self.assertEqual(controller.snapshot()["in_flight"], 0)
+
+    def test_make_move_keeps_node_budget_under_load(self):
+        controller = AdmissionController(capacity=1)
+        with (
+            patch("api.engine_admission", controller),
+            patch("api.chess_engine.get_analysis", wraps=api.chess_engine.get_analysis) as get_analysis,
+            controller.admit(),
+        ):
+            response = self.client.post(
+                "/make_move",
+                json={"fen": self.make_move_fen, "difficulty": "intermediate"},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["degradation"], "reduced")
+        self.assertEqual(
+            get_analysis.call_args.kwargs["node_limit"],
+            api.BOT_DIFFICULTY_PROFILES["intermediate"]["node_limit"],
+        )
+        self.assertAlmostEqual(get_analysis.call_args.kwargs["time_limit"], 1.0)
+        minimal = api._bot_search_kwargs("intermediate", "balanced", 2.0, api.DEGRADATION_LEVELS[-1])
+        self.assertEqual(minimal["node_limit"], api.BOT_DIFFICULTY_PROFILES["intermediate"]["node_limit"])
+
+    def test_make_move_searches_in_the_session_partition(self):
+        middlegame = "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15"
+        response = self.client.post("/make_move", json={"fen": middlegame, "difficulty": "newbie"})
+
+        self.assertEqual(response.status_code, 200)
+        session_id = response.json()["session_id"]
+        stats = chess_engine.transposition_table.partition_stats(f"game:{session_id}")
+        self.assertGreater(stats["entries"], 0)
+        self.assertGreater(stats["probes"], 0)
+        with patch.dict(api.readiness, {"ready": True}):
+            by_kind = self.client.get("/ready").json()["transposition_table"]["by_kind"]
+        self.assertIn("game", by_kind)
+
+    def test_client_chosen_session_ids_share_one_partition(self):
+        middlegame = "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15"
+        response = self.client.post(
+            "/make_move",
+            json={"fen": middlegame, "difficulty": "newbie", "session_id": "client-chosen"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()["session_id"], "client-chosen")
+        self.assertIsNone(chess_engine.transposition_table.partition_stats("game:client-chosen"))
+        self.assertEqual(api._game_partition("client-chosen"), "game")
+
+    def test_oldest_issued_session_is_dropped_with_its_partition(self):
+        middlegame = "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15"
+        with patch.object(api, "HTTP_SESSION_MAX", 1):
+            first = self.client.post("/make_move", json={"fen": middlegame, "difficulty": "newbie"}).json()
+            self.client.post("/make_move", json={"fen": middlegame, "difficulty": "newbie"})
+
+        self.assertNotIn(first["session_id"], api.http_sessions)
+        self.assertIsNone(chess_engine.transposition_table.partition_stats(f"game:{first['session_id']}"))
+
     def test_make_move_does_not_return_teaching_analysis(self):
         response = self.client.post(
             "/make_move",
@@ -141,6 +361,74 @@ class ApiEndpointTests(unittest.TestCase):
             teaching_analysis,
         )
 
+    def test_explain_does_not_wait_past_its_budget_for_a_starting_coach(self):
+        def slow_start():
+            time.sleep(1.0)
+            return Mock()
+
+        analysis = {"best_move": None, "pv": [], "score": 0, "eval_display": "0.00", "winning_chance": 50.0}
+        with (
+            patch("api.get_rag_engine", side_effect=slow_start),
+            patch("api.chess_engine.get_analysis", return_value=analysis),
+            patch("api.chess_engine.get_teaching_analysis", return_value={}),
+        ):
+            started = time.perf_counter()
+            response = self.client.post("/explain", json={"fen": self.analysis_fen, "time_limit": 0.3})
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.json()["advice"], api.COACH_STARTING_MESSAGE)
+        self.assertLess(elapsed, 0.6)
+
+    def test_explain_awaits_the_model_reply_within_the_request_budget(self):
+        rag_engine = Mock()
+        rag_engine.get_advice.return_value = "推薦手：Nf3"
+        rag_engine.aanswer_question = AsyncMock(return_value="先發展騎士，才能控制中心。")
+
+        with patch("api.get_rag_engine", return_value=rag_engine), patch("api.COACH_MODEL_REPLY", True):
+            response = self.client.post(
+                "/explain",
+                json={"fen": self.analysis_fen, "question": "為什麼要發展騎士？", "depth": 2, "time_limit": 1.0},
+            )
+
+        self.assertEqual(response.json()["coach_reply"], "先發展騎士，才能控制中心。")
+        advice, question = rag_engine.aanswer_question.await_args.args
+        self.assertEqual((advice, question), ("推薦手：Nf3", "為什麼要發展騎士？"))
+        self.assertLessEqual(rag_engine.aanswer_question.await_args.kwargs["budget"], 1.0)
+
+    def test_disconnect_watcher_sets_the_cancel_event(self):
+        class DisconnectingRequest:
+            polls = 0
+
+            async def is_disconnected(self):
+                self.polls += 1
+                return self.polls >= 3
+
+        async def wait_for_cancel():
+            async with api.cancel_on_disconnect(DisconnectingRequest()) as cancel_event:
+                for _ in range(50):
+                    if cancel_event.is_set():
+                        return True
+                    await asyncio.sleep(0.05)
+                return False
+
+        with patch("api.CLIENT_DISCONNECT_POLL_SECONDS", 0.01):
+            self.assertTrue(asyncio.run(wait_for_cancel()))
+
+    @patch("api._find_stockfish_path", return_value=None)
+    def test_cancelled_full_review_stops_between_moves(self, _find_stockfish_path):
+        game = chess.pgn.read_game(io.StringIO("1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 *"))
+        cancel_event = threading.Event()
+        cancel_event.set()
+
+        with (
+            patch("api._analyze_full_with_custom_engine", wraps=api._analyze_full_with_custom_engine) as review,
+            self.assertRaises(chess_engine.SearchCancelled),
+        ):
+            api._cancellable(cancel_event, api._analyze_full, game, "white", 2)
+
+        review.assert_called_once()
+        self.assertIsNone(chess_engine.search_runtime.cancel_event)
+
     @patch("api._find_stockfish_path", return_value=None)
     def test_analyze_full_after_make_move(self, _find_stockfish_path):
         move_response = self.client.post(
@@ -177,6 +465,95 @@ class ApiEndpointTests(unittest.TestCase):
             },
         )
 
+    def test_game_session_socket_searches_with_the_game_history(self):
+        replies = iter(["e7e5", "b8c6"])
+        searched_boards = []
+
+        def get_analysis(board, **_kwargs):
+            searched_boards.append(board)
+            return {"best_move": chess.Move.from_uci(next(replies)), "depth": 1, "pv": [], "nodes": 100, "tt_hits": 25}
+
+        with patch("api.chess_engine.get_analysis", side_effect=get_analysis):
+            with self.client.websocket_connect("/ws/game") as websocket:
+                websocket.send_json({"type": "new", "difficulty": "newbie", "clock_seconds": 300})
+                session = websocket.receive_json()
+                self.assertEqual(session["type"], "session")
+                self.assertIn(session["session_id"], api.game_sessions)
+
+                websocket.send_json({"type": "move", "uci": "e2e4"})
+                bot_move = websocket.receive_json()
+                websocket.send_json({"type": "move", "uci": "g1f3"})
+                second_bot_move = websocket.receive_json()
+                websocket.send_json({"type": "sync"})
+                sync = websocket.receive_json()
+
+        self.assertEqual((bot_move["type"], bot_move["uci"], bot_move["san"], bot_move["ply"]), ("bot_move", "e7e5", "e5", 2))
+        self.assertEqual(second_bot_move["uci"], "b8c6")
+        self.assertEqual([move.uci() for move in searched_boards[1].move_stack], ["e2e4", "e7e5", "g1f3"])
+        self.assertEqual(sync["moves"], ["e2e4", "e7e5", "g1f3", "b8c6"])
+        self.assertEqual(sync["stats"]["tt_hit_rate"], 0.25)
+        self.assertLess(sync["clock"]["black"], 300)
+        self.assertNotIn(session["session_id"], api.game_sessions)
+        self.assertIsNone(chess_engine.transposition_table.partition_stats(f"game:{session['session_id']}"))
+
+    def test_pushed_analysis_does_not_hold_up_or_time_the_players_move(self):
+        replies = iter(["e7e5", "b8c6"])
+        analysis_cancelled = threading.Event()
+        analysis_keys = []
+
+        def get_analysis(board, **kwargs):
+            if "budget" not in kwargs:
+                return {"best_move": chess.Move.from_uci(next(replies)), "depth": 1, "pv": [], "nodes": 1, "tt_hits": 0}
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and not chess_engine.search_runtime.cancel_event.is_set():
+                time.sleep(0.01)
+            analysis_cancelled.set()
+            return {"best_move": None, "score": 0, "eval_display": "0.00", "winning_chance": 50, "pv": [], "depth": 1}
+
+        original_coalesced = api._coalesced
+
+        async def coalesced(key, *args, **kwargs):
+            analysis_keys.append(key)
+            return await original_coalesced(key, *args, **kwargs)
+
+        with (
+            patch("api.chess_engine.get_analysis", side_effect=get_analysis),
+            patch("api._coalesced", side_effect=coalesced),
+        ):
+            with self.client.websocket_connect("/ws/game") as websocket:
+                websocket.send_json({"type": "new", "difficulty": "newbie", "clock_seconds": 300, "analysis": True})
+                websocket.receive_json()
+                websocket.send_json({"type": "move", "uci": "e2e4"})
+                self.assertEqual(websocket.receive_json()["uci"], "e7e5")
+                started = time.monotonic()
+                websocket.send_json({"type": "move", "uci": "g1f3"})
+                second_bot_move = websocket.receive_json()
+                elapsed = time.monotonic() - started
+                self.assertTrue(analysis_cancelled.wait(2))
+
+        self.assertEqual(second_bot_move["type"], "bot_move")
+        self.assertLess(elapsed, 2)
+        self.assertGreater(second_bot_move["clock"]["white"], 298)
+        # The session board carries history, so its analysis is cached apart from /get_analysis.
+        self.assertEqual(analysis_keys[0][-1], (chess.STARTING_FEN, ("e2e4", "e7e5")))
+
+    def test_game_session_socket_reports_bad_messages_and_stays_open(self):
+        with self.client.websocket_connect("/ws/game") as websocket:
+            websocket.send_json({"type": "move", "uci": "e2e4"})
+            self.assertEqual(websocket.receive_json()["type"], "error")
+            websocket.send_text("not json")
+            self.assertEqual(websocket.receive_json()["detail"], "Invalid JSON")
+
+            websocket.send_json({"type": "new", "player_color": "black", "difficulty": "newbie"})
+            self.assertEqual(websocket.receive_json()["type"], "session")
+            bot_move = websocket.receive_json()
+            self.assertEqual((bot_move["type"], bot_move["ply"]), ("bot_move", 1))
+
+            websocket.send_json({"type": "move", "uci": "a1a8"})
+            self.assertEqual(websocket.receive_json()["detail"], "Illegal move: a1a8")
+            websocket.send_json({"type": "sync"})
+            self.assertEqual(websocket.receive_json()["ply"], 1)
+
     def test_invalid_fen_returns_400(self):
         response = self.client.post("/get_analysis", json={"fen": "invalid fen"})
 
@@ -0,0 +1,52 @@
+import copy
+import unittest
+
+import chess
+
+import bench
+
+
+class BenchTests(unittest.TestCase):
+    def test_positions_are_distinct_playable_positions(self):
+        self.assertEqual(len(bench.BENCH_POSITIONS), 40)
+        self.assertEqual(len(set(bench.BENCH_POSITIONS)), 40)
+        for fen in bench.BENCH_POSITIONS:
+            with self.subTest(fen=fen):
+                board = chess.Board(fen)
+                self.assertTrue(board.is_valid())
+                self.assertFalse(board.is_game_over())
+
+    def test_stored_baseline_covers_the_bench(self):
+        baseline = bench.load_baseline()
+
+        self.assertEqual(baseline["depth"], bench.DEFAULT_DEPTH)
+        self.assertEqual([item["fen"] for item in baseline["results"]], list(bench.BENCH_POSITIONS))
+        self.assertEqual(baseline["signature"], sum(item["nodes"] for item in baseline["results"]))
+
+    def test_cheapest_positions_reproduce_the_baseline(self):
+        # A search change that alters the tree must come with a new baseline.
+        baseline = bench.load_baseline()
+        cheapest = sorted(baseline["results"], key=lambda item: item["nodes"])[:3]
+
+        report = bench.run(baseline["depth"], [item["fen"] for item in cheapest])
+        partial_baseline = {**baseline, "signature": sum(item["nodes"] for item in cheapest), "results": cheapest}
+        comparison = bench.compare(report, partial_baseline)
+
+        self.assertTrue(comparison["signature_match"], comparison)
+        self.assertEqual(comparison["drifted"], [])
+
+    def test_compare_reports_drift_per_position(self):
+        report = bench.run(1, bench.BENCH_POSITIONS[:2])
+        drifted = copy.deepcopy(report)
+        drifted["results"][1]["nodes"] += 1
+        drifted["signature"] += 1
+
+        comparison = bench.compare(drifted, report)
+
+        self.assertFalse(comparison["signature_match"])
+        self.assertEqual([item["fen"] for item in comparison["drifted"]], [bench.BENCH_POSITIONS[1]])
+        self.assertEqual(comparison["drifted"][0]["baseline_nodes"], report["results"][1]["nodes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,12 @@
+import time
 import unittest
 from unittest.mock import patch
 
 import chess
 
-from api import MakeMoveRequest, make_move
+import api
+from api import BOT_DIFFICULTY_PROFILES, MakeMoveRequest, make_move
+from ponder import Ponderer
 
 
 class DifficultyApiTests(unittest.TestCase):
@@ -27,6 +30,10 @@ class DifficultyApiTests(unittest.TestCase):
             )
 
         self.assertEqual(get_analysis.call_args.kwargs["difficulty"], "newbie")
+        self.assertEqual(
+            get_analysis.call_args.kwargs["node_limit"], BOT_DIFFICULTY_PROFILES["newbie"]["node_limit"]
+        )
+        self.assertLessEqual(get_analysis.call_args.kwargs["time_limit"], BOT_DIFFICULTY_PROFILES["newbie"]["time_limit"])
         self.assertEqual(response["difficulty_loss"], 180)
         self.assertEqual(response["difficulty_label"], "新手")
 
@@ -52,6 +59,33 @@ class DifficultyApiTests(unittest.TestCase):
         self.assertEqual(response["difficulty"], "intermediate")
         self.assertEqual(response["difficulty_label"], "中階")
 
+    def test_expected_reply_is_answered_from_the_ponder(self):
+        ponderer = Ponderer(api._ponder_search, api._engine_busy, idle_poll_seconds=0.01)
+        ponderer.start()
+        self.addCleanup(ponderer.stop, 5)
+        middlegame = "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 w - - 2 15"
+
+        with patch("api.ponderer", ponderer):
+            first = make_move(MakeMoveRequest(fen=middlegame, difficulty="beginner"))
+            session_id = first["session_id"]
+            self.assertTrue(session_id)
+            self.assertFalse(first["ponder_hit"])
+            for _ in range(500):
+                if ponderer.stats["pondered"]:
+                    break
+                time.sleep(0.01)
+            expected_fen, _moves = ponderer._sessions[session_id].position
+
+            with patch("api.chess_engine.get_analysis") as get_analysis:
+                second = make_move(
+                    MakeMoveRequest(fen=expected_fen, difficulty="beginner", session_id=session_id)
+                )
+
+        get_analysis.assert_not_called()
+        self.assertTrue(second["ponder_hit"])
+        self.assertEqual(second["session_id"], session_id)
+        self.assertIn(chess.Move.from_uci(second["best_move"]), chess.Board(expected_fen).legal_moves)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -72,17 +72,18 @@ class PositionEvaluatorTests(unittest.TestCase):
         self.assertTrue(draw_result.terminal)
         self.assertEqual(draw_result.score, 0)
 
-    def test_repetition_policy_remains_visible_and_score_preserving(self):
+    def test_evaluation_ignores_game_history(self):
         board = chess.Board()
         board.remove_piece_at(chess.D8)
+        fresh = chess.Board(board.fen())
         for san in ("Nf3", "Nf6", "Ng1", "Ng8"):
             board.push_san(san)
 
         result = self.evaluator.evaluate(board)
 
         self.assertTrue(board.is_repetition(2))
-        self.assertEqual(result.score, -1000)
-        self.assertIn("repetition_policy", result.components)
+        self.assertEqual(result.score, self.evaluator.score(fresh))
+        self.assertNotIn("repetition_policy", result.components)
         self.assertEqual(sum(result.components.values()), result.score)
 
     def test_engine_compatibility_entrypoint_returns_breakdown(self):
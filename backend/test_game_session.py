@@ -0,0 +1,98 @@
+import unittest
+
+import chess
+
+from game_session import MIN_BOT_MOVE_SECONDS, GameClock, GameSession, SessionError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class GameClockTests(unittest.TestCase):
+    def test_thinking_time_is_charged_to_the_mover_plus_increment(self):
+        now = FakeClock()
+        clock = GameClock(60, 2, clock=now)
+        now.now = 5.0
+        clock.stop_turn(chess.WHITE)
+
+        self.assertEqual(clock.remaining[chess.WHITE], 57.0)
+        self.assertEqual(clock.remaining[chess.BLACK], 60.0)
+        self.assertFalse(clock.flagged(chess.WHITE))
+
+    def test_running_out_of_time_flags_without_increment(self):
+        now = FakeClock()
+        clock = GameClock(1, 5, clock=now)
+        now.now = 2.0
+        clock.stop_turn(chess.WHITE)
+
+        self.assertTrue(clock.flagged(chess.WHITE))
+
+    def test_move_time_spreads_the_clock_and_respects_the_cap(self):
+        self.assertEqual(GameClock().move_time(chess.BLACK, 2.0), 2.0)
+        self.assertEqual(GameClock(30).move_time(chess.BLACK, 2.0), 1.0)
+        self.assertEqual(GameClock(600).move_time(chess.BLACK, 2.0), 2.0)
+        self.assertEqual(GameClock(1).move_time(chess.BLACK, 2.0), MIN_BOT_MOVE_SECONDS)
+
+    def test_invalid_settings_are_rejected(self):
+        for base, increment in (("fast", 0), (-5, 0), (60, -1)):
+            with self.assertRaises(SessionError):
+                GameClock(base, increment)
+
+
+class GameSessionTests(unittest.TestCase):
+    def test_moves_keep_history_for_repetition(self):
+        session = GameSession("game", bot_color=chess.BLACK)
+        shuffle = ["g1f3", "g8f6", "f3g1", "f6g8"] * 2
+        for index, uci in enumerate(shuffle):
+            if index % 2 == 0:
+                session.play_player_move(uci)
+            else:
+                session.play_bot_move(chess.Move.from_uci(uci), {"nodes": 10, "tt_hits": 4})
+
+        self.assertEqual(len(session.board.move_stack), 8)
+        self.assertTrue(session.board.can_claim_threefold_repetition())
+        self.assertEqual(session.position_key(), (chess.STARTING_FEN, tuple(shuffle)))
+        self.assertEqual(session.status()["stats"]["tt_hit_rate"], 0.4)
+
+    def test_player_moves_are_validated(self):
+        session = GameSession("game", bot_color=chess.BLACK)
+        with self.assertRaisesRegex(SessionError, "Invalid move"):
+            session.play_player_move("e2")
+        with self.assertRaisesRegex(SessionError, "Illegal move"):
+            session.play_player_move("e2e5")
+        session.play_player_move("e2e4")
+        with self.assertRaisesRegex(SessionError, "Not your turn"):
+            session.play_player_move("e7e5")
+        self.assertTrue(session.bot_to_move)
+
+    def test_session_can_resume_from_a_root_and_moves(self):
+        session = GameSession("game", moves=["e2e4", "e7e5"], bot_color=chess.WHITE)
+
+        self.assertEqual(session.root_fen, chess.STARTING_FEN)
+        self.assertEqual(session.status()["ply"], 2)
+        self.assertTrue(session.bot_to_move)
+        with self.assertRaises(SessionError):
+            GameSession("game", moves=["e2e5"])
+        with self.assertRaises(SessionError):
+            GameSession("game", fen="not a fen")
+
+    def test_flagged_player_loses_on_time(self):
+        now = FakeClock()
+        session = GameSession("game", bot_color=chess.BLACK, clock=GameClock(1, clock=now))
+        now.now = 2.0
+        session.play_player_move("e2e4")
+
+        self.assertTrue(session.is_over)
+        self.assertEqual(session.result(), "0-1")
+        self.assertEqual(len(session.board.move_stack), 0)
+        with self.assertRaisesRegex(SessionError, "Game is over"):
+            session.play_player_move("e2e4")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from gemini_client import FALLBACK_MESSAGE, AsyncGeminiClient
+from rag import ChessRAG
+
+
+class StubGeminiHandler(BaseHTTPRequestHandler):
+    """Answer generateContent calls according to the model named in the path."""
+
+    behaviours = {}
+    calls = []
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        model = self.path.split("/models/", 1)[1].split(":", 1)[0]
+        type(self).calls.append(model)
+        delay, status, text = type(self).behaviours.get(model, (0, 200, model))
+        time.sleep(delay)
+        if status == 200:
+            body = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+        else:
+            body = {"error": {"code": status, "message": "quota", "status": "RESOURCE_EXHAUSTED"}}
+        payload = json.dumps(body).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *_args):
+        pass
+
+
+class AsyncGeminiClientTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGeminiHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubGeminiHandler.calls = []
+        StubGeminiHandler.behaviours = {}
+
+    def _client(self, models, **kwargs):
+        return AsyncGeminiClient("test-key", models, base_url=self.base_url, **kwargs)
+
+    def _run(self, client, coroutine):
+        async def scenario():
+            try:
+                return await coroutine
+            finally:
+                await client.aclose()
+
+        return asyncio.run(scenario())
+
+    def test_quota_error_falls_through_to_next_model_without_sleeping(self):
+        StubGeminiHandler.behaviours = {"primary": (0, 429, ""), "backup": (0, 200, "備援回答")}
+        client = self._client(["primary", "backup"])
+
+        started = time.perf_counter()
+        text = self._run(client, client.generate("局面？", "system"))
+
+        self.assertEqual(text, "備援回答")
+        self.assertEqual(StubGeminiHandler.calls, ["primary", "backup"])
+        self.assertLess(time.perf_counter() - started, 0.9)
+
+    def test_identical_inflight_prompts_share_one_upstream_call(self):
+        StubGeminiHandler.behaviours = {"primary": (0.2, 200, "共享回答")}
+        client = self._client(["primary"])
+
+        async def scenario():
+            return await asyncio.gather(*[client.generate("同一局面", "system") for _ in range(5)])
+
+        answers = self._run(client, scenario())
+
+        self.assertEqual(answers, ["共享回答"] * 5)
+        self.assertEqual(StubGeminiHandler.calls, ["primary"])
+        self.assertEqual(client.stats["coalesced"], 4)
+
+    def test_callers_with_different_budgets_do_not_share_a_request(self):
+        StubGeminiHandler.behaviours = {"primary": (0.5, 200, "完整回答")}
+        client = self._client(["primary"])
+
+        async def scenario():
+            return await asyncio.gather(
+                client.generate("同一局面", "system", budget=0.2),
+                client.generate("同一局面", "system", budget=3.0),
+            )
+
+        self.assertEqual(self._run(client, scenario()), [FALLBACK_MESSAGE, "完整回答"])
+        self.assertEqual(client.stats["coalesced"], 0)
+
+    def test_pool_of_a_finished_event_loop_is_closed(self):
+        client = self._client(["primary"])
+        pools = []
+
+        async def call():
+            text = await client.generate("局面？", "system")
+            pools.append(client._http)
+            return text
+
+        asyncio.run(call())
+        self._run(client, call())
+
+        self.assertEqual(len(pools), 2)
+        self.assertIsNot(pools[0], pools[1])
+        self.assertTrue(all(pool.is_closed for pool in pools))
+
+    def test_pool_of_a_stopped_event_loop_is_closed(self):
+        client = self._client(["primary"])
+        pools = []
+
+        async def call():
+            text = await client.generate("局面？", "system")
+            pools.append(client._http)
+            return text
+
+        stopped = asyncio.new_event_loop()
+        self.addCleanup(stopped.close)
+        stopped.run_until_complete(call())
+        self._run(client, call())
+
+        self.assertEqual(len(pools), 2)
+        self.assertTrue(all(pool.is_closed for pool in pools))
+
+    def test_finished_request_forgets_only_its_own_inflight_entry(self):
+        StubGeminiHandler.behaviours = {"primary": (0.3, 200, "回答")}
+        client = self._client(["primary"])
+
+        async def scenario():
+            first = asyncio.ensure_future(client.generate("同一局面", "system"))
+            await asyncio.sleep(0.05)
+            (key,) = client._inflight
+            # A newer request now owns the key, as after a rebind to another loop.
+            newer = asyncio.get_running_loop().create_future()
+            client._inflight[key] = newer
+            await first
+            newer.cancel()
+            return client._inflight.get(key) is newer
+
+        self.assertTrue(self._run(client, scenario()))
+
+    def test_slow_primary_is_hedged_by_backup_model(self):
+        StubGeminiHandler.behaviours = {"slow": (1.5, 200, "太慢"), "fast": (0, 200, "快速回答")}
+        client = self._client(["slow", "fast"], hedge_delay=0.1, total_budget=3.0)
+
+        started = time.perf_counter()
+        text = self._run(client, client.generate("局面？", "system"))
+
+        self.assertEqual(text, "快速回答")
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(client.stats["hedges"], 1)
+
+    def test_total_budget_bounds_latency_across_models(self):
+        StubGeminiHandler.behaviours = {"a": (2.0, 200, "a"), "b": (2.0, 200, "b")}
+        client = self._client(["a", "b"], hedge_delay=0.1)
+
+        started = time.perf_counter()
+        text = self._run(client, client.generate("局面？", "system", budget=0.4))
+
+        self.assertEqual(text, FALLBACK_MESSAGE)
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+    def test_rag_answers_questions_through_the_async_client(self):
+        StubGeminiHandler.behaviours = {"primary": (0, 200, "先發展騎士。")}
+        rag = ChessRAG()
+        rag.async_client = self._client(["primary"])
+
+        answer = self._run(rag.async_client, rag.aanswer_question("推薦手：Nf3", "為什麼？", budget=2.0))
+
+        self.assertEqual(answer, "先發展騎士。")
+        self.assertEqual(StubGeminiHandler.calls, ["primary"])
+
+    def test_rag_without_api_key_returns_fallback_without_network(self):
+        rag = ChessRAG()
+        rag.async_client = None
+
+        self.assertEqual(asyncio.run(rag.acall_gemini_with_fallback("局面？")), FALLBACK_MESSAGE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+
+from knowledge_index import KnowledgeIndex, tokenize
+from rag import _simple_retrieve_rule
+
+
+class TokenizerTests(unittest.TestCase):
+    def test_chinese_runs_become_bigrams_and_english_is_lowercased(self):
+        self.assertEqual(tokenize("西西里防禦 Sicilian c5"), ["西西", "西里", "里防", "防禦", "sicilian", "c5"])
+        self.assertEqual(tokenize("王, Nf3+ O-O"), ["王", "nf3+", "o-o"])
+
+
+class KnowledgeIndexTests(unittest.TestCase):
+    def test_rarer_and_repeated_terms_rank_higher(self):
+        index = KnowledgeIndex([
+            "開局 控制中心",
+            "捉雙 騎士 捉雙",
+            "騎士 開局",
+        ])
+
+        ranked = [doc_id for _score, doc_id in index.search("騎士捉雙", limit=3)]
+
+        self.assertEqual(ranked, [1, 2])
+
+    def test_documents_are_read_from_directory_after_seeds(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "tactics.md"), "w", encoding="utf-8") as handle:
+                handle.write("# 戰術\n\n風車 (Windmill): 反覆閃擊吃子。\n\n第二段\n")
+            with open(os.path.join(directory, "README.md"), "w", encoding="utf-8") as handle:
+                handle.write("風車 說明檔不應被索引")
+
+            index = KnowledgeIndex.from_directory(directory, seed_documents=["種子文件"])
+
+        self.assertEqual(index.documents, ("種子文件", "風車 (Windmill): 反覆閃擊吃子。", "第二段"))
+        self.assertEqual(index.search("windmill")[0][1], 1)
+
+    def test_top_k_over_ten_thousand_documents_is_fast(self):
+        rng = random.Random(7)
+        vocabulary = [f"term{number}" for number in range(2000)]
+        documents = [
+            "開局 中心 " + " ".join(rng.choice(vocabulary) for _ in range(30))
+            for _ in range(10000)
+        ]
+        index = KnowledgeIndex(documents)
+
+        started = time.perf_counter()
+        for _ in range(50):
+            results = index.search("開局 中心 term17 term42 term99", limit=3)
+        elapsed = (time.perf_counter() - started) / 50
+
+        self.assertEqual(len(results), 3)
+        self.assertLess(elapsed, 0.005)
+
+
+class RetrieveRuleTests(unittest.TestCase):
+    def test_english_query_retrieves_chinese_rule_through_family_expansion(self):
+        self.assertIn("西西里防禦", _simple_retrieve_rule("how to face the sicilian"))
+
+    def test_unmatched_query_falls_back_to_general_principles(self):
+        rules = _simple_retrieve_rule("xyz")
+
+        self.assertIn("開局原則", rules)
+        self.assertIn("攻王原則", rules)
+
+
+if __name__ == "__main__":
+    unittest.main()
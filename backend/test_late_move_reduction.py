@@ -19,7 +19,7 @@ class LateMoveReductionTests(unittest.TestCase):
             -math.inf,
             math.inf,
             board.turn == chess.WHITE,
-            repetition_counts=chess_engine.build_repetition_counts(board),
+            history=chess_engine.SearchHistory(board),
             use_lmr=use_lmr,
         )
         return result, dict(chess_engine.search_stats)
@@ -46,7 +46,7 @@ class LateMoveReductionTests(unittest.TestCase):
 
     def test_transposition_table_is_partitioned_by_lmr_mode(self):
         board = chess.Board(self.FEN)
-        repetition_counts = chess_engine.build_repetition_counts(board)
+        history = chess_engine.SearchHistory(board)
         chess_engine.reset_transposition_table()
         chess_engine.begin_search_generation()
         reduced = chess_engine.minimax(
@@ -55,7 +55,7 @@ class LateMoveReductionTests(unittest.TestCase):
             -math.inf,
             math.inf,
             board.turn == chess.WHITE,
-            repetition_counts=repetition_counts,
+            history=history,
             use_lmr=True,
         )
 
@@ -66,7 +66,7 @@ class LateMoveReductionTests(unittest.TestCase):
             -math.inf,
             math.inf,
             board.turn == chess.WHITE,
-            repetition_counts=repetition_counts,
+            history=history,
             use_lmr=True,
         )
         self.assertEqual(cached_reduced, reduced)
@@ -79,7 +79,7 @@ class LateMoveReductionTests(unittest.TestCase):
             -math.inf,
             math.inf,
             board.turn == chess.WHITE,
-            repetition_counts=repetition_counts,
+            history=history,
             use_lmr=False,
         )
         self.assertGreater(chess_engine.search_stats["nodes"], 1)
@@ -94,7 +94,7 @@ class LateMoveReductionTests(unittest.TestCase):
             -math.inf,
             math.inf,
             board.turn == chess.WHITE,
-            repetition_counts=chess_engine.build_repetition_counts(board),
+            history=chess_engine.SearchHistory(board),
             use_lmr=False,
         )
         self.assertEqual(full_after_reduced, fresh_full)
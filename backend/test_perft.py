@@ -0,0 +1,53 @@
+import unittest
+
+import chess
+
+import perft
+
+# Keep the unit suite fast; the CLI runs the deeper published counts.
+MAX_TEST_NODES = 3000
+
+
+class PerftTests(unittest.TestCase):
+    def test_positions_are_valid_and_cover_each_suite(self):
+        self.assertEqual(set(perft.SUITES), {"start", "kiwipete", "endgame", "promotion"})
+        for position in perft.POSITIONS:
+            with self.subTest(position=position.name):
+                self.assertTrue(chess.Board(position.fen).is_valid())
+                self.assertEqual(position.nodes[0], chess.Board(position.fen).legal_moves.count())
+
+    def test_shallow_counts_match_on_every_board_type(self):
+        for position in perft.POSITIONS:
+            depth = max(
+                index + 1 for index, nodes in enumerate(position.nodes) if nodes <= MAX_TEST_NODES
+            )
+            for board_type in perft.BOARD_TYPES:
+                with self.subTest(position=position.name, board=board_type):
+                    result = perft.run_position(position, depth, board_type)
+                    self.assertTrue(result["passed"], result)
+                    self.assertGreater(result["nps"], 0)
+
+    def test_divide_sums_to_perft_and_parallel_split_matches(self):
+        position = perft.POSITIONS_BY_NAME["kiwipete"]
+
+        serial = perft.divide(position.fen, 2, "search")
+        parallel = perft.divide(position.fen, 2, "search", processes=2)
+
+        self.assertEqual(len(serial), position.nodes[0])
+        self.assertEqual(sum(serial.values()), position.nodes[1])
+        self.assertEqual(parallel, serial)
+
+    def test_run_reports_divide_and_expected_counts(self):
+        report = perft.run(
+            (perft.POSITIONS_BY_NAME["start"],), depth=2, board_types=tuple(perft.BOARD_TYPES), include_divide=True
+        )
+
+        self.assertEqual(report["passed"], report["positions"])
+        self.assertEqual(report["nodes"], 800)
+        for item in report["results"]:
+            self.assertEqual(item["expected"], 400)
+            self.assertEqual(item["divide"]["e2e4"], 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import threading
+import time
+import unittest
+
+from ponder import Ponderer
+
+PARAMS = ("intermediate", "balanced", 2.0)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class PondererTests(unittest.TestCase):
+    def start(self, search, is_busy=lambda: False, **kwargs):
+        ponderer = Ponderer(search, is_busy, idle_poll_seconds=0.01, **kwargs)
+        ponderer.start()
+        self.addCleanup(ponderer.stop, 5)
+        return ponderer
+
+    def test_expected_reply_is_a_ponder_hit_and_anything_else_a_miss(self):
+        ponderer = self.start(lambda _session_id, fen, params, _cancel: {"fen": fen, "params": params})
+        ponderer.ponder("game", "expected", PARAMS)
+        self.assertTrue(wait_until(lambda: ponderer.stats["pondered"] == 1))
+
+        self.assertEqual(ponderer.take("game", "expected", PARAMS), {"fen": "expected", "params": PARAMS})
+        self.assertIsNone(ponderer.take("game", "expected", PARAMS))
+
+        ponderer.ponder("game", "expected", PARAMS)
+        self.assertTrue(wait_until(lambda: ponderer.stats["pondered"] == 2))
+        self.assertIsNone(ponderer.take("game", "other reply", PARAMS))
+        self.assertIsNone(ponderer.take("unknown", "expected", PARAMS))
+        self.assertEqual((ponderer.stats["hits"], ponderer.stats["misses"]), (1, 1))
+
+    def test_live_request_preempts_pondering_which_resumes_when_idle(self):
+        busy = threading.Event()
+        calls = []
+
+        def search(_session_id, fen, _params, cancel_event):
+            calls.append(fen)
+            if len(calls) == 1:
+                busy.set()
+                preempted = cancel_event.is_set()
+                busy.clear()
+                return None if preempted else {"fen": fen}
+            return {"fen": fen}
+
+        ponderer = self.start(search, busy.is_set)
+        ponderer.ponder("game", "expected", PARAMS)
+
+        self.assertTrue(wait_until(lambda: ponderer.stats["pondered"] == 1))
+        self.assertEqual(calls, ["expected", "expected"])
+        self.assertEqual(ponderer.stats["preempted"], 1)
+        self.assertEqual(ponderer.take("game", "expected", PARAMS), {"fen": "expected"})
+
+    def test_new_move_supersedes_a_running_ponder(self):
+        started = threading.Event()
+        observed = []
+
+        def search(_session_id, fen, _params, cancel_event):
+            if fen == "old":
+                started.set()
+                wait_until(cancel_event.is_set)
+                observed.append(cancel_event.is_set())
+                return None
+            return {"fen": fen}
+
+        ponderer = self.start(search)
+        ponderer.ponder("game", "old", PARAMS)
+        self.assertTrue(started.wait(5))
+        ponderer.ponder("game", "new", PARAMS)
+
+        self.assertTrue(wait_until(lambda: ponderer.stats["pondered"] == 1))
+        self.assertEqual(observed, [True])
+        self.assertEqual(ponderer.take("game", "new", PARAMS), {"fen": "new"})
+
+    def test_session_count_is_capped(self):
+        ponderer = Ponderer(lambda *_args: None, lambda: True, max_sessions=2)
+        for session_id in ("a", "b", "c"):
+            ponderer.ponder(session_id, "fen", PARAMS)
+
+        snapshot = ponderer.snapshot()
+        self.assertEqual((snapshot["sessions"], snapshot["queued"]), (2, 2))
+        self.assertEqual(snapshot["evicted_sessions"], 1)
+        self.assertIsNone(ponderer.take("a", "fen", PARAMS))
+
+
+if __name__ == "__main__":
+    unittest.main()
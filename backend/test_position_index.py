@@ -0,0 +1,104 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+import chess
+
+from position_index import PositionIndex, game_phase, material_signature, pawn_signature, piece_squares
+from rag import ChessRAG
+
+
+IMMORTAL_GAME = """
+[Event "The Immortal Game"]
+[Site "London"]
+[White "Adolf Anderssen"]
+[Black "Lionel Kieseritzky"]
+[Result "1-0"]
+
+1. e4 e5 2. f4 exf4 3. Bc4 Qh4+ 4. Kf1 b5 5. Bxb5 Nf6 6. Nf3 Qh6 7. d3 Nh5 8. Nh4 Qg5
+9. Nf5 c6 10. g4 Nf6 11. Rg1 cxb5 12. h4 Qg6 13. h5 Qg5 14. Qf3 Ng8 15. Bxf4 Qf6
+16. Nc3 Bc5 17. Nd5 Qxb2 18. Bd6 Bxg1 19. e5 Qxa1+ 20. Ke2 Na6 21. Nxg7+ Kd8
+22. Qf6+ Nxf6 23. Be7# 1-0
+
+[Event "Rated Blitz game"]
+[Site "https://lichess.org/abcd1234"]
+[White "alice"]
+[Black "bob"]
+[Result "0-1"]
+
+1. d4 d5 2. c4 e6 3. Nc3 Nf6 4. Bg5 Be7 5. e3 O-O 6. Nf3 h6 7. Bh4 b6 0-1
+"""
+
+
+def board_after(*sans):
+    board = chess.Board()
+    for san in sans:
+        board.push_san(san)
+    return board
+
+
+class PositionFeatureTests(unittest.TestCase):
+    def test_start_position_signatures(self):
+        squares = piece_squares(chess.Board())
+
+        self.assertEqual(bin(squares).count("1"), 32)
+        self.assertEqual(material_signature(squares), (8, 2, 2, 2, 1, 8, 2, 2, 2, 1))
+        self.assertEqual(game_phase(squares), 24)
+        self.assertEqual(pawn_signature(squares), (int(chess.BB_RANK_2), int(chess.BB_RANK_7)))
+
+
+class PositionIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.index = PositionIndex()
+        self.assertEqual(self.index.add_pgn(io.StringIO(IMMORTAL_GAME)), 2)
+
+    def test_nearby_position_finds_the_game_and_its_next_move(self):
+        # The Immortal Game after 4...b5, with Black's h-pawn nudged: one pawn step away.
+        board = board_after("e4", "e5", "f4", "exf4", "Bc4", "Qh4+", "Kf1", "b5")
+        match = self.index.nearest(board)
+
+        self.assertEqual(match[0], 0)
+        self.assertEqual(self.index.describe(match[1])["move"], "c4b5")
+
+        board.remove_piece_at(chess.H7)
+        board.set_piece_at(chess.H6, chess.Piece(chess.PAWN, chess.BLACK))
+        distance, entry = self.index.nearest(board)
+        self.assertGreater(distance, 0)
+        self.assertEqual(self.index.describe(entry)["white"], "Adolf Anderssen")
+
+    def test_source_comes_from_site_header(self):
+        board = board_after("d4", "d5", "c4", "e6", "Nc3", "Nf6", "Bg5", "Be7")
+        game = self.index.describe(self.index.nearest(board)[1])
+
+        self.assertEqual((game["white"], game["source"], game["move"]), ("alice", "lichess", "e2e3"))
+
+    def test_unrelated_position_has_no_match(self):
+        self.assertIsNone(self.index.nearest(chess.Board("8/8/4k3/8/8/3K4/8/7R w - - 0 1")))
+
+    def test_saved_index_round_trips(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "positions.idx")
+            self.index.save(path)
+            restored = PositionIndex.load(path)
+
+        board = board_after("e4", "e5", "f4", "exf4", "Bc4")
+        self.assertEqual(len(restored), len(self.index))
+        self.assertEqual(
+            self.index.describe(self.index.nearest(board)[1]),
+            restored.describe(restored.nearest(board)[1]),
+        )
+
+    def test_rag_uses_local_index_without_chroma(self):
+        rag = ChessRAG()
+        rag.position_index = self.index
+
+        text = rag.retrieve_similar_game(board_after("e4", "e5", "f4").fen())
+
+        self.assertEqual(text, "[歷史名局] Adolf Anderssen vs Lionel Kieseritzky, 大師走了 e5f4")
+        self.assertNotIn("chromadb", sys.modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
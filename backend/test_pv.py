@@ -22,6 +22,21 @@ class PrincipalVariationTests(unittest.TestCase):
             self.assertIn(move, temp_board.legal_moves)
             temp_board.push(move)
 
+    def test_each_completed_iteration_is_reported_and_the_last_matches_the_result(self):
+        board = chess.Board("r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4")
+        reports = []
+
+        chess_engine.reset_transposition_table()
+        analysis = chess_engine.get_analysis(
+            board, depth=3, time_limit=30, use_book=False, adaptive_depth=False, on_iteration=reports.append
+        )
+
+        self.assertEqual([report["depth"] for report in reports], [1, 2, 3])
+        self.assertEqual(reports[-1]["score"], analysis["score"])
+        self.assertEqual(reports[-1]["pv"], analysis["pv"])
+        self.assertEqual(reports[-1]["nodes"], analysis["nodes"])
+        self.assertTrue(all(report["pv"] and report["nps"] >= 0 for report in reports))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from request_budget import MIN_STAGE_SECONDS, RequestBudget
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class RequestBudgetTests(unittest.TestCase):
+    def test_stages_split_the_total_by_share(self):
+        clock = FakeClock()
+        budget = RequestBudget(10.0, clock=clock)
+
+        self.assertAlmostEqual(budget.allocate("search"), 7.0)
+        clock.now += 7.0
+        self.assertAlmostEqual(budget.allocate("teaching"), 2.0)
+        clock.now += 2.0
+        self.assertAlmostEqual(budget.allocate("coaching"), 1.0)
+
+    def test_shared_work_reports_the_stages_of_the_budget_that_ran_it(self):
+        clock = FakeClock()
+        leader = RequestBudget(10.0, clock=clock)
+        follower = RequestBudget(10.0, clock=clock)
+        leader.allocate("search")
+        clock.now += 2.0
+
+        follower.adopt(leader)
+        follower.adopt(follower)
+
+        self.assertEqual(follower.report()["stages"], {"search": {"allocated": 7.0, "used": 2.0}})
+
+    def test_unused_time_rolls_over_to_later_stages(self):
+        clock = FakeClock()
+        budget = RequestBudget(10.0, clock=clock)
+        budget.allocate("search")
+        clock.now += 1.0
+
+        # 9s left for teaching (0.2) and coaching (0.1).
+        self.assertAlmostEqual(budget.allocate("teaching"), 6.0)
+        clock.now += 0.5
+        self.assertAlmostEqual(budget.allocate("coaching"), 8.5)
+
+        report = budget.report()
+        self.assertEqual(report["stages"]["search"], {"allocated": 7.0, "used": 1.0})
+        self.assertEqual(report["stages"]["teaching"], {"allocated": 6.0, "used": 0.5})
+        self.assertEqual(report["elapsed"], 1.5)
+
+    def test_overrun_leaves_later_stages_a_minimal_limit(self):
+        clock = FakeClock()
+        budget = RequestBudget(1.0, clock=clock)
+        budget.allocate("search")
+        clock.now += 3.0
+
+        self.assertEqual(budget.remaining(), 0.0)
+        self.assertEqual(budget.allocate("teaching"), MIN_STAGE_SECONDS)
+
+    def test_budget_without_total_is_unbounded(self):
+        budget = RequestBudget(0)
+
+        self.assertIsNone(budget.remaining())
+        self.assertIsNone(budget.allocate("search"))
+        self.assertIsNone(budget.report()["stages"]["search"]["allocated"])
+        with self.assertRaises(ValueError):
+            budget.allocate("unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import math
+import unittest
+
+import chess
+import chess.polyglot
+
+import chess_engine
+import perft
+from evaluation import is_endgame
+from evaluation.material import material_and_piece_square_scores
+from search_board import SearchBoard, zobrist_hash
+
+# Keep the per-node hash and evaluator comparisons fast.
+MAX_PERFT_NODES = 2100
+
+
+class SearchBoardTests(unittest.TestCase):
+    def perft(self, board, reference, depth):
+        # The reference replays the same moves, so en passant squares match too.
+        self.assertEqual(board.fen(), reference.fen())
+        self.assertEqual(board.zobrist, chess.polyglot.zobrist_hash(reference))
+        endgame = is_endgame(reference)
+        self.assertEqual(
+            board.material_and_piece_square(endgame),
+            material_and_piece_square_scores(reference, endgame),
+        )
+        if depth == 0:
+            return 1
+        nodes = 0
+        for move in board.generate_legal_moves():
+            board.push(move)
+            reference.push(move)
+            nodes += self.perft(board, reference, depth - 1)
+            reference.pop()
+            board.pop()
+        return nodes
+
+    def test_perft_and_incremental_state_match_python_chess(self):
+        for position in perft.POSITIONS:
+            depth = max(
+                index + 1 for index, nodes in enumerate(position.nodes) if nodes <= MAX_PERFT_NODES
+            )
+            with self.subTest(position=position.name):
+                self.assertEqual(
+                    self.perft(SearchBoard(position.fen), chess.Board(position.fen), depth),
+                    position.nodes[depth - 1],
+                )
+
+    def test_from_board_keeps_repetition_history(self):
+        board = chess.Board()
+        for uci in ("g1f3", "g8f6", "f3g1", "f6g8", "g1f3", "g8f6", "f3g1"):
+            board.push_uci(uci)
+        search_board = SearchBoard.from_board(board)
+
+        self.assertEqual(search_board.fen(), board.fen())
+        self.assertFalse(search_board.is_repetition(3))
+        search_board.push_uci("f6g8")
+        board.push_uci("f6g8")
+        self.assertTrue(search_board.is_repetition(3))
+        self.assertEqual(search_board.is_repetition(4), board.is_repetition(4))
+        self.assertEqual(
+            chess_engine.SearchHistory(search_board).hashes,
+            chess_engine.SearchHistory(board).hashes,
+        )
+        self.assertEqual(zobrist_hash(search_board), zobrist_hash(board))
+
+    def test_copy_keeps_the_history_chess_board_copy_keeps(self):
+        board = chess.Board()
+        for uci in ("g1f3", "g8f6", "f3g1", "f6g8", "e2e4", "g8f6", "g1f3"):
+            board.push_uci(uci)
+        search_board = SearchBoard.from_board(board)
+        for uci in ("f6g8", "f3g1"):
+            board.push_uci(uci)
+            search_board.push_uci(uci)
+
+        for stack in (True, False, 0, 1, 2, 4, 20):
+            with self.subTest(stack=stack):
+                reference = board.copy(stack=stack)
+                copied = search_board.copy(stack=stack)
+                self.assertIsInstance(copied, SearchBoard)
+                self.assertEqual(copied.fen(), reference.fen())
+                for count in (2, 3):
+                    self.assertEqual(copied.is_repetition(count), reference.is_repetition(count))
+                self.assertEqual(len(copied.move_stack), min(len(reference.move_stack), len(search_board.move_stack)))
+                while copied.move_stack:
+                    self.assertEqual(copied.pop(), reference.pop())
+                    self.assertEqual(copied.fen(), reference.fen())
+                    self.assertEqual(copied.zobrist, chess.polyglot.zobrist_hash(reference))
+                    endgame = is_endgame(reference)
+                    self.assertEqual(
+                        copied.material_and_piece_square(endgame),
+                        material_and_piece_square_scores(reference, endgame),
+                    )
+
+        copied = search_board.copy()
+        copied.push_uci("g8f6")
+        self.assertEqual(len(search_board.move_stack), 2)
+
+    def test_minimax_scores_match_on_both_board_types(self):
+        fens = (
+            chess.STARTING_FEN,
+            "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4",
+            "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        )
+        for fen in fens:
+            results = []
+            for board in (chess.Board(fen), SearchBoard(fen)):
+                chess_engine.reset_transposition_table()
+                chess_engine.begin_search_generation()
+                results.append(chess_engine.minimax(board, 3, -math.inf, math.inf, board.turn))
+                self.assertEqual(board.fen(), fen)
+            with self.subTest(fen=fen):
+                self.assertEqual(results[0], results[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import io
+import random
+import unittest
+from collections import Counter
+from unittest.mock import patch
+
+import chess
+import chess.pgn
+
+import chess_engine
+from evaluation import insufficient_material
+
+# Random play almost never repeats a position five times.
+KNIGHT_SHUFFLE_PGN = " ".join(
+    f"{2 * index + 1}. Nf3 Nf6 {2 * index + 2}. Ng1 Ng8" for index in range(5)
+) + " *"
+
+
+def random_game_corpus(games, seed=2024, max_plies=900):
+    """Export seeded random games as PGN; random play reaches every kind of ending."""
+    rng = random.Random(seed)
+    pgn_games = []
+    for _ in range(games):
+        game = chess.pgn.Game()
+        node = game
+        board = chess.Board()
+        while board.outcome() is None and board.ply() < max_plies:
+            move = rng.choice(list(board.legal_moves))
+            node = node.add_variation(move)
+            board.push(move)
+        pgn_games.append(str(game))
+    return "\n\n".join([*pgn_games, KNIGHT_SHUFFLE_PGN])
+
+
+class SearchTerminationParityTests(unittest.TestCase):
+    def test_matches_python_chess_outcomes_across_pgn_corpus(self):
+        handle = io.StringIO(random_game_corpus(60))
+        terminations = Counter()
+        positions = 0
+        while (game := chess.pgn.read_game(handle)) is not None:
+            board = game.board()
+            history = chess_engine.SearchHistory(board)
+            for move in [None, *game.mainline_moves()]:
+                if move is not None:
+                    board.push(move)
+                    history.push(board)
+                has_legal_moves = any(board.generate_legal_moves())
+                outcome = board.outcome()
+                expected = outcome.termination if outcome else None
+
+                self.assertEqual(
+                    chess_engine.search_termination(board, has_legal_moves, history),
+                    expected,
+                    board.fen(),
+                )
+                self.assertEqual(
+                    chess_engine.search_termination(board, has_legal_moves), expected, board.fen()
+                )
+                self.assertEqual(
+                    insufficient_material(board), board.is_insufficient_material(), board.fen()
+                )
+                terminations[expected] += 1
+                positions += 1
+
+        self.assertGreater(positions, 10_000)
+        for termination in (
+            chess.Termination.CHECKMATE,
+            chess.Termination.STALEMATE,
+            chess.Termination.INSUFFICIENT_MATERIAL,
+            chess.Termination.SEVENTYFIVE_MOVES,
+            chess.Termination.FIVEFOLD_REPETITION,
+        ):
+            self.assertIn(termination, terminations)
+
+    def test_minimax_scores_mate_and_stalemate_without_game_over_probe(self):
+        mate_in_one = chess.Board("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+        stalemate = chess.Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+        chess_engine.reset_transposition_table()
+        chess_engine.begin_search_generation()
+
+        with patch.object(chess.Board, "is_game_over", side_effect=AssertionError):
+            mate_score, mate_move = chess_engine.minimax(mate_in_one, 2, -10**9, 10**9, True)
+            stalemate_score, stalemate_move = chess_engine.minimax(stalemate, 2, -10**9, 10**9, False)
+
+        self.assertEqual(mate_move, chess.Move.from_uci("d1d8"))
+        self.assertGreater(mate_score, chess_engine.MATE_THRESHOLD)
+        self.assertEqual((stalemate_score, stalemate_move), (0, None))
+
+    def test_candidate_scoring_detects_mate_without_game_over_probe(self):
+        board = chess.Board("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+        mate = chess.Move.from_uci("d1d8")
+        chess_engine.reset_transposition_table()
+        chess_engine.begin_search_generation()
+
+        with patch.object(chess.Board, "is_game_over", side_effect=AssertionError):
+            move, score, _bonus, _loss = chess_engine.select_difficulty_move(
+                board, 2, mate, chess_engine.MATE_SCORE, "advanced", "balanced"
+            )
+            board.push(mate)
+            candidate_score = chess_engine._candidate_score(board, 1)
+
+        self.assertEqual(move, mate)
+        self.assertGreater(score, chess_engine.MATE_THRESHOLD)
+        self.assertGreater(candidate_score, chess_engine.MATE_THRESHOLD)
+
+    def test_stalemate_is_found_when_only_illegal_pseudo_legal_moves_exist(self):
+        # The pinned bishop and the king both have pseudo-legal moves, none legal.
+        board = chess.Board("k7/b1K5/8/8/8/8/8/R7 b - - 0 1")
+        self.assertTrue(any(board.generate_pseudo_legal_moves()))
+        chess_engine.reset_transposition_table()
+        chess_engine.begin_search_generation()
+
+        self.assertEqual(chess_engine.minimax(board, 2, -10**9, 10**9, False), (0, None))
+        self.assertEqual(chess_engine.quiescence_search(board, -10**9, 10**9), 0)
+        self.assertGreater(chess_engine.search_stats["legality_checks"], 0)
+
+    def test_quiescence_stand_pat_cutoff_tests_no_move_for_legality(self):
+        board = chess.Board("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4")
+        chess_engine.reset_transposition_table()
+
+        self.assertEqual(chess_engine.quiescence_search(board, -10**9, -10**8), -10**8)
+        self.assertEqual(chess_engine.search_stats["legality_checks"], 0)
+
+    def test_quiescence_probes_quiet_moves_only_without_a_legal_capture(self):
+        board = chess.Board("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4")
+        chess_engine.reset_transposition_table()
+        probed = []
+        is_stalemate = chess_engine._is_stalemate
+
+        def record(position, is_legal):
+            probed.append(position.fen())
+            return is_stalemate(position, is_legal)
+
+        with patch("chess_engine._is_stalemate", side_effect=record):
+            chess_engine.quiescence_search(board, -10**9, 10**9)
+
+        self.assertNotIn(board.fen(), probed)
+
+
+if __name__ == "__main__":
+    unittest.main()
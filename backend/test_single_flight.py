@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import unittest
+
+from single_flight import SharedCancelEvent, SingleFlight
+
+
+class SingleFlightTests(unittest.TestCase):
+    def test_concurrent_duplicates_share_one_computation_and_get_copies(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def compute(_cancel_event):
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"best_move": "e2e4", "pv": ["e2e4", "e7e5"]}
+
+        async def scenario():
+            return await asyncio.gather(
+                flights.run(("analysis", "fen", 3), compute),
+                flights.run(("analysis", "fen", 3), compute),
+                flights.run(("analysis", "fen", 4), compute),
+            )
+
+        first, second, other = asyncio.run(scenario())
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(first, second)
+        first["pv"].append("g1f3")
+        self.assertEqual(second["pv"], ["e2e4", "e7e5"])
+        self.assertEqual(other["best_move"], "e2e4")
+        self.assertEqual(flights.snapshot(), {
+            "in_flight": 0,
+            "by_kind": {"analysis": {"computed": 2, "coalesced": 1}},
+        })
+
+    def test_failure_reaches_every_waiter_and_clears_the_key(self):
+        flights = SingleFlight()
+
+        async def fail(_cancel_event):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("engine failed")
+
+        async def scenario():
+            return await asyncio.gather(
+                flights.run(("review", "pgn"), fail),
+                flights.run(("review", "pgn"), fail),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(scenario())
+
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(flights.in_flight(), 0)
+
+    def test_caller_arriving_after_cancellation_gets_a_fresh_computation(self):
+        flights = SingleFlight()
+        gone, live = threading.Event(), threading.Event()
+        gone.set()
+
+        async def scenario():
+            observed = asyncio.Event()
+
+            async def compute(shared_cancel):
+                cancelled = shared_cancel.is_set()
+                observed.set()
+                await asyncio.sleep(0.01)
+                return {"cancelled": cancelled}
+
+            first = asyncio.ensure_future(flights.run(("analysis", "fen"), compute, gone))
+            await observed.wait()
+            second = await flights.run(("analysis", "fen"), compute, live)
+            return await first, second
+
+        first, second = asyncio.run(scenario())
+
+        self.assertEqual(first, {"cancelled": True})
+        self.assertEqual(second, {"cancelled": False})
+        self.assertEqual(flights.stats["analysis"], {"computed": 2, "coalesced": 0})
+
+    def test_waiters_of_a_flight_cancelled_under_them_recompute(self):
+        flights = SingleFlight()
+        runs = []
+
+        async def scenario():
+            joined = asyncio.Event()
+
+            async def compute(shared_cancel):
+                runs.append(shared_cancel)
+                if len(runs) == 1:
+                    await joined.wait()
+                    # The search saw every waiter gone just before the last one joined.
+                    shared_cancel.fired = True
+                    raise RuntimeError("search cancelled")
+                return "complete"
+
+            first = asyncio.ensure_future(flights.run(("review", "pgn"), compute, None))
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(flights.run(("review", "pgn"), compute, threading.Event()))
+            await asyncio.sleep(0)
+            joined.set()
+            return await asyncio.gather(first, second)
+
+        self.assertEqual(asyncio.run(scenario()), ["complete", "complete"])
+        self.assertEqual(len(runs), 2)
+
+    def test_shared_work_is_cancelled_only_when_every_waiter_cancels(self):
+        shared = SharedCancelEvent()
+        first, second = threading.Event(), threading.Event()
+        shared.add(first)
+        shared.add(second)
+
+        first.set()
+        self.assertFalse(shared.is_set())
+        second.set()
+        self.assertTrue(shared.is_set())
+
+        # The search has stopped by now; a later waiter cannot revive it.
+        shared.add(None)
+        self.assertTrue(shared.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()
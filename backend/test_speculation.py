@@ -0,0 +1,109 @@
+import threading
+import time
+import unittest
+
+from speculation import AnalysisCache, Preemption, SpeculativeAnalyzer
+
+
+class AnalysisCacheTests(unittest.TestCase):
+    def test_speculative_entries_are_evicted_first(self):
+        cache = AnalysisCache(max_entries=2)
+        cache.put("real", {"score": 1})
+        cache.put("guess", {"score": 2}, speculative=True)
+
+        cache.put("newer", {"score": 3})
+
+        self.assertNotIn("guess", cache)
+        self.assertEqual(cache.get("real"), {"score": 1})
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_hit_promotes_a_speculative_entry_and_returns_a_copy(self):
+        cache = AnalysisCache(max_entries=2)
+        cache.put("guess", {"pv": ["e2e4"]}, speculative=True)
+        self.assertEqual(cache.peek("guess"), {"pv": ["e2e4"]})
+        self.assertEqual(cache.snapshot()["speculative_entries"], 1)
+
+        hit = cache.get("guess")
+        hit["pv"].append("e7e5")
+        cache.put("other", {}, speculative=True)
+        cache.put("third", {}, speculative=True)
+
+        self.assertEqual(cache.get("guess"), {"pv": ["e2e4"]})
+        self.assertEqual(cache.stats["speculative_hits"], 1)
+        self.assertEqual(cache.snapshot()["entries"], 1)
+
+    def test_speculative_result_never_replaces_a_real_one(self):
+        cache = AnalysisCache()
+        cache.put("key", {"source": "request"})
+        cache.put("key", {"source": "speculation"}, speculative=True)
+
+        self.assertEqual(cache.get("key"), {"source": "request"})
+
+
+class SpeculativeAnalyzerTests(unittest.TestCase):
+    def test_preemption_latches_until_reset(self):
+        busy = [False]
+        preemption = Preemption(threading.Event(), lambda: busy[0])
+        self.assertFalse(preemption.is_set())
+
+        busy[0] = True
+        self.assertTrue(preemption.is_set())
+        busy[0] = False
+        self.assertTrue(preemption.is_set())
+        preemption.reset()
+        self.assertFalse(preemption.is_set())
+
+    def test_preempted_position_is_retried_once_idle(self):
+        busy = threading.Event()
+        analyzed = []
+        done = threading.Event()
+
+        def analyze(fen, cancel_event):
+            if fen == "first" and not analyzed:
+                busy.set()
+                analyzed.append(("preempted", fen))
+                cancelled = cancel_event.is_set()
+                busy.clear()
+                return not cancelled
+            analyzed.append(("done", fen))
+            if fen == "second":
+                done.set()
+            return True
+
+        speculator = SpeculativeAnalyzer(analyze, busy.is_set, idle_poll_seconds=0.01)
+        speculator.start()
+        try:
+            speculator.submit(["first", "second", "first"])
+            self.assertTrue(done.wait(5))
+        finally:
+            speculator.stop(timeout=5)
+
+        self.assertEqual(analyzed, [("preempted", "first"), ("done", "first"), ("done", "second")])
+        self.assertEqual(speculator.snapshot()["preempted"], 1)
+        self.assertEqual(speculator.snapshot()["completed"], 2)
+        self.assertFalse(speculator.snapshot()["running"])
+
+    def test_waits_for_idle_engine_and_new_submit_replaces_stale_positions(self):
+        busy = threading.Event()
+        busy.set()
+        analyzed = []
+        speculator = SpeculativeAnalyzer(lambda fen, _cancel: analyzed.append(fen) or True, busy.is_set, idle_poll_seconds=0.01)
+        speculator.start()
+        try:
+            speculator.submit(["stale"])
+            time.sleep(0.05)
+            self.assertEqual(analyzed, [])
+            speculator.submit(["fresh"])
+            busy.clear()
+            for _ in range(100):
+                if analyzed:
+                    break
+                time.sleep(0.01)
+        finally:
+            speculator.stop(timeout=5)
+
+        self.assertEqual(analyzed, ["fresh"])
+
+
+if __name__ == "__main__":
+    unittest.main()
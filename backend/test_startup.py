@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import api
+from import_benchmark import DEFERRED_MODULES, measure_imports
+
+
+class ImportTimeTests(unittest.TestCase):
+    def test_api_import_defers_coaching_and_database_stacks(self):
+        report = measure_imports("api")
+
+        self.assertGreater(report["total_ms"], 0)
+        self.assertIn("chess_engine", report["modules"])
+        for module in DEFERRED_MODULES:
+            self.assertNotIn(module, report["modules"])
+
+
+class ReadinessTests(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(api.app)
+        self.original = {"ready": api.readiness["ready"], "components": dict(api.readiness["components"])}
+        api.readiness.update(ready=False, components={})
+
+    def tearDown(self):
+        api.readiness.update(self.original)
+
+    def test_ready_reports_503_until_warmup_finishes(self):
+        self.assertEqual(self.client.get("/ready").status_code, 503)
+
+        # The real database step would create games.db in the source tree.
+        steps = tuple((name, (lambda: None) if name == "database" else step) for name, step in api.WARMUP_STEPS)
+        with patch("api.WARMUP_STEPS", steps), patch("api.get_rag_engine", return_value=object()) as get_rag_engine:
+            api.warm_up()
+
+        get_rag_engine.assert_called_once_with()
+        response = self.client.get("/ready")
+        self.assertEqual(response.status_code, 200)
+        components = response.json()["components"]
+        self.assertEqual(
+            set(components),
+            {"database", "opening_book", "transposition_table", "evaluator", "opening_index", "coach"},
+        )
+        self.assertTrue(all(item["status"] == "ok" for item in components.values()))
+
+    def test_failed_warmup_step_is_reported_without_blocking_readiness(self):
+        def broken():
+            raise RuntimeError("book missing")
+
+        with patch("api.WARMUP_STEPS", (("opening_book", broken),)):
+            api.warm_up()
+
+        data = self.client.get("/ready").json()
+        self.assertTrue(data["ready"])
+        self.assertEqual(data["components"]["opening_book"]["status"], "failed")
+
+    def test_disabled_warmup_is_ready_after_required_steps(self):
+        with patch.dict("os.environ", {"WARMUP_ON_STARTUP": "0"}), patch("api.get_rag_engine") as get_rag_engine:
+            with TestClient(api.app) as client:
+                response = client.get("/ready")
+
+        get_rag_engine.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()["components"]), {"transposition_table"})
+
+
+if __name__ == "__main__":
+    unittest.main()
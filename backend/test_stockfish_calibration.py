@@ -2,7 +2,8 @@ import unittest
 
 import chess
 
-from stockfish_calibration import POSITIONS, move_loss_metrics
+from api import BOT_DIFFICULTY_PROFILES
+from stockfish_calibration import CONFIGS, POSITIONS, move_loss_metrics, node_budget_configs
 
 
 class StockfishCalibrationTests(unittest.TestCase):
@@ -29,5 +30,27 @@ class StockfishCalibrationTests(unittest.TestCase):
         self.assertEqual(metrics["loss_cp"], 0)
         self.assertEqual(metrics["expectation_loss"], 0)
 
+    def test_level_configs_mirror_api_profiles(self):
+        for config in CONFIGS:
+            profile = BOT_DIFFICULTY_PROFILES[config.name]
+            with self.subTest(level=config.name):
+                self.assertEqual(
+                    (config.depth, config.time_limit, config.use_book, config.adaptive_depth, config.node_limit),
+                    (
+                        profile["depth"],
+                        profile["time_limit"],
+                        profile["use_book"],
+                        profile["adaptive_depth"],
+                        profile["node_limit"],
+                    ),
+                )
+
+    def test_node_budget_ladder_varies_only_the_budget(self):
+        configs = node_budget_configs([2_000, 8_000])
+
+        self.assertEqual([config.node_limit for config in configs], [2_000, 8_000])
+        self.assertEqual({(config.time_limit, config.difficulty) for config in configs}, {(None, "advanced")})
+
+
 if __name__ == "__main__":
     unittest.main()
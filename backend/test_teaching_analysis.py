@@ -1,3 +1,4 @@
+import time
 import unittest
 from unittest.mock import patch
 
@@ -130,12 +131,9 @@ class TeachingAnalysisTests(unittest.TestCase):
         moves = [board.parse_san(san) for san in ("a3", "e4", "d4")]
         scores = {moves[0]: 0, moves[1]: 100, moves[2]: 50}
 
-        with (
-            patch.object(chess_engine, "_candidate_moves", return_value=moves),
-            patch.object(chess_engine, "_candidate_score", side_effect=lambda child, _depth: scores[child.peek()]),
-        ):
+        with patch.object(chess_engine, "multipv_search", return_value=(scores, 1, True)):
             teaching = chess_engine.get_teaching_analysis(
-                board, {"best_move": moves[0], "score": 0, "depth": 2}, depth=1
+                board, {"best_move": moves[0], "score": 0, "depth": 2}, candidate_count=3, depth=1
             )
 
         self.assertEqual([item["san"] for item in teaching["candidates"]], ["e4", "d4", "a3"])
@@ -149,12 +147,9 @@ class TeachingAnalysisTests(unittest.TestCase):
         moves = [board.parse_san(san) for san in ("a6", "e5", "d5")]
         white_scores = {moves[0]: 100, moves[1]: -100, moves[2]: 0}
 
-        with (
-            patch.object(chess_engine, "_candidate_moves", return_value=moves),
-            patch.object(chess_engine, "_candidate_score", side_effect=lambda child, _depth: white_scores[child.peek()]),
-        ):
+        with patch.object(chess_engine, "multipv_search", return_value=(white_scores, 1, True)):
             teaching = chess_engine.get_teaching_analysis(
-                board, {"best_move": moves[0], "score": 100, "depth": 2}, depth=1
+                board, {"best_move": moves[0], "score": 100, "depth": 2}, candidate_count=3, depth=1
             )
 
         self.assertEqual([item["san"] for item in teaching["candidates"]], ["e5", "d5", "a6"])
@@ -164,12 +159,9 @@ class TeachingAnalysisTests(unittest.TestCase):
         board = chess.Board()
         moves = [board.parse_san(san) for san in ("e4", "d4")]
 
-        with (
-            patch.object(chess_engine, "_candidate_moves", return_value=moves),
-            patch.object(chess_engine, "_candidate_score", side_effect=[20, chess_engine.SearchTimeout()]),
-        ):
+        with patch.object(chess_engine, "multipv_search", return_value=({moves[0]: 20}, 1, False)):
             teaching = chess_engine.get_teaching_analysis(
-                board, {"best_move": moves[0], "score": 20, "depth": 2}, depth=1
+                board, {"best_move": moves[0], "score": 20, "depth": 2}, candidate_count=2, depth=1
             )
 
         self.assertFalse(teaching["analysis_complete"])
@@ -179,6 +171,31 @@ class TeachingAnalysisTests(unittest.TestCase):
         self.assertEqual(teaching["criticality"], "partial")
         self.assertNotIn("only_move", teaching["position_themes"])
 
+    def test_candidate_descriptions_stay_within_the_teaching_time(self):
+        board = chess.Board()
+        moves = [board.parse_san(san) for san in ("a3", "e4", "d4")]
+        scores = {moves[1]: 100, moves[2]: 50, moves[0]: 0}
+        move_themes = chess_engine._move_themes
+
+        def slow_themes(*args):
+            time.sleep(0.1)
+            return move_themes(*args)
+
+        started = time.monotonic()
+        with (
+            patch.object(chess_engine, "multipv_search", return_value=(scores, 1, True)) as multipv_search,
+            patch.object(chess_engine, "_move_themes", side_effect=slow_themes),
+        ):
+            teaching = chess_engine.get_teaching_analysis(
+                board, {"best_move": moves[0], "score": 0, "depth": 2}, candidate_count=3, depth=1, time_limit=0.05
+            )
+
+        search_deadline = multipv_search.call_args.kwargs["deadline"]
+        self.assertLessEqual(search_deadline, started + 0.05 * chess_engine.TEACHING_SEARCH_SHARE + 0.01)
+        self.assertEqual([item["san"] for item in teaching["candidates"]], ["a3"])
+        self.assertFalse(teaching["analysis_complete"])
+        self.assertEqual(teaching["criticality"], "partial")
+
     def test_mate_scores_are_not_reported_as_centipawn_loss(self):
         board = chess.Board(
             "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4"
@@ -187,12 +204,9 @@ class TeachingAnalysisTests(unittest.TestCase):
         quiet = board.parse_san("Qd1")
         scores = {mate: chess_engine.MATE_SCORE - 1, quiet: 0}
 
-        with (
-            patch.object(chess_engine, "_candidate_moves", return_value=[quiet, mate]),
-            patch.object(chess_engine, "_candidate_score", side_effect=lambda child, _depth: scores[child.peek()]),
-        ):
+        with patch.object(chess_engine, "multipv_search", return_value=(scores, 1, True)):
             teaching = chess_engine.get_teaching_analysis(
-                board, {"best_move": quiet, "score": 0, "depth": 2}, depth=1
+                board, {"best_move": quiet, "score": 0, "depth": 2}, candidate_count=2, depth=1
             )
 
         self.assertEqual(teaching["candidates"][0]["san"], "Qxf7#")
@@ -203,10 +217,7 @@ class TeachingAnalysisTests(unittest.TestCase):
     def test_timeout_before_first_score_reports_base_only_as_unevaluated(self):
         board = chess.Board()
         base = board.parse_san("e4")
-        with (
-            patch.object(chess_engine, "_candidate_moves", return_value=[base]),
-            patch.object(chess_engine, "_candidate_score", side_effect=chess_engine.SearchTimeout()),
-        ):
+        with patch.object(chess_engine, "multipv_search", return_value=({}, 0, False)):
             teaching = chess_engine.get_teaching_analysis(
                 board, {"best_move": base, "score": 20, "depth": 2}, depth=1
             )
@@ -220,17 +231,98 @@ class TeachingAnalysisTests(unittest.TestCase):
         board = chess.Board()
         moves = [board.parse_san(san) for san in ("e4", "d4", "c4")]
         scores = {moves[0]: 50, moves[1]: 50, moves[2]: 0}
-        with (
-            patch.object(chess_engine, "_candidate_moves", return_value=moves),
-            patch.object(chess_engine, "_candidate_score", side_effect=lambda child, _depth: scores[child.peek()]),
-        ):
+        with patch.object(chess_engine, "multipv_search", return_value=(scores, 1, True)):
             teaching = chess_engine.get_teaching_analysis(
-                board, {"best_move": moves[0], "score": 50, "depth": 2}, depth=1
+                board, {"best_move": moves[0], "score": 50, "depth": 2}, candidate_count=3, depth=1
             )
 
         self.assertEqual(teaching["candidates"][1]["loss_cp"], 0)
         self.assertTrue(teaching["candidates"][1]["near_equal"])
 
+    def test_multipv_scores_are_the_exact_top_moves_of_independent_searches(self):
+        board = chess.Board("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+        moves = list(board.legal_moves)
+
+        scores, reached_depth, complete = chess_engine.multipv_search(board, moves, 2, multipv=3)
+
+        self.assertTrue(complete)
+        self.assertEqual(reached_depth, 2)
+        independent = {}
+        for move in moves:
+            chess_engine.reset_transposition_table()
+            child = board.copy()
+            child.push(move)
+            independent[move] = chess_engine._candidate_score(child, 2)
+        top_scores = sorted(independent.values(), reverse=True)[:3]
+        self.assertEqual(sorted(scores.values(), reverse=True), top_scores)
+        for move, score in scores.items():
+            self.assertEqual(score, independent[move])
+
+    def test_multipv_black_and_required_moves_are_scored_exactly(self):
+        board = chess.Board("r5k1/5ppp/8/8/8/2N5/5PPP/6K1 b - - 0 1")
+        moves = list(board.legal_moves)
+        blunder = board.parse_san("Ra4")
+
+        scores, _depth, complete = chess_engine.multipv_search(board, moves, 2, multipv=2, required=[blunder])
+
+        self.assertTrue(complete)
+        self.assertEqual(len(scores), 3)
+        self.assertEqual(max(scores.values()), scores[blunder])
+        for move, score in scores.items():
+            chess_engine.reset_transposition_table()
+            child = board.copy()
+            child.push(move)
+            self.assertEqual(score, chess_engine._candidate_score(child, 2))
+
+    def test_multipv_cut_short_of_its_target_depth_is_incomplete(self):
+        board = chess.Board("r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15")
+        moves = list(board.legal_moves)
+        chess_engine.begin_search_generation()
+        shallow, _depth, _complete = chess_engine.multipv_search(board, moves, 1, multipv=3)
+        first_iteration_nodes = chess_engine.search_runtime.nodes
+
+        chess_engine.reset_transposition_table()
+        chess_engine.begin_search_generation(node_limit=first_iteration_nodes + 50)
+        try:
+            scores, reached_depth, complete = chess_engine.multipv_search(board, moves, 3, multipv=3)
+        finally:
+            chess_engine.begin_search_generation()
+
+        self.assertFalse(complete)
+        self.assertEqual(reached_depth, 1)
+        self.assertEqual(scores, shallow)
+
+    def test_unfinished_first_iteration_reports_no_completed_depth(self):
+        board = chess.Board("r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15")
+        moves = list(board.legal_moves)
+        chess_engine.begin_search_generation()
+        chess_engine.multipv_search(board, moves, 1, multipv=3)
+        first_iteration_nodes = chess_engine.search_runtime.nodes
+
+        chess_engine.reset_transposition_table()
+        chess_engine.begin_search_generation(node_limit=first_iteration_nodes // 2)
+        try:
+            scores, reached_depth, complete = chess_engine.multipv_search(board, moves, 3, multipv=3)
+        finally:
+            chess_engine.begin_search_generation()
+
+        self.assertTrue(scores)
+        self.assertFalse(complete)
+        self.assertEqual(reached_depth, 0)
+
+    def test_candidates_from_an_unfinished_first_iteration_are_partial(self):
+        board = chess.Board()
+        move = board.parse_san("e4")
+
+        with patch.object(chess_engine, "multipv_search", return_value=({move: 20}, 0, False)):
+            teaching = chess_engine.get_teaching_analysis(
+                board, {"best_move": move, "score": 20, "depth": 2}, candidate_count=2, depth=1
+            )
+
+        self.assertEqual(teaching["search_depth"], 0)
+        self.assertEqual(teaching["candidates"][0]["score_status"], "partial")
+        self.assertEqual(teaching["criticality"], "partial")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,156 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+import chess
+
+import chess_engine
+from transposition import DEFAULT_PARTITION, PartitionedTranspositionTable
+
+
+class PartitionedTranspositionTableTests(unittest.TestCase):
+    def test_partitions_are_separate_namespaces(self):
+        table = PartitionedTranspositionTable(100)
+        table["position"] = "default entry"
+        with table.use_partition("game:a"):
+            self.assertNotIn("position", table)
+            table["position"] = "game entry"
+            self.assertEqual(table.get("position"), "game entry")
+            self.assertEqual(len(table), 1)
+
+        self.assertEqual(table["position"], "default entry")
+        self.assertEqual(table.total_size(), 2)
+
+    def test_partition_is_per_thread(self):
+        table = PartitionedTranspositionTable(100)
+        seen = []
+        with table.use_partition("game:a"):
+            table["key"] = "a"
+            thread = threading.Thread(target=lambda: seen.append(table.get("key")))
+            thread.start()
+            thread.join()
+
+        self.assertEqual(seen, [None])
+
+    def test_full_table_evicts_from_the_largest_partition(self):
+        table = PartitionedTranspositionTable(10)
+        with table.use_partition("game:a"):
+            for key in range(3):
+                table[key] = key
+        with table.use_partition("batch"):
+            for key in range(20):
+                table[key] = key
+            self.assertEqual(list(table), list(range(13, 20)))
+
+        with table.use_partition("game:a"):
+            self.assertEqual(list(table), [0, 1, 2])
+        self.assertEqual(table.total_size(), 10)
+
+    def test_full_table_evicts_a_batch_per_scan(self):
+        table = PartitionedTranspositionTable(512)
+        self.assertEqual(table.eviction_batch, 2)
+        for key in range(513):
+            table[key] = key
+
+        self.assertEqual(list(table)[:2], [2, 3])
+        self.assertEqual(table.total_size(), 511)
+        self.assertEqual(table.snapshot()["by_kind"][DEFAULT_PARTITION]["evictions"], 2)
+
+    def test_concurrent_inserts_of_one_key_count_it_once(self):
+        table = PartitionedTranspositionTable(1_000)
+        start = threading.Barrier(8)
+
+        def insert():
+            start.wait()
+            for key in range(200):
+                table[key] = threading.get_ident()
+
+        threads = [threading.Thread(target=insert) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(table.total_size(), 200)
+        self.assertEqual(len(table), 200)
+
+    def test_limited_kind_replaces_its_own_entries_below_capacity(self):
+        table = PartitionedTranspositionTable(100, limits={"review": 0.1})
+        with table.use_partition("review"):
+            for key in range(50):
+                table[key] = key
+            self.assertEqual(len(table), 10)
+
+        self.assertEqual(table.total_size(), 10)
+        self.assertEqual(table.snapshot()["by_kind"]["review"]["evictions"], 40)
+
+    def test_least_recently_used_partition_is_dropped_beyond_the_maximum(self):
+        table = PartitionedTranspositionTable(100, max_partitions=3)
+        for name in ("game:a", "game:b", "game:c"):
+            with table.use_partition(name):
+                table["key"] = name
+
+        self.assertIsNone(table.partition_stats("game:a"))
+        self.assertEqual(table.total_size(), 2)
+        self.assertIsNotNone(table.partition_stats(DEFAULT_PARTITION))
+
+    def test_probe_hit_rates_are_reported_per_kind(self):
+        table = PartitionedTranspositionTable(100)
+        for name in ("game:a", "game:b"):
+            with table.use_partition(name):
+                table["key"] = 1
+                table.probe("key")
+                table.probe("missing")
+        table.drop_partition("game:b")
+
+        snapshot = table.snapshot()
+        self.assertEqual(snapshot["partitions"], 2)
+        self.assertEqual(
+            snapshot["by_kind"]["game"],
+            {"partitions": 1, "entries": 1, "probes": 2, "hits": 1, "hit_rate": 0.5, "evictions": 0},
+        )
+        self.assertEqual(snapshot["entries"], 1)
+
+
+class EnginePartitionTests(unittest.TestCase):
+    def test_busy_analysis_partition_does_not_age_out_a_live_game(self):
+        table = PartitionedTranspositionTable(4_000, limits=chess_engine.TT_PARTITION_LIMITS)
+        live = chess.Board("r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15")
+        with patch("chess_engine.transposition_table", table):
+            with chess_engine.tt_partition("game:live"):
+                chess_engine.get_analysis(live, depth=2, use_book=False, adaptive_depth=False)
+                live_keys = set(table)
+            with chess_engine.tt_partition("analysis"):
+                for _ in range(5):
+                    chess_engine.begin_search_generation()
+                for key in range(2_500):
+                    chess_engine.store_tt(key, 1, 0, chess_engine.TT_EXACT, None, 0)
+            with chess_engine.tt_partition("game:live"):
+                # The next bot move starts with the game's entries intact.
+                chess_engine.begin_search_generation()
+                self.assertEqual(set(table), live_keys)
+
+    def test_review_traffic_does_not_evict_a_live_game(self):
+        table = PartitionedTranspositionTable(4_000, limits=chess_engine.TT_PARTITION_LIMITS)
+        live = chess.Board("r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15")
+        with patch("chess_engine.transposition_table", table):
+            with chess_engine.tt_partition("game:live"):
+                chess_engine.get_analysis(live, depth=2, use_book=False, adaptive_depth=False)
+                live_keys = set(table)
+            with chess_engine.tt_partition("review"):
+                for fen in (
+                    chess.STARTING_FEN,
+                    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+                    "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2",
+                ):
+                    chess_engine.get_analysis(chess.Board(fen), depth=3, use_book=False, adaptive_depth=False)
+                self.assertLessEqual(len(table), 1_000)
+            with chess_engine.tt_partition("game:live"):
+                self.assertEqual(set(table), live_keys)
+
+        self.assertGreater(table.snapshot()["by_kind"]["review"]["evictions"], 0)
+        self.assertGreater(table.partition_stats("game:live")["probes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
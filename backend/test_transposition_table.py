@@ -1,4 +1,5 @@
 import math
+import threading
 import time
 import unittest
 
@@ -80,6 +81,83 @@ class TranspositionTableTests(unittest.TestCase):
         self.assertIn(result["best_move"], board.legal_moves)
         self.assertEqual(board.fen(), original_fen)
 
+    def budgeted_analysis(self, board):
+        return chess_engine.get_analysis(
+            board,
+            depth=8,
+            use_book=False,
+            adaptive_depth=False,
+            difficulty="advanced",
+            node_limit=3000,
+        )
+
+    def test_node_budget_stops_at_the_same_iteration_every_time(self):
+        board = chess.Board("r1bqkb1r/ppp2ppp/2n5/3np1N1/2B5/8/PPPP1PPP/RNBQK2R w KQkq - 0 6")
+
+        first = self.budgeted_analysis(board)
+        chess_engine.reset_transposition_table()
+        second = self.budgeted_analysis(board)
+
+        self.assertTrue(first["node_limit_reached"])
+        self.assertFalse(first["timed_out"])
+        self.assertLessEqual(first["nodes"], 3000)
+        self.assertLess(first["depth"], 8)
+        for field in ("best_move", "score", "depth", "nodes"):
+            self.assertEqual(first[field], second[field], field)
+
+    def test_node_budget_ignores_searches_on_other_threads(self):
+        board = chess.Board("r1bqkb1r/ppp2ppp/2n5/3np1N1/2B5/8/PPPP1PPP/RNBQK2R w KQkq - 0 6")
+        alone = self.budgeted_analysis(board)
+        chess_engine.reset_transposition_table()
+        stop = threading.Event()
+
+        def background_load():
+            while not stop.is_set():
+                chess_engine.get_analysis(
+                    chess.Board("4k3/8/8/8/8/8/4Q3/4K3 w - - 0 1"),
+                    depth=8,
+                    time_limit=0.05,
+                    use_book=False,
+                    adaptive_depth=False,
+                )
+
+        worker = threading.Thread(target=background_load)
+        worker.start()
+        try:
+            under_load = self.budgeted_analysis(board)
+        finally:
+            stop.set()
+            worker.join()
+
+        for field in ("best_move", "score", "depth", "nodes"):
+            self.assertEqual(alone[field], under_load[field], field)
+
+    def test_cancelled_search_stops_promptly_on_its_own_thread(self):
+        board = chess.Board("r1bqkb1r/ppp2ppp/2n5/3np1N1/2B5/8/PPPP1PPP/RNBQK2R w KQkq - 0 6")
+        original_fen = board.fen()
+        cancel_event = threading.Event()
+        results = []
+
+        def cancellable_search():
+            with chess_engine.search_cancellation(cancel_event):
+                results.append(
+                    chess_engine.get_analysis(board, depth=12, use_book=False, adaptive_depth=False)
+                )
+
+        worker = threading.Thread(target=cancellable_search)
+        worker.start()
+        time.sleep(0.1)
+        started = time.perf_counter()
+        cancel_event.set()
+        worker.join(timeout=5)
+
+        self.assertFalse(worker.is_alive())
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertTrue(results[0]["cancelled"])
+        self.assertIn(results[0]["best_move"], board.legal_moves)
+        self.assertEqual(board.fen(), original_fen)
+        self.assertIsNone(chess_engine.search_runtime.cancel_event)
+
     def test_pvs_matches_full_window_reference(self):
         board = chess.Board()
 
@@ -110,23 +188,44 @@ class TranspositionTableTests(unittest.TestCase):
 
         self.assertEqual(actual, expected)
 
-    def test_incremental_repetition_counts_match_python_chess(self):
+    def test_search_history_repetitions_match_python_chess(self):
         board = chess.Board()
-        for san in ("Nf3", "Nf6", "Ng1", "Ng8"):
+        board.push_san("e4")
+        for san in ("Nf6", "Nf3", "Ng8", "Ng1", "Nf6", "Nf3", "Ng8"):
             board.push_san(san)
 
-        counts = chess_engine.build_repetition_counts(board)
-        current_hash = chess.polyglot.zobrist_hash(board)
+        history = chess_engine.SearchHistory(board)
 
+        # Seeded from the reversible tail only: positions after 1.e4.
+        self.assertEqual(len(history.hashes), board.halfmove_clock + 1)
         self.assertTrue(board.is_repetition(2))
-        self.assertEqual(counts[current_hash], 2)
-
-        board.push_san("Nf3")
-        child_hash = chess_engine.push_repetition(counts, board)
-        chess_engine.pop_repetition(counts, child_hash)
+        self.assertEqual(history.occurrences(), 2)
+        self.assertEqual(history.current, chess.polyglot.zobrist_hash(board))
+
+        board.push_san("Ng1")
+        history.push(board)
+        self.assertTrue(board.is_repetition(3))
+        self.assertEqual(history.occurrences(), 3)
+        history.pop()
         board.pop()
 
-        self.assertEqual(counts[current_hash], 2)
+        self.assertEqual(history.occurrences(), 2)
+
+    def test_repeated_position_below_root_scores_as_search_draw(self):
+        winning = chess.Board("6k1/8/8/8/8/8/8/QN4K1 w - - 0 1")
+        for san in ("Nc3", "Kh8", "Nb1", "Kg8"):
+            winning.push_san(san)
+        winning.push_san("Nc3")
+
+        history = chess_engine.SearchHistory(winning)
+        score, move = chess_engine.minimax(
+            winning, 2, -math.inf, math.inf, False, 1, history
+        )
+
+        self.assertIsNone(move)
+        self.assertEqual(score, -chess_engine.REPETITION_AVOIDANCE_SCORE)
+        self.assertEqual(chess_engine.search_stats["nodes"], 1)
+        self.assertNotIn(chess_engine.tt_key(winning), chess_engine.transposition_table)
 
     def test_quiescence_searches_quiet_check_evasions(self):
         board = chess.Board("4r1k1/8/8/8/8/8/8/4K3 w - - 0 1")
@@ -147,5 +246,30 @@ class TranspositionTableTests(unittest.TestCase):
         self.assertGreater(score, stand_pat)
 
 
+    def test_quiescence_tt_reuses_capture_lines_without_changing_scores(self):
+        board = chess.Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+
+        cold_score = chess_engine.quiescence_search(board, -math.inf, math.inf)
+        cold_nodes = chess_engine.search_stats["nodes"]
+        quiescence_depths = {
+            entry.depth for entry in chess_engine.transposition_table.values()
+        }
+        chess_engine.begin_search_generation()
+        warm_score = chess_engine.quiescence_search(board, -math.inf, math.inf)
+
+        self.assertEqual(warm_score, cold_score)
+        self.assertTrue(quiescence_depths)
+        self.assertTrue(all(depth < 0 for depth in quiescence_depths))
+        self.assertGreater(chess_engine.search_stats["quiescence_tt_hits"], 0)
+        self.assertLess(chess_engine.search_stats["nodes"], cold_nodes)
+
+    def test_quiescence_scores_stalemate_without_captures(self):
+        board = chess.Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+
+        score = chess_engine.quiescence_search(board, -math.inf, math.inf)
+
+        self.assertTrue(board.is_stalemate())
+        self.assertEqual(score, 0)
+
 if __name__ == "__main__":
     unittest.main()
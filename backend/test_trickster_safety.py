@@ -1,3 +1,4 @@
+import math
 import unittest
 from unittest.mock import patch
 
@@ -141,5 +142,77 @@ class TricksterSafetyTests(unittest.TestCase):
         self.assertEqual(selected, best_move)
 
 
+    def test_root_score_table_replaces_overlay_searches(self):
+        board = chess.Board()
+        best_move = board.parse_san("e4")
+        near_move = board.parse_san("d4")
+        losing_move = board.parse_san("a3")
+        root_scores = {
+            best_move: chess_engine.RootMoveScore(2, 30, chess_engine.TT_EXACT),
+            near_move: chess_engine.RootMoveScore(2, 20, chess_engine.TT_EXACT),
+            losing_move: chess_engine.RootMoveScore(2, -400, chess_engine.TT_UPPER),
+        }
+
+        with (
+            patch("chess_engine.order_moves", return_value=[best_move, near_move, losing_move]),
+            patch("chess_engine.minimax") as minimax,
+            patch("chess_engine.major_piece_loss_after_move", return_value=False),
+            patch("chess_engine.should_apply_difficulty_error", return_value=True),
+        ):
+            selected, score, _bonus, loss = chess_engine.select_difficulty_move(
+                board,
+                depth=3,
+                best_move=best_move,
+                best_score=30,
+                difficulty="newbie",
+                style="balanced",
+                root_scores=root_scores,
+            )
+
+        minimax.assert_not_called()
+        self.assertEqual(selected, near_move)
+        self.assertEqual((score, loss), (20, 10))
+
+    def test_overlay_searches_are_capped_with_a_root_table(self):
+        board = chess.Board()
+        moves = list(board.legal_moves)[:8]
+        searched = []
+
+        def fake_minimax(candidate_board, *_args, **_kwargs):
+            searched.append(candidate_board.peek())
+            return 0, None
+
+        with (
+            patch("chess_engine.order_moves", return_value=moves),
+            patch("chess_engine.minimax", side_effect=fake_minimax),
+            patch("chess_engine.major_piece_loss_after_move", return_value=False),
+        ):
+            chess_engine.select_difficulty_move(
+                board,
+                depth=3,
+                best_move=moves[0],
+                best_score=0,
+                difficulty="newbie",
+                style="balanced",
+                root_scores={},
+            )
+
+        self.assertEqual(len(searched), chess_engine.OVERLAY_SEARCH_LIMIT)
+
+    def test_minimax_records_root_move_scores(self):
+        board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        chess_engine.transposition_table.clear()
+        chess_engine.begin_search_generation()
+        root_scores = {}
+
+        score, best_move = chess_engine.minimax(
+            board, 2, -math.inf, math.inf, True, root_scores=root_scores
+        )
+
+        self.assertEqual(set(root_scores), set(board.legal_moves))
+        self.assertEqual(root_scores[best_move].flag, chess_engine.TT_EXACT)
+        self.assertEqual(root_scores[best_move].score, score)
+        self.assertTrue(all(entry.depth <= 1 for entry in root_scores.values()))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,117 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import chess
+
+import chess_engine
+import tt_snapshot
+from transposition import PartitionedTranspositionTable
+
+MIDDLEGAME = "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15"
+
+
+def entry(depth, generation, move="e2e4", score=10):
+    return chess_engine.TTEntry(
+        depth=depth,
+        score=score,
+        flag=chess_engine.TT_EXACT,
+        best_move=chess.Move.from_uci(move) if move else None,
+        generation=generation,
+    )
+
+
+class TTSnapshotTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "tt.bin"
+        chess_engine.reset_transposition_table()
+        self.addCleanup(chess_engine.reset_transposition_table)
+
+    def test_hottest_entries_are_filtered_by_depth_and_ranked_by_recency(self):
+        table = PartitionedTranspositionTable(100)
+        table[(1, 0, True)] = entry(depth=0, generation=9)
+        table[(2, 0, True)] = entry(depth=2, generation=3)
+        table[(3, 0, True)] = entry(depth=1, generation=8)
+        with table.use_partition("game:a"):
+            table[(2, 0, True)] = entry(depth=4, generation=5)
+            table[(4, 0, True)] = entry(depth=6, generation=1)
+
+        hottest = tt_snapshot.hottest_entries(table, min_depth=1, max_entries=2)
+
+        self.assertEqual([(key[0], item.depth) for key, item in hottest], [(3, 1), (2, 4)])
+
+    def test_round_trip_keeps_keys_scores_bounds_and_moves(self):
+        table = PartitionedTranspositionTable(100)
+        table[(2**64 - 1, 7, False)] = entry(depth=3, generation=1, move="a7a8q", score=-chess_engine.MATE_SCORE)
+        table[(5, 0, True)] = entry(depth=2, generation=1, move=None)
+
+        self.assertEqual(tt_snapshot.save_snapshot(self.path, table), 2)
+        restored = dict(tt_snapshot.load_snapshot(self.path))
+
+        self.assertEqual(
+            self.path.stat().st_size,
+            tt_snapshot.HEADER.size + 2 * (tt_snapshot.HASH.size + tt_snapshot.RECORD.size),
+        )
+        promotion = restored[(2**64 - 1, 7, False)]
+        self.assertEqual((promotion.depth, promotion.score), (3, -chess_engine.MATE_SCORE))
+        self.assertEqual(promotion.best_move, chess.Move.from_uci("a7a8q"))
+        self.assertIsNone(restored[(5, 0, True)].best_move)
+
+    def test_stale_missing_or_truncated_snapshots_are_ignored(self):
+        table = PartitionedTranspositionTable(100)
+        table[(1, 0, True)] = entry(depth=2, generation=1)
+        tt_snapshot.save_snapshot(self.path, table)
+
+        with patch("tt_snapshot.ENGINE_STAMP", b"\0" * 16):
+            self.assertEqual(tt_snapshot.load_snapshot(self.path), {})
+        self.assertEqual(tt_snapshot.load_snapshot(self.path.with_name("missing.bin")), {})
+        self.path.write_bytes(self.path.read_bytes()[:-3])
+        self.assertEqual(tt_snapshot.load_snapshot(self.path), {})
+
+    def test_snapshot_is_stamped_with_the_code_loaded_at_import(self):
+        table = PartitionedTranspositionTable(100)
+        table[(1, 0, True)] = entry(depth=2, generation=1)
+
+        with patch("tt_snapshot.engine_stamp", return_value=b"\0" * 16):
+            tt_snapshot.save_snapshot(self.path, table)
+
+        self.assertEqual(len(tt_snapshot.load_snapshot(self.path)), 1)
+
+    def test_loaded_snapshot_decodes_records_only_on_lookup(self):
+        table = PartitionedTranspositionTable(100)
+        for position_hash in (9, 3, 3, 7):
+            table[(position_hash, position_hash, position_hash == 3)] = entry(depth=2, generation=1, score=position_hash)
+        table[(3, 0, False)] = entry(depth=2, generation=1, score=-3)
+        tt_snapshot.save_snapshot(self.path, table)
+
+        with patch("tt_snapshot._decode_move", wraps=tt_snapshot._decode_move) as decode:
+            restored = tt_snapshot.load_snapshot(self.path)
+            self.assertEqual(len(restored), 4)
+            decode.assert_not_called()
+            self.assertEqual(restored.get((3, 0, False)).score, -3)
+            self.assertEqual(restored.get((3, 3, True)).score, 3)
+            self.assertIsNone(restored.get((3, 3, False)))
+            self.assertIsNone(restored.get((8, 8, False)))
+            self.assertEqual(decode.call_count, 2)
+
+    def test_restored_snapshot_warms_a_fresh_partition(self):
+        board = chess.Board(MIDDLEGAME)
+        search = dict(depth=4, time_limit=30, use_book=False, adaptive_depth=False)
+        cold = chess_engine.get_analysis(board, **search)
+        tt_snapshot.save_snapshot(self.path)
+
+        chess_engine.reset_transposition_table()
+        self.assertGreater(tt_snapshot.restore_snapshot(self.path), 0)
+        with chess_engine.tt_partition("game:after-restart"):
+            warm = chess_engine.get_analysis(board, **search)
+
+        self.assertEqual((warm["best_move"], warm["score"]), (cold["best_move"], cold["score"]))
+        self.assertLess(warm["nodes"], cold["nodes"] / 4)
+        self.assertGreater(chess_engine.transposition_table.snapshot()["warm_hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,266 @@
+"""Transposition table partitioned by game or workload, with fair-share eviction."""
+
+import itertools
+import threading
+from collections import OrderedDict, deque
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+
+
+DEFAULT_PARTITION = "default"
+# A full table frees this share of its capacity at once, so the scan for the
+# largest partition runs once per batch instead of on every insert.
+EVICTION_BATCH_SHARE = 1 / 256
+# Entries written by a partition's last few searches are never aged out.
+SEARCHES_KEPT = 3
+
+
+class _Partition:
+    __slots__ = ("name", "entries", "limit", "probes", "hits", "evictions", "generations")
+
+    def __init__(self, name, limit=None):
+        self.name = name
+        self.entries = {}
+        self.limit = limit
+        self.probes = 0
+        self.hits = 0
+        self.evictions = 0
+        self.generations = deque(maxlen=SEARCHES_KEPT)
+
+
+class _CurrentPartition(threading.local):
+    partition = None
+
+
+class PartitionedTranspositionTable(MutableMapping):
+    """One capacity shared by named partitions, each a private namespace.
+
+    The mapping interface (``get``, ``[]``, ``in``, ``len``, ``items`` ...)
+    acts on the calling thread's partition, chosen with ``use_partition``;
+    threads outside any partition use ``DEFAULT_PARTITION``. Entries of one
+    partition are never seen by another, so one game's or job's traffic
+    cannot overwrite another's.
+
+    Eviction is fair share: a partition at its own limit (``limits`` maps a
+    partition kind to a share of ``capacity``) replaces its oldest entry;
+    otherwise, once the table is full, the largest partition gives up its
+    oldest entries (a batch of ``EVICTION_BATCH_SHARE`` of the capacity).
+    Heavy batch work therefore evicts itself, and small live games keep
+    their entries between moves. At most ``max_partitions``
+    partitions are kept; the least recently used one is dropped beyond that.
+
+    Partition names are ``"kind"`` or ``"kind:key"``; statistics are
+    reported per kind.
+
+    ``warm`` installs read-only entries (a restored snapshot) that ``probe``
+    and ``get`` fall back to in every partition, so even a new game's
+    partition starts warm. They sit outside the capacity and are replaced
+    by the next ``warm`` or ``reset``.
+    """
+
+    def __init__(self, capacity, limits=None, max_partitions=256):
+        self.capacity = max(1, int(capacity))
+        self.eviction_batch = max(1, int(self.capacity * EVICTION_BATCH_SHARE))
+        self.limits = dict(limits or {})
+        self.max_partitions = max(1, int(max_partitions))
+        self._partitions = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._current = _CurrentPartition()
+        self._default = self._register(DEFAULT_PARTITION)
+        self._warm = {}
+        self.warm_hits = 0
+
+    def _register(self, name):
+        share = self.limits.get(name.split(":", 1)[0])
+        partition = _Partition(name, max(1, int(self.capacity * share)) if share else None)
+        self._partitions[name] = partition
+        return partition
+
+    def _partition(self, name):
+        with self._lock:
+            partition = self._partitions.get(name)
+            if partition is None:
+                partition = self._register(name)
+                while len(self._partitions) > self.max_partitions:
+                    oldest = next(name for name in self._partitions if name != DEFAULT_PARTITION)
+                    self._drop(oldest)
+            self._partitions.move_to_end(name)
+            return partition
+
+    def _active(self):
+        return self._current.partition or self._default
+
+    @contextmanager
+    def use_partition(self, name):
+        """Route this thread's reads and writes to partition ``name``."""
+        previous = self._current.partition
+        self._current.partition = self._partition(name)
+        try:
+            yield self._current.partition
+        finally:
+            self._current.partition = previous
+
+    def probe(self, key):
+        """Look up a search entry, counting the probe in the partition's hit rate."""
+        partition = self._current.partition or self._default
+        partition.probes += 1
+        entry = partition.entries.get(key)
+        if entry is None and self._warm:
+            entry = self._warm.get(key)
+            if entry is not None:
+                self.warm_hits += 1
+        if entry is not None:
+            partition.hits += 1
+        return entry
+
+    def get(self, key, default=None):
+        entry = (self._current.partition or self._default).entries.get(key)
+        if entry is None and self._warm:
+            entry = self._warm.get(key)
+        return default if entry is None else entry
+
+    def warm(self, entries):
+        """Install a mapping (kept as is, e.g. a mapped snapshot) or ``(key, entry)`` pairs as the warm entries."""
+        self._warm = entries if isinstance(entries, Mapping) else dict(entries)
+        self.warm_hits = 0
+        return len(self._warm)
+
+    def all_entries(self):
+        """``(key, entry)`` pairs of every partition and the warm entries, for snapshots."""
+        with self._lock:
+            sources = [self._warm] + [partition.entries for partition in self._partitions.values()]
+        pairs = []
+        for entries in sources:
+            pairs.extend(list(entries.items()))
+        return pairs
+
+    def __getitem__(self, key):
+        return self._active().entries[key]
+
+    def __contains__(self, key):
+        return key in self._active().entries
+
+    def __setitem__(self, key, entry):
+        partition = self._active()
+        entries = partition.entries
+        # Threads share a partition ("analysis", "default" ...), so the
+        # membership test and the size count change together under the lock.
+        with self._lock:
+            if key not in entries and self._partitions.get(partition.name) is partition:
+                if partition.limit is not None and len(entries) >= partition.limit:
+                    self._evict_oldest(partition)
+                elif self._size >= self.capacity:
+                    largest = max(self._partitions.values(), key=lambda other: len(other.entries))
+                    self._evict_oldest(largest, self.eviction_batch)
+                self._size += 1
+            # A partition dropped while a search still ran in it is not counted and is freed with it.
+            entries[key] = entry
+
+    def _evict_oldest(self, partition, count=1):
+        oldest = list(itertools.islice(partition.entries, count))
+        for key in oldest:
+            del partition.entries[key]
+        partition.evictions += len(oldest)
+        self._size -= len(oldest)
+
+    def __delitem__(self, key):
+        partition = self._active()
+        with self._lock:
+            del partition.entries[key]
+            if self._partitions.get(partition.name) is partition:
+                self._size -= 1
+
+    def __iter__(self):
+        return iter(self._active().entries)
+
+    def __len__(self):
+        return len(self._active().entries)
+
+    def keys(self):
+        return self._active().entries.keys()
+
+    def items(self):
+        return self._active().entries.items()
+
+    def begin_search(self, generation):
+        """Record a search of ``generation`` in the current partition.
+
+        Returns the oldest generation among the partition's last
+        ``SEARCHES_KEPT`` searches: its entries older than that are stale.
+        Searches in other partitions do not age this one.
+        """
+        generations = self._active().generations
+        generations.append(generation)
+        return generations[0] if len(generations) == generations.maxlen else None
+
+    def values(self):
+        return self._active().entries.values()
+
+    def clear(self):
+        """Empty the current partition."""
+        partition = self._active()
+        with self._lock:
+            if self._partitions.get(partition.name) is partition:
+                self._size -= len(partition.entries)
+            partition.entries.clear()
+
+    def total_size(self):
+        return self._size
+
+    def drop_partition(self, name):
+        """Free a finished game's partition."""
+        with self._lock:
+            if name != DEFAULT_PARTITION and name in self._partitions:
+                self._drop(name)
+
+    def _drop(self, name):
+        partition = self._partitions.pop(name)
+        self._size -= len(partition.entries)
+        partition.entries = {}
+
+    def reset(self):
+        """Drop every partition and its statistics."""
+        with self._lock:
+            for partition in self._partitions.values():
+                partition.entries = {}
+            self._partitions.clear()
+            self._size = 0
+            self._default = self._register(DEFAULT_PARTITION)
+            self._warm = {}
+            self.warm_hits = 0
+
+    def partition_stats(self, name):
+        partition = self._partitions.get(name)
+        if partition is None:
+            return None
+        return self._stats([partition])
+
+    @staticmethod
+    def _stats(partitions):
+        probes = sum(partition.probes for partition in partitions)
+        hits = sum(partition.hits for partition in partitions)
+        return {
+            "entries": sum(len(partition.entries) for partition in partitions),
+            "probes": probes,
+            "hits": hits,
+            "hit_rate": round(hits / probes, 3) if probes else None,
+            "evictions": sum(partition.evictions for partition in partitions),
+        }
+
+    def snapshot(self):
+        with self._lock:
+            by_kind = {}
+            for partition in self._partitions.values():
+                by_kind.setdefault(partition.name.split(":", 1)[0], []).append(partition)
+            return {
+                "capacity": self.capacity,
+                "entries": self._size,
+                "partitions": len(self._partitions),
+                "warm_entries": len(self._warm),
+                "warm_hits": self.warm_hits,
+                "by_kind": {
+                    kind: {"partitions": len(partitions), **self._stats(partitions)}
+                    for kind, partitions in by_kind.items()
+                },
+            }
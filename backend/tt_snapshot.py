@@ -0,0 +1,190 @@
+"""Transposition-table snapshots on disk for warm restarts."""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from bisect import bisect_left
+from collections.abc import Mapping
+from pathlib import Path
+
+import chess
+
+import chess_engine
+
+
+TT_SNAPSHOT_FORMAT = 2
+TT_SNAPSHOT_MAGIC = b"CHESSTT\x00"
+# Quiescence and depth-0 entries are cheap to recompute; only real search depths are kept.
+TT_SNAPSHOT_MIN_DEPTH = 1
+TT_SNAPSHOT_MAX_ENTRIES = 50_000
+# Sources whose changes alter stored scores, bounds, moves or keys.
+ENGINE_SOURCES = ("chess_engine.py", "search_board.py", "evaluation")
+
+# magic, format, engine stamp, record count; padded so the hash column is 8-byte aligned
+HEADER = struct.Struct("<8sH16sI2x")
+# The sorted position hashes come first as one column, so lookups bisect it
+# in place; the records follow in the same order.
+HASH = struct.Struct("<Q")
+# halfmove clock, LMR mode, depth, flag, score, best move
+RECORD = struct.Struct("<HBbBiH")
+FLAGS = (chess_engine.TT_EXACT, chess_engine.TT_LOWER, chess_engine.TT_UPPER)
+NO_MOVE = 0xFFFF
+SCORE_RANGE = (-(2**31), 2**31 - 1)
+
+
+def engine_stamp():
+    """Digest of the engine and evaluator sources; any change invalidates old snapshots."""
+    root = Path(chess_engine.ENGINE_DIR)
+    digest = hashlib.sha256()
+    for name in ENGINE_SOURCES:
+        path = root / name
+        files = sorted(path.rglob("*.py")) if path.is_dir() else [path]
+        for source in files:
+            digest.update(source.relative_to(root).as_posix().encode("utf-8"))
+            digest.update(source.read_bytes())
+    return digest.digest()[:16]
+
+
+# Stamped once at import: the code this process actually runs, even if the
+# files on disk change before a snapshot is saved.
+ENGINE_STAMP = engine_stamp()
+
+
+def _encode_move(move):
+    if move is None:
+        return NO_MOVE
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def _decode_move(code):
+    if code == NO_MOVE:
+        return None
+    return chess.Move(code & 0x3F, (code >> 6) & 0x3F, (code >> 12) or None)
+
+
+def hottest_entries(table, min_depth=TT_SNAPSHOT_MIN_DEPTH, max_entries=TT_SNAPSHOT_MAX_ENTRIES):
+    """The most recent, then deepest, entries of every partition, one per key."""
+    best = {}
+    for key, entry in table.all_entries():
+        if entry.depth < min_depth or not isinstance(entry.score, int):
+            continue
+        if not SCORE_RANGE[0] <= entry.score <= SCORE_RANGE[1]:
+            continue
+        current = best.get(key)
+        if current is None or (entry.generation, entry.depth) > (current.generation, current.depth):
+            best[key] = entry
+    ranked = sorted(best.items(), key=lambda item: (item[1].generation, item[1].depth), reverse=True)
+    return ranked[:max_entries]
+
+
+def save_snapshot(path, table=None, min_depth=TT_SNAPSHOT_MIN_DEPTH, max_entries=TT_SNAPSHOT_MAX_ENTRIES):
+    """Write the hottest entries to ``path`` atomically; returns the number written."""
+    table = chess_engine.transposition_table if table is None else table
+    entries = sorted(
+        (((position_hash, min(halfmove_clock, 0xFFFF), bool(use_lmr)), entry)
+         for (position_hash, halfmove_clock, use_lmr), entry in hottest_entries(table, min_depth, max_entries)),
+        key=lambda item: item[0],
+    )
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_name(f"{target.name}.tmp")
+    with open(temporary, "wb") as output:
+        output.write(HEADER.pack(TT_SNAPSHOT_MAGIC, TT_SNAPSHOT_FORMAT, ENGINE_STAMP, len(entries)))
+        for (position_hash, _halfmove_clock, _use_lmr), _entry in entries:
+            output.write(HASH.pack(position_hash))
+        for (_position_hash, halfmove_clock, use_lmr), entry in entries:
+            output.write(
+                RECORD.pack(
+                    halfmove_clock,
+                    int(use_lmr),
+                    max(-128, min(127, entry.depth)),
+                    FLAGS.index(entry.flag),
+                    entry.score,
+                    _encode_move(entry.best_move),
+                )
+            )
+    os.replace(temporary, target)
+    return len(entries)
+
+
+class SnapshotEntries(Mapping):
+    """Read-only ``key -> TTEntry`` view of a memory-mapped snapshot.
+
+    Nothing is decoded up front: ``get`` bisects the mapped hash column and
+    decodes only the record it finds, so the table pages in as it is probed.
+    """
+
+    def __init__(self, mapped, count):
+        self._mapped = mapped
+        self._count = count
+        self._records = HEADER.size + count * HASH.size
+        # The file is little-endian; a native "Q" view reads it directly.
+        self._hashes = memoryview(mapped)[HEADER.size:self._records].cast("Q")
+
+    def _entry(self, index):
+        _halfmove_clock, _use_lmr, depth, flag, score, move = RECORD.unpack_from(
+            self._mapped, self._records + index * RECORD.size
+        )
+        return chess_engine.TTEntry(
+            depth=depth, score=score, flag=FLAGS[flag], best_move=_decode_move(move), generation=0
+        )
+
+    def _key(self, index):
+        halfmove_clock, use_lmr = struct.unpack_from("<HB", self._mapped, self._records + index * RECORD.size)
+        return self._hashes[index], halfmove_clock, bool(use_lmr)
+
+    def get(self, key, default=None):
+        position_hash = key[0]
+        index = bisect_left(self._hashes, position_hash)
+        while index < self._count and self._hashes[index] == position_hash:
+            if self._key(index) == key:
+                return self._entry(index)
+            index += 1
+        return default
+
+    def __getitem__(self, key):
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return (self._key(index) for index in range(self._count))
+
+    def items(self):
+        return [(self._key(index), self._entry(index)) for index in range(self._count)]
+
+
+def load_snapshot(path):
+    """Map a snapshot for lazy lookups; missing, stale or corrupt files give an empty mapping.
+
+    The mapping keeps the file mapped for as long as it is referenced.
+    """
+    source = Path(path)
+    if sys.byteorder != "little" or not source.is_file() or source.stat().st_size < HEADER.size:
+        return {}
+    try:
+        with open(source, "rb") as snapshot:
+            mapped = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, file_format, file_stamp, count = HEADER.unpack_from(mapped)
+        if (magic, file_format, file_stamp) != (TT_SNAPSHOT_MAGIC, TT_SNAPSHOT_FORMAT, ENGINE_STAMP):
+            mapped.close()
+            return {}
+        if HEADER.size + count * (HASH.size + RECORD.size) > len(mapped):
+            mapped.close()
+            return {}
+        return SnapshotEntries(mapped, count)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"TT snapshot load failed: {e}")
+        return {}
+
+
+def restore_snapshot(path, table=None):
+    """Install a snapshot as the table's warm entries; returns how many were restored."""
+    table = chess_engine.transposition_table if table is None else table
+    return table.warm(load_snapshot(path))
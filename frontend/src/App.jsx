@@ -185,6 +185,9 @@ function App() {
 
   // 只捲動聊天室本身，避免 scrollIntoView 帶著整個頁面跳到底部。
   const chatFeedRef = useRef(null);
+  // 後端開啟 PONDER 時，同一盤棋沿用 /make_move 傳回的 session，讓背景思考能命中。
+  // 換新局或載入棋譜時清空，新的一盤會拿到自己的 session 與置換表分區。
+  const botSessionIdRef = useRef(null);
 
   // 1. 初始化載入歷史
   useEffect(() => {
@@ -241,6 +244,7 @@ function App() {
     try {
       const newGame = new Chess();
       newGame.loadPgn(pgn);
+      botSessionIdRef.current = null;
       setGame(newGame);
       setStatus("已載入歷史賽局 (復盤模式)");
       setAnalysisData([]);
@@ -368,6 +372,10 @@ function App() {
 
       // 4. 顯示教練回應
       setChatHistory(prev => [...prev, { role: "model", text: res.data.advice }]);
+      // 選用的模型回答（後端 COACH_MODEL_REPLY=1 且玩家有提問時才有）
+      if (res.data.coach_reply) {
+        setChatHistory(prev => [...prev, { role: "model", text: res.data.coach_reply }]);
+      }
     } catch (err) {
       console.error(err);
       setChatHistory(prev => [...prev, { role: "model", text: "❌ 教練連線失敗，請檢查後端 API。" }]);
@@ -605,8 +613,10 @@ function App() {
         fen: currentFen, 
         time_limit: 1.5,
         difficulty: botDifficulty,
-        bot_style: botStyle
+        bot_style: botStyle,
+        session_id: botSessionIdRef.current
       });
+      botSessionIdRef.current = response.data.session_id || null;
       
       const bestMoveUci = response.data.best_move;
       
@@ -781,7 +791,7 @@ function App() {
           <div className="control-bar">
             <button className={`btn ${appMode === "play" ? "btn-primary" : "btn-muted"}`} onClick={() => setAppMode("play")}>對局</button>
             <button className="btn btn-success" onClick={openLearningArea}>學習專區</button>
-            <button className="btn btn-primary" onClick={() => { const ng = new Chess(); setGame(ng); setStatus("新局開始"); setAnalysisData([]); setCurrentMoveIndex(-1); setIsResigned(false); setChatHistory([]); if (humanColor === "black") makeAIMove(ng.fen()); }}>新局</button>
+            <button className="btn btn-primary" onClick={() => { const ng = new Chess(); botSessionIdRef.current = null; setGame(ng); setStatus("新局開始"); setAnalysisData([]); setCurrentMoveIndex(-1); setIsResigned(false); setChatHistory([]); if (humanColor === "black") makeAIMove(ng.fen()); }}>新局</button>
             {appMode === "play" && (
               <button
                 className="btn btn-danger"